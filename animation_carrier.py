@@ -0,0 +1,324 @@
+"""
+Animated GIF and APNG carrier for the steganography engine
+The payload is spread over every frame of the animation instead of only the
+first one Pillow hands to the image engine, and the stego file is written
+back in the cover's own format with all of its frames and timing.
+"""
+import os
+import time
+from typing import BinaryIO, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .animation_frames import Animation, AnimationFrame, read_animation
+from .steganography_engine import SteganographyEngine, _ValueStream
+
+
+class AnimationCarrier:
+    """
+    LSB carrier for the frames of animated GIFs and APNGs
+    
+    Each frame contributes its own values in file order: palette indices
+    for GIFs and palette APNGs, channel values for other APNGs. The header
+    and payload run through these frames in the same layout as
+    SteganographyEngine uses for one image, so capacity grows with the
+    frame count. Frames are decoded and re-encoded on max_threads workers.
+    
+    Index parity is made palette-safe by first reordering each colour
+    table so that indices 2i and 2i + 1 are close colours. Pixels whose
+    index pair is still far apart, or holds a GIF frame's transparent
+    index, carry no data.
+    """
+    
+    EXTENSIONS = {'.gif': 'GIF', '.png': 'APNG', '.apng': 'APNG'}
+    
+    # Index pairs whose colours are further apart than this (Euclidean
+    # distance of RGB, or RGBA for palette APNGs) carry no data
+    MAX_PAIR_DISTANCE = 32
+    
+    def __init__(self, engine: SteganographyEngine = None):
+        """
+        Args:
+            engine: Engine whose header layout, codec settings, worker count
+                and encryption key are used; a default engine if None
+        """
+        self.engine = engine or SteganographyEngine()
+    
+    @classmethod
+    def handles(cls, path: str) -> bool:
+        """Check whether a path names an existing GIF or PNG with more than one frame"""
+        if os.path.splitext(path)[1].lower() not in cls.EXTENSIONS:
+            return False
+        try:
+            with Image.open(path) as img:
+                return bool(getattr(img, 'is_animated', False))
+        except Exception:
+            return False
+    
+    def calculate_capacity(self, image_path: str, bits_per_pixel: int = 1) -> dict:
+        """
+        Calculate maximum embeddable data size
+        
+        Frames are decoded and their palettes paired, as for embedding,
+        since distant and transparent index pairs do not count.
+        
+        Args:
+            image_path: Path to animated cover
+            bits_per_pixel: How many LSBs to use; palette frames carry 1
+        
+        Returns:
+            Dictionary with capacity information
+        """
+        try:
+            animation = read_animation(image_path)
+            animation.decode(self.engine.max_threads)
+            animation.pair_palettes()
+        except Exception as e:
+            raise ValueError(f"Capacity calculation failed: {str(e)}")
+        if animation.indexed:
+            bits_per_pixel = 1
+        
+        skip_alpha = self._skips_alpha(animation)
+        values = sum(self._frame_values(animation, frame, frame.pixels, skip_alpha)[1].size
+                     for frame in animation.frames)
+        return self._capacity(animation, values, bits_per_pixel)
+    
+    def embed_data(self, cover_image_path: str, secret_data: bytes, output_path: str,
+                   bits_per_pixel: int = 1, use_compression: bool = True,
+                   container: bool = False) -> Tuple[bool, str]:
+        """
+        Embed secret data across the frames of an animated GIF or APNG
+        
+        Args:
+            cover_image_path: Path to animated cover
+            secret_data: Bytes to hide
+            output_path: Output path, with an extension of the cover's format
+            bits_per_pixel: Number of LSBs to modify; 1 for palette frames
+            use_compression: Whether to compress data before embedding
+            container: secret_data is a file container from _build_container
+        
+        Returns:
+            Tuple of (success, message)
+        """
+        start_time = time.time()
+        engine = self.engine
+        
+        try:
+            if bits_per_pixel not in [1, 2, 3]:
+                return False, "Bits per pixel must be 1, 2, or 3"
+            if engine.scatter_key:
+                return False, "Scattered embedding is not supported for animated covers"
+            if engine.adaptive:
+                return False, "Adaptive embedding is not supported for animated covers"
+            if engine.matrix_k:
+                return False, "Matrix embedding is not supported for animated covers"
+            
+            animation = read_animation(cover_image_path)
+            if self.EXTENSIONS.get(os.path.splitext(output_path)[1].lower()) != animation.FORMAT:
+                return False, f"Animated {animation.FORMAT} covers must be saved as " \
+                              f"{self.output_extension(cover_image_path)}"
+            if animation.indexed and bits_per_pixel != 1:
+                return False, "Palette frames carry 1 bit per index"
+            
+            workers = engine.max_threads
+            animation.decode(workers)
+            animation.pair_palettes()
+            skip_alpha = self._skips_alpha(animation)
+            frame_values = [self._frame_values(animation, frame, frame.pixels, skip_alpha)
+                            for frame in animation.frames]
+            total_values = sum(segment.size for _, segment in frame_values)
+            capacity_info = self._capacity(animation, total_values, bits_per_pixel)
+            
+            header, secret_data = engine._pipeline().pack(secret_data, bits_per_pixel,
+                                                          use_compression, container)
+            required_bits = len(secret_data) * 8
+            if required_bits > capacity_info['available_bits']:
+                return False, f"Data too large. Available: {capacity_info['available_bytes']}B, Required: {len(header) + len(secret_data)}B"
+            
+            header_bits = engine._bytes_to_bit_array(header)
+            symbols = engine._bits_to_symbols(engine._bytes_to_bit_array(secret_data),
+                                              bits_per_pixel)
+            used_values = len(header_bits) + len(symbols)
+            
+            offset = 0
+            for frame, (selection, segment) in zip(animation.frames, frame_values):
+                if offset >= used_values:
+                    break
+                engine._embed_segment(segment, offset, header_bits, symbols, bits_per_pixel)
+                if selection is not Ellipsis:
+                    # Masked and alpha-skipping segments are copies of their values
+                    frame.pixels[selection] = segment.reshape(frame.pixels[selection].shape)
+                offset += segment.size
+            
+            animation.encode(workers)
+            animation.write(output_path)
+            elapsed_time = time.time() - start_time
+            
+            return True, f"Embedding successful! Output: {output_path}\n" \
+                        f"Data size: {len(secret_data)} bytes\n" \
+                        f"Capacity used: {(required_bits/max(1, capacity_info['available_bits']))*100:.1f}%\n" \
+                        f"Frames: {capacity_info['frames']} ({animation.FORMAT}), " \
+                        f"values used: {min(used_values, total_values):,} of {total_values:,}\n" \
+                        f"Output size: {os.path.getsize(output_path):,} bytes " \
+                        f"(cover {os.path.getsize(cover_image_path):,} bytes)\n" \
+                        f"Time: {elapsed_time:.2f}s"
+        
+        except Exception as e:
+            if os.path.exists(output_path) and \
+                    os.path.abspath(output_path) != os.path.abspath(cover_image_path):
+                os.remove(output_path)
+            return False, f"Embedding failed: {str(e)}"
+    
+    def extract_data(self, stego_image_path: str) -> Tuple[Optional[bytes], str]:
+        """
+        Extract hidden data from the frames of an animated GIF or APNG
+        
+        Frames after the payload are never decoded.
+        
+        Args:
+            stego_image_path: Path to animated stego image
+        
+        Returns:
+            Tuple of (extracted_data, message)
+        """
+        start_time = time.time()
+        engine = self.engine
+        
+        try:
+            values, total_values = self._open_value_stream(stego_image_path)
+            header_info = engine._read_header(values, total_values)
+            payload = engine._read_payload_bytes(values, header_info, 0,
+                                                 header_info['data_length'])
+            extracted_bytes = engine._pipeline().unpack(payload, header_info)
+        
+        except ValueError as e:
+            return None, str(e)
+        except Exception as e:
+            return None, f"Extraction failed: {str(e)}"
+        
+        elapsed_time = time.time() - start_time
+        
+        return extracted_bytes, f"Extraction successful!\n" \
+                               f"Data size: {len(extracted_bytes)} bytes\n" \
+                               f"Time: {elapsed_time:.2f}s"
+    
+    def extract_stream(self, stego_image_path: str,
+                       writer: BinaryIO) -> Tuple[Optional[int], str]:
+        """
+        Extract hidden data from an animated image into a file object
+        
+        Args:
+            stego_image_path: Path to animated stego image
+            writer: Binary file object the payload is written to
+        
+        Returns:
+            Tuple of (number of bytes written, message)
+        """
+        start_time = time.time()
+        
+        try:
+            values, total_values = self._open_value_stream(stego_image_path)
+            header_info = self.engine._read_header(values, total_values)
+            written = self.engine._write_payload_stream(values, header_info, writer)
+        except ValueError as e:
+            return None, str(e)
+        except Exception as e:
+            return None, f"Extraction failed: {str(e)}"
+        
+        elapsed_time = time.time() - start_time
+        
+        return written, f"Extraction successful!\n" \
+                       f"Data size: {written} bytes\n" \
+                       f"Time: {elapsed_time:.2f}s"
+    
+    def output_extension(self, cover_image_path: str) -> str:
+        """Extension stego images of an animated cover are saved with"""
+        extension = os.path.splitext(cover_image_path)[1].lower()
+        return extension if extension in self.EXTENSIONS else '.png'
+    
+    def _open_value_stream(self, image_path: str):
+        """
+        Open an animated image as a lazy stream of frame values
+        
+        Returns:
+            Tuple of (_ValueStream, upper bound on the number of values)
+        """
+        animation = read_animation(image_path)
+        channels = animation.channels
+        
+        def frames():
+            for frame, pixels in animation.iter_pixels(self.engine.max_threads):
+                yield self._frame_values(animation, frame, pixels, False)[1]
+        
+        total_values = sum(frame.width * frame.height for frame in animation.frames) * channels
+        return _ValueStream(frames(), channels), total_values
+    
+    def _frame_values(self, animation: Animation, frame: AnimationFrame, pixels: np.ndarray,
+                      skip_alpha: bool) -> tuple:
+        """
+        Values of one frame that the header and payload go into
+        
+        Palette frames only use pixels whose index pair is usable. The
+        selection is unaffected by embedding, as it only depends on the
+        indices with their low bit cleared.
+        
+        Returns:
+            Tuple of (selection into pixels, flat segment of the selected
+            values); the segment is a view only when selection is Ellipsis
+        """
+        usable = self._usable_pairs(animation, frame)
+        if usable is not None:
+            selection = usable[pixels >> 1]
+            return selection, pixels[selection]
+        if skip_alpha:
+            selection = (Ellipsis, slice(None, -1))
+            return selection, pixels[selection].reshape(-1)
+        return Ellipsis, pixels.reshape(-1)
+    
+    def _usable_pairs(self, animation: Animation, frame: AnimationFrame) -> Optional[np.ndarray]:
+        """
+        Which index pairs (2i, 2i + 1) of a frame's colour table carry data
+        
+        A pair holding the transparent index is never used, since either
+        index of it changes whether a pixel shows.
+        
+        Returns:
+            Boolean array indexed by i, or None if every index is usable
+        """
+        if frame.palette is None:
+            return None
+        palette = animation.palettes[frame.palette].astype(np.int32)
+        pairs = len(palette) // 2
+        distances = ((palette[0:2 * pairs:2] - palette[1:2 * pairs:2]) ** 2).sum(axis=1)
+        
+        usable = np.zeros(128, dtype=bool)
+        usable[:pairs] = distances <= self.MAX_PAIR_DISTANCE ** 2
+        transparent = animation.transparent_index(frame)
+        if transparent is not None:
+            usable[transparent >> 1] = False
+        return usable
+    
+    def _skips_alpha(self, animation: Animation) -> bool:
+        """Check whether the payload leaves the alpha values of the frames untouched"""
+        return self.engine.exclude_alpha and not animation.indexed and \
+            animation.channels in [2, 4]
+    
+    def _capacity(self, animation: Animation, values: int, bits_per_pixel: int) -> dict:
+        """Capacity dictionary of an animation with this many usable values"""
+        header_bits = self.engine.HEADER_BITS
+        available_bits = max(0, (values - header_bits) * bits_per_pixel)
+        
+        return {
+            'format': animation.FORMAT,
+            'width': animation.width,
+            'height': animation.height,
+            'frames': len(animation.frames),
+            'values': values,
+            'image_mode': 'P' if animation.indexed else
+                          ('L', 'LA', 'RGB', 'RGBA')[animation.channels - 1],
+            'bits_per_pixel': bits_per_pixel,
+            'available_bytes': available_bits // 8,
+            'available_bits': available_bits,
+            'header_bits': header_bits
+        }
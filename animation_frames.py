@@ -0,0 +1,569 @@
+"""
+Frame codecs for animated GIF and APNG files
+Each frame's own image data is decoded to a NumPy array and encoded back in
+place, while every other block of the file is copied through, so frame
+count, offsets, timing, disposal and blending survive exactly. Pillow only
+ever sees one frame at a time, wrapped in a minimal single-image file.
+"""
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .png_stream import COLOR_TYPES, PNG_SIGNATURE, _chunk, _read_chunk
+
+GIF_SIGNATURES = [b'GIF87a', b'GIF89a']
+
+# GIF block introducers and extension labels
+GIF_EXTENSION, GIF_IMAGE, GIF_TRAILER = 0x21, 0x2C, 0x3B
+GIF_CONTROL, GIF_PLAIN_TEXT = 0xF9, 0x01
+
+
+class AnimationFrame:
+    """Encoded image data of one frame and, once decoded, its pixels"""
+    
+    def __init__(self, width: int, height: int, data: bytes,
+                 palette: Optional[int] = None, control: Optional[bytearray] = None):
+        """
+        Args:
+            width: Frame width in pixels
+            height: Frame height in pixels
+            data: The frame's encoded image data
+            palette: Index of the frame's colour table in palettes, None for
+                truecolour frames
+            control: GIF graphic control extension or APNG fcTL body
+                preceding the frame, shared with the file's block list
+        """
+        self.width = width
+        self.height = height
+        self.data = data
+        self.palette = palette
+        self.control = control
+        self.pixels = None
+
+
+class Animation:
+    """Frames, colour tables and the remaining blocks of an animated image"""
+    
+    FORMAT = None
+    
+    def __init__(self, data: bytes):
+        """
+        Args:
+            data: Contents of the file
+        
+        Raises:
+            ValueError: If the file is malformed or uses unsupported features
+        """
+        self.frames = []
+        # Colour tables as (entries, channels) uint8 arrays
+        self.palettes = []
+        # File blocks in order: raw bytes, control blocks and frames
+        self._blocks = []
+        self._parse(data)
+    
+    @classmethod
+    def read(cls, path: str) -> 'Animation':
+        """Read an animation from a file"""
+        with open(path, 'rb') as f:
+            return cls(f.read())
+    
+    def write(self, path: str):
+        """Write the animation to a file"""
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+    
+    @property
+    def indexed(self) -> bool:
+        """Whether frame pixels are palette indices"""
+        return bool(self.palettes)
+    
+    @property
+    def channels(self) -> int:
+        """Number of values per pixel of decoded frames"""
+        return 1
+    
+    def transparent_index(self, frame: AnimationFrame) -> Optional[int]:
+        """Palette index a frame draws as fully transparent, if any"""
+        return None
+    
+    def decode(self, workers: int = 1):
+        """Decode the pixels of every frame on a pool of worker threads"""
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for frame, pixels in zip(self.frames, pool.map(self._decode_frame, self.frames)):
+                frame.pixels = pixels
+    
+    def iter_pixels(self, workers: int = 1) -> Iterator[Tuple[AnimationFrame, np.ndarray]]:
+        """
+        Decode frames in order without keeping their pixels
+        
+        At most workers frames are decoded ahead of the consumer, so
+        stopping early leaves the remaining frames undecoded.
+        
+        Yields:
+            Tuple of (frame, pixels)
+        """
+        workers = max(1, workers)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for frame in self.frames:
+                pending.append((frame, pool.submit(self._decode_frame, frame)))
+                if len(pending) >= workers:
+                    frame, future = pending.popleft()
+                    yield frame, future.result()
+            while pending:
+                frame, future = pending.popleft()
+                yield frame, future.result()
+    
+    def encode(self, workers: int = 1):
+        """Encode the decoded pixels of every frame back on a pool of worker threads"""
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            list(pool.map(self._encode_frame, self.frames))
+        self._encoded()
+    
+    def pair_palettes(self):
+        """
+        Reorder each colour table so that entries 2i and 2i + 1 are close colours
+        
+        The frames using a table are remapped to match, so the animation
+        looks the same while flipping the low bit of an index only swaps
+        a colour for its nearest available partner. Requires decoded frames.
+        """
+        # Local tables are often repeated from frame to frame
+        orders = {}
+        for number, palette in enumerate(self.palettes):
+            users = [frame for frame in self.frames if frame.palette == number]
+            transparent = frozenset({self.transparent_index(frame) for frame in users} - {None})
+            
+            if len(palette) % 2:
+                # Pad odd tables with a duplicate of the last colour as its partner
+                palette = np.concatenate([palette, palette[-1:]])
+            key = (palette.tobytes(), transparent)
+            if key not in orders:
+                orders[key] = _pairing_order(palette, transparent)
+            order = orders[key]
+            
+            lookup = np.arange(256, dtype=np.uint8)
+            lookup[order] = np.arange(len(order), dtype=np.uint8)
+            self.palettes[number] = palette[order]
+            for frame in users:
+                frame.pixels = lookup[frame.pixels]
+            self._remap_palette(number, lookup)
+    
+    def _remap_palette(self, number: int, lookup: np.ndarray):
+        """Renumber the indices outside the frames that refer to a reordered table"""
+    
+    def _encoded(self):
+        """Update file-level fields once every frame has been encoded anew"""
+    
+    def _parse(self, data: bytes):
+        raise NotImplementedError
+    
+    def _decode_frame(self, frame: AnimationFrame) -> np.ndarray:
+        raise NotImplementedError
+    
+    def _encode_frame(self, frame: AnimationFrame):
+        raise NotImplementedError
+    
+    def to_bytes(self) -> bytes:
+        raise NotImplementedError
+
+
+class GifAnimation(Animation):
+    """
+    Animated GIF, with frames as arrays of palette indices
+    
+    A frame covers only its own rectangle of the logical screen, exactly
+    as stored in the file.
+    """
+    
+    FORMAT = 'GIF'
+    
+    @property
+    def indexed(self) -> bool:
+        return True
+    
+    def transparent_index(self, frame: AnimationFrame) -> Optional[int]:
+        """Transparent colour index from the frame's graphic control extension"""
+        control = frame.control
+        if control is None or not control[3] & 1:
+            return None
+        return control[6]
+    
+    def _parse(self, data: bytes):
+        if data[:6] not in GIF_SIGNATURES:
+            raise ValueError("Not a GIF file")
+        if len(data) < 13:
+            raise ValueError("Truncated GIF file")
+        
+        self.version = data[:6]
+        self.width, self.height, flags, self.background, self.aspect = \
+            struct.unpack_from('<HHBBB', data, 6)
+        # Colour resolution is kept; the sort flag no longer holds once tables are paired
+        self._screen_flags = flags & 0x70
+        self.global_palette = None
+        position = 13
+        if flags & 0x80:
+            table, position = _read_color_table(data, position, flags)
+            self.global_palette = len(self.palettes)
+            self.palettes.append(table)
+        
+        control = None
+        while True:
+            if position >= len(data):
+                raise ValueError("Truncated GIF file")
+            introducer = data[position]
+            
+            if introducer == GIF_TRAILER:
+                break
+            if introducer == GIF_EXTENSION:
+                end = _skip_sub_blocks(data, position + 2)
+                block = bytearray(data[position:end])
+                label = data[position + 1]
+                if label == GIF_CONTROL and len(block) >= 8:
+                    control = block
+                elif label == GIF_PLAIN_TEXT:
+                    control = None
+                self._blocks.append(block)
+                position = end
+            elif introducer == GIF_IMAGE:
+                if position + 10 > len(data):
+                    raise ValueError("Truncated GIF file")
+                left, top, width, height, flags = struct.unpack_from('<HHHHB', data,
+                                                                     position + 1)
+                position += 10
+                palette = self.global_palette
+                if flags & 0x80:
+                    table, position = _read_color_table(data, position, flags)
+                    palette = len(self.palettes)
+                    self.palettes.append(table)
+                end = _skip_sub_blocks(data, position + 1)
+                
+                frame = AnimationFrame(width, height, data[position:end], palette, control)
+                frame.offset = (left, top)
+                frame.local_palette = bool(flags & 0x80)
+                frame.interlaced = bool(flags & 0x40)
+                self.frames.append(frame)
+                self._blocks.append(frame)
+                control = None
+                position = end
+            else:
+                raise ValueError(f"Invalid GIF block 0x{introducer:02x}")
+        
+        if not self.frames:
+            raise ValueError("GIF file has no frames")
+    
+    def _remap_palette(self, number: int, lookup: np.ndarray):
+        """Renumber transparent indices and, for the global table, the background"""
+        for frame in self.frames:
+            if frame.palette == number and self.transparent_index(frame) is not None:
+                frame.control[6] = lookup[frame.control[6]]
+        if number == self.global_palette:
+            self.background = int(lookup[self.background])
+    
+    def _decode_frame(self, frame: AnimationFrame) -> np.ndarray:
+        """Decode a frame's LZW data as the only image of a minimal GIF"""
+        if not frame.width or not frame.height:
+            return np.zeros((frame.height, frame.width), dtype=np.uint8)
+        
+        table = self._table_bytes(frame.palette)
+        screen = struct.pack('<HHBBB', frame.width, frame.height,
+                             0x80 | _table_size_bits(len(table) // 3), 0, 0)
+        descriptor = struct.pack('<BHHHHB', GIF_IMAGE, 0, 0, frame.width, frame.height,
+                                 0x40 if frame.interlaced else 0)
+        gif = b'GIF89a' + screen + table + descriptor + frame.data + bytes([GIF_TRAILER])
+        
+        with Image.open(BytesIO(gif)) as img:
+            return np.array(img)
+    
+    def _encode_frame(self, frame: AnimationFrame):
+        """LZW-encode a frame's indices with Pillow and take over its image data"""
+        if frame.pixels is None or not frame.pixels.size:
+            return
+        
+        img = Image.frombytes('P', (frame.width, frame.height), frame.pixels.tobytes())
+        buffer = BytesIO()
+        # optimize=False keeps Pillow from renumbering the indices
+        img.save(buffer, 'GIF', optimize=False, interlace=frame.interlaced)
+        encoded = GifAnimation(buffer.getvalue()).frames[0]
+        frame.data = encoded.data
+        # Pillow does not interlace frames of fewer than 16 rows
+        frame.interlaced = encoded.interlaced
+    
+    def _table_bytes(self, palette: Optional[int]) -> bytes:
+        """Colour table of a frame, or a greyscale table for frames without one"""
+        if palette is None:
+            return np.repeat(np.arange(256, dtype=np.uint8), 3).tobytes()
+        return self.palettes[palette].tobytes()
+    
+    def to_bytes(self) -> bytes:
+        """Serialize the GIF with the current frame data and colour tables"""
+        flags = self._screen_flags
+        parts = [self.version]
+        global_table = b''
+        if self.global_palette is not None:
+            table = self.palettes[self.global_palette]
+            flags |= 0x80 | _table_size_bits(len(table))
+            global_table = table.tobytes()
+        parts.append(struct.pack('<HHBBB', self.width, self.height, flags,
+                                 self.background, self.aspect))
+        parts.append(global_table)
+        
+        for block in self._blocks:
+            if not isinstance(block, AnimationFrame):
+                parts.append(bytes(block))
+                continue
+            flags = 0x40 if block.interlaced else 0
+            table = b''
+            if block.local_palette:
+                entries = self.palettes[block.palette]
+                flags |= 0x80 | _table_size_bits(len(entries))
+                table = entries.tobytes()
+            parts.append(struct.pack('<BHHHHB', GIF_IMAGE, *block.offset,
+                                     block.width, block.height, flags))
+            parts.append(table)
+            parts.append(block.data)
+        
+        parts.append(bytes([GIF_TRAILER]))
+        return b''.join(parts)
+
+
+class ApngAnimation(Animation):
+    """
+    Animated PNG, with frames as arrays of pixels or palette indices
+    
+    The default image and each fdAT frame are one frame each, covering
+    the region given by their fcTL chunk. 8-bit greyscale and truecolour
+    files, with or without alpha, and palette files of any bit depth are
+    supported; palette files are written back with 8-bit indices.
+    """
+    
+    FORMAT = 'APNG'
+    
+    @property
+    def channels(self) -> int:
+        return COLOR_TYPES[self.color_type][0]
+    
+    def _parse(self, data: bytes):
+        if data[:8] != PNG_SIGNATURE:
+            raise ValueError("Not a PNG file")
+        
+        stream = BytesIO(data)
+        stream.seek(8)
+        chunk_type, body = _read_chunk(stream)
+        if chunk_type != b'IHDR' or len(body) != 13:
+            raise ValueError("Invalid PNG: missing IHDR")
+        (self.width, self.height, self.bit_depth, self.color_type, _, _,
+         self.interlace) = struct.unpack('>IIBBBBB', body)
+        if self.color_type not in COLOR_TYPES or \
+                (self.bit_depth != 8 and self.color_type != 3):
+            raise ValueError("Only 8-bit and palette APNGs are supported")
+        self._blocks.append((chunk_type, body))
+        
+        alpha = None
+        frame = None
+        control = None
+        while chunk_type != b'IEND':
+            chunk_type, body = _read_chunk(stream)
+            
+            if chunk_type in [b'IDAT', b'fdAT']:
+                if chunk_type == b'fdAT':
+                    body = body[4:]
+                    if control is None and frame is None:
+                        raise ValueError("Invalid APNG: frame data without fcTL")
+                if frame is None:
+                    width, height = self.width, self.height
+                    if control is not None:
+                        width, height = struct.unpack_from('>II', control, 4)
+                    frame = AnimationFrame(width, height, bytearray(), control=control)
+                    frame.chunk_type = chunk_type
+                    self.frames.append(frame)
+                    self._blocks.append(frame)
+                    control = None
+                frame.data += body
+                continue
+            
+            frame = None
+            if chunk_type == b'fcTL':
+                if len(body) != 26:
+                    raise ValueError("Invalid APNG: bad fcTL chunk")
+                control = bytearray(body)
+                self._blocks.append(control)
+                continue
+            if chunk_type == b'PLTE':
+                self.palettes.append(np.frombuffer(body, dtype=np.uint8)[:len(body) // 3 * 3]
+                                     .reshape(-1, 3))
+            elif chunk_type == b'tRNS' and self.color_type == 3:
+                alpha = np.frombuffer(body, dtype=np.uint8)
+            self._blocks.append((chunk_type, body))
+        
+        if not self.frames:
+            raise ValueError("Invalid PNG: no image data")
+        if self.color_type == 3:
+            if not self.palettes:
+                raise ValueError("Invalid PNG: palette image without PLTE")
+            # Keep alpha with each palette entry, so pairing weighs transparency too
+            palette = self.palettes[0]
+            opacity = np.full((len(palette), 1), 255, dtype=np.uint8)
+            if alpha is not None:
+                opacity[:min(len(alpha), len(palette)), 0] = alpha[:len(palette)]
+            self.palettes = [np.concatenate([palette, opacity], axis=1)]
+            for frame in self.frames:
+                frame.palette = 0
+        else:
+            self.palettes = []
+    
+    def _decode_frame(self, frame: AnimationFrame) -> np.ndarray:
+        """Decode a frame's zlib stream as the only image of a minimal PNG"""
+        ihdr = struct.pack('>IIBBBBB', frame.width, frame.height, self.bit_depth,
+                           self.color_type, 0, 0, self.interlace)
+        png = PNG_SIGNATURE + _chunk(b'IHDR', ihdr)
+        if self.palettes:
+            png += _chunk(b'PLTE', self.palettes[0][:, :3].tobytes())
+        png += _chunk(b'IDAT', bytes(frame.data)) + _chunk(b'IEND', b'')
+        
+        with Image.open(BytesIO(png)) as img:
+            return np.array(img)
+    
+    def _encode_frame(self, frame: AnimationFrame):
+        """Filter and deflate a frame's pixels with Pillow and take over its IDAT data"""
+        if frame.pixels is None:
+            return
+        
+        buffer = BytesIO()
+        if self.palettes:
+            img = Image.frombytes('P', (frame.width, frame.height), frame.pixels.tobytes())
+            img.save(buffer, 'PNG', bits=8)
+        else:
+            Image.fromarray(frame.pixels).save(buffer, 'PNG')
+        
+        buffer.seek(8)
+        data = bytearray()
+        chunk_type = None
+        while chunk_type != b'IEND':
+            chunk_type, body = _read_chunk(buffer)
+            if chunk_type == b'IDAT':
+                data += body
+        frame.data = data
+    
+    def _encoded(self):
+        """Frames are now non-interlaced, with 8-bit palette indices"""
+        self.bit_depth = 8
+        self.interlace = 0
+    
+    def to_bytes(self) -> bytes:
+        """Serialize the APNG, renumbering the fcTL and fdAT sequence"""
+        parts = [PNG_SIGNATURE]
+        sequence = 0
+        for block in self._blocks:
+            if isinstance(block, AnimationFrame):
+                if block.chunk_type == b'fdAT':
+                    parts.append(_chunk(b'fdAT', struct.pack('>I', sequence) +
+                                        bytes(block.data)))
+                    sequence += 1
+                else:
+                    parts.append(_chunk(b'IDAT', bytes(block.data)))
+                continue
+            if isinstance(block, bytearray):
+                parts.append(_chunk(b'fcTL', struct.pack('>I', sequence) + bytes(block[4:])))
+                sequence += 1
+                continue
+            
+            chunk_type, body = block
+            if chunk_type == b'IHDR':
+                body = struct.pack('>IIBBBBB', self.width, self.height, self.bit_depth,
+                                   self.color_type, 0, 0, self.interlace)
+            elif chunk_type == b'PLTE' and self.palettes:
+                body = self.palettes[0][:, :3].tobytes()
+            elif chunk_type == b'tRNS' and self.palettes:
+                body = self.palettes[0][:, 3].tobytes()
+            parts.append(_chunk(chunk_type, body))
+        
+        return b''.join(parts)
+
+
+def read_animation(path: str) -> Animation:
+    """
+    Read an animated GIF or APNG, picking the codec by file signature
+    
+    Raises:
+        ValueError: If the file is neither a GIF nor a PNG
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:6] in GIF_SIGNATURES:
+        return GifAnimation(data)
+    if data[:8] == PNG_SIGNATURE:
+        return ApngAnimation(data)
+    raise ValueError("Not a GIF or PNG file")
+
+
+def _read_color_table(data: bytes, position: int, flags: int) -> Tuple[np.ndarray, int]:
+    """Read the GIF colour table whose size is given by the low bits of flags"""
+    size = 3 << ((flags & 0x07) + 1)
+    if position + size > len(data):
+        raise ValueError("Truncated GIF file")
+    table = np.frombuffer(data, dtype=np.uint8, count=size, offset=position).reshape(-1, 3)
+    return table, position + size
+
+
+def _table_size_bits(entries: int) -> int:
+    """GIF size field of a colour table with a power-of-two number of entries"""
+    return max(0, entries.bit_length() - 2)
+
+
+def _skip_sub_blocks(data: bytes, position: int) -> int:
+    """Position just past the GIF data sub-blocks starting at position"""
+    while True:
+        if position >= len(data):
+            raise ValueError("Truncated GIF file")
+        size = data[position]
+        position += 1 + size
+        if not size:
+            return position
+
+
+def _pairing_order(colours: np.ndarray, reserved: set) -> np.ndarray:
+    """
+    Order palette entries into pairs of close colours
+    
+    Pairs are matched greedily, closest squared distance first. Reserved
+    entries (transparent indices) are left to pair with whatever remains,
+    so as few opaque colours as possible share a pair with them.
+    
+    Args:
+        colours: (entries, channels) palette with an even number of entries
+        reserved: Entries to match last
+    
+    Returns:
+        Old index of each new palette position
+    """
+    entries = len(colours)
+    values = colours.astype(np.int64)
+    norms = (values ** 2).sum(axis=1)
+    distances = norms[:, None] + norms[None, :] - 2 * values @ values.T
+    
+    # Sorting (distance, first, second) packed into one key breaks ties by index
+    first, second = np.triu_indices(entries, 1)
+    keys = np.sort(distances[first, second] << 16 | first << 8 | second)
+    
+    free = [index not in reserved for index in range(entries)]
+    remaining = sum(free) // 2
+    order = []
+    for key in keys.tolist():
+        if not remaining:
+            break
+        a, b = (key >> 8) & 0xFF, key & 0xFF
+        if free[a] and free[b]:
+            free[a] = free[b] = False
+            order += [a, b]
+            remaining -= 1
+    
+    paired = np.zeros(entries, dtype=bool)
+    paired[order] = True
+    order += list(np.flatnonzero(~paired))
+    return np.array(order, dtype=np.int64)
@@ -0,0 +1,246 @@
+"""
+PCM WAV carrier for the steganography engine
+Frames are read and written in fixed-size chunks with the stdlib wave
+module, so recordings of any length are embedded in bounded memory.
+"""
+import os
+import time
+import wave
+from contextlib import contextmanager
+from typing import BinaryIO, Optional, Tuple
+
+import numpy as np
+
+from .steganography_engine import SteganographyEngine, _ValueStream
+
+
+class WavCarrier:
+    """
+    LSB carrier for uncompressed PCM WAV files
+    
+    Each sample is one channel value: the header and payload go into the
+    low bits of the least significant byte of consecutive samples, in the
+    same layout and with the same header as SteganographyEngine uses for
+    image channel values. 8- to 32-bit samples are handled alike, as a
+    strided view of their little-endian low bytes.
+    """
+    
+    EXTENSIONS = ['.wav', '.wave']
+    
+    # Frames are streamed in chunks of about this many bytes
+    CHUNK_BYTES = 4 * 1024 * 1024
+    
+    def __init__(self, engine: SteganographyEngine = None):
+        """
+        Args:
+            engine: Engine whose header layout, codec settings and
+                encryption key are used; a default engine if None
+        """
+        self.engine = engine or SteganographyEngine()
+    
+    @classmethod
+    def handles(cls, path: str) -> bool:
+        """Check whether a path names a WAV file by its extension"""
+        return os.path.splitext(path)[1].lower() in cls.EXTENSIONS
+    
+    def calculate_capacity(self, audio_path: str, bits_per_sample: int = 1) -> dict:
+        """
+        Calculate maximum embeddable data size
+        
+        Args:
+            audio_path: Path to cover WAV file
+            bits_per_sample: How many LSBs to use (1-3)
+        
+        Returns:
+            Dictionary with capacity information
+        """
+        try:
+            with wave.open(audio_path, 'rb') as reader:
+                params = reader.getparams()
+        except Exception as e:
+            raise ValueError(f"Capacity calculation failed: {str(e)}")
+        
+        samples = params.nframes * params.nchannels
+        header_bits = self.engine.HEADER_BITS
+        available_bits = max(0, (samples - header_bits) * bits_per_sample)
+        
+        return {
+            'samples': samples,
+            'channels': params.nchannels,
+            'sample_width': params.sampwidth,
+            'frame_rate': params.framerate,
+            'duration': params.nframes / max(1, params.framerate),
+            'bits_per_sample': bits_per_sample,
+            'available_bytes': available_bits // 8,
+            'available_bits': available_bits,
+            'header_bits': header_bits
+        }
+    
+    def embed_data(self, cover_audio_path: str, secret_data: bytes, output_path: str,
+                   bits_per_sample: int = 1, use_compression: bool = True,
+                   container: bool = False) -> Tuple[bool, str]:
+        """
+        Embed secret data into a WAV file
+        
+        Only the chunks holding the header and payload go through NumPy;
+        the rest of the frames are copied through unchanged.
+        
+        Args:
+            cover_audio_path: Path to cover WAV file
+            secret_data: Bytes to hide
+            output_path: Output stego WAV path
+            bits_per_sample: Number of LSBs to modify
+            use_compression: Whether to compress data before embedding
+            container: secret_data is a file container from _build_container
+        
+        Returns:
+            Tuple of (success, message)
+        """
+        start_time = time.time()
+        
+        try:
+            if bits_per_sample not in [1, 2, 3]:
+                return False, "Bits per sample must be 1, 2, or 3"
+            if self.engine.scatter_key:
+                return False, "Scattered embedding is not supported for audio carriers"
+            if self.engine.adaptive:
+                return False, "Adaptive embedding is not supported for audio carriers"
+            if self.engine.matrix_k:
+                return False, "Matrix embedding is not supported for audio carriers"
+            if os.path.abspath(cover_audio_path) == os.path.abspath(output_path):
+                return False, "Output path must differ from the cover"
+            
+            engine = self.engine
+            header, secret_data = engine._pipeline().pack(secret_data, bits_per_sample,
+                                                          use_compression, container)
+            capacity_info = self.calculate_capacity(cover_audio_path, bits_per_sample)
+            required_bits = len(secret_data) * 8
+            if required_bits > capacity_info['available_bits']:
+                return False, f"Data too large. Available: {capacity_info['available_bytes']}B, Required: {len(header) + len(secret_data)}B"
+            
+            header_bits = engine._bytes_to_bit_array(header)
+            symbols = engine._bits_to_symbols(engine._bytes_to_bit_array(secret_data),
+                                              bits_per_sample)
+            used_values = len(header_bits) + len(symbols)
+            
+            with wave.open(cover_audio_path, 'rb') as reader, \
+                    wave.open(output_path, 'wb') as writer:
+                params = reader.getparams()
+                writer.setparams(params)
+                frames_per_chunk = self._frames_per_chunk(params)
+                offset = 0
+                
+                while True:
+                    frames = reader.readframes(frames_per_chunk)
+                    if not frames:
+                        break
+                    if offset < used_values:
+                        frames = bytearray(frames)
+                        values = self._low_bytes(frames, params.sampwidth)
+                        engine._embed_segment(values, offset, header_bits, symbols,
+                                              bits_per_sample)
+                        offset += len(values)
+                    writer.writeframes(frames)
+            
+            elapsed_time = time.time() - start_time
+            
+            return True, f"Embedding successful! Output: {output_path}\n" \
+                        f"Data size: {len(secret_data)} bytes\n" \
+                        f"Capacity used: {(required_bits/max(1, capacity_info['available_bits']))*100:.1f}%\n" \
+                        f"Samples rewritten: {min(used_values, capacity_info['samples']):,} of {capacity_info['samples']:,}\n" \
+                        f"Time: {elapsed_time:.2f}s"
+        
+        except Exception as e:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            return False, f"Embedding failed: {str(e)}"
+    
+    def extract_data(self, stego_audio_path: str) -> Tuple[Optional[bytes], str]:
+        """
+        Extract hidden data from a WAV file
+        
+        Frames after the payload are never read.
+        
+        Args:
+            stego_audio_path: Path to stego WAV file
+        
+        Returns:
+            Tuple of (extracted_data, message)
+        """
+        start_time = time.time()
+        engine = self.engine
+        
+        try:
+            with self._open_value_stream(stego_audio_path) as (values, total_values):
+                header_info = engine._read_header(values, total_values)
+                payload = engine._read_payload_bytes(values, header_info, 0,
+                                                     header_info['data_length'])
+            extracted_bytes = engine._pipeline().unpack(payload, header_info)
+        
+        except ValueError as e:
+            return None, str(e)
+        except Exception as e:
+            return None, f"Extraction failed: {str(e)}"
+        
+        elapsed_time = time.time() - start_time
+        
+        return extracted_bytes, f"Extraction successful!\n" \
+                               f"Data size: {len(extracted_bytes)} bytes\n" \
+                               f"Time: {elapsed_time:.2f}s"
+    
+    def extract_stream(self, stego_audio_path: str,
+                       writer: BinaryIO) -> Tuple[Optional[int], str]:
+        """
+        Extract hidden data from a WAV file into a file object in bounded memory
+        
+        Args:
+            stego_audio_path: Path to stego WAV file
+            writer: Binary file object the payload is written to
+        
+        Returns:
+            Tuple of (number of bytes written, message)
+        """
+        start_time = time.time()
+        
+        try:
+            with self._open_value_stream(stego_audio_path) as (values, total_values):
+                header_info = self.engine._read_header(values, total_values)
+                written = self.engine._write_payload_stream(values, header_info, writer)
+        except ValueError as e:
+            return None, str(e)
+        except Exception as e:
+            return None, f"Extraction failed: {str(e)}"
+        
+        elapsed_time = time.time() - start_time
+        
+        return written, f"Extraction successful!\n" \
+                       f"Data size: {written} bytes\n" \
+                       f"Time: {elapsed_time:.2f}s"
+    
+    @contextmanager
+    def _open_value_stream(self, audio_path: str):
+        """
+        Open a WAV file as a lazy stream of sample low bytes
+        
+        Yields:
+            Tuple of (_ValueStream, total number of samples)
+        """
+        with wave.open(audio_path, 'rb') as reader:
+            params = reader.getparams()
+            frames_per_chunk = self._frames_per_chunk(params)
+            chunks = iter(lambda: reader.readframes(frames_per_chunk), b'')
+            values = _ValueStream(self._low_bytes(frames, params.sampwidth) for frames in chunks)
+            yield values, params.nframes * params.nchannels
+    
+    def _frames_per_chunk(self, params) -> int:
+        """Number of frames read or written at a time"""
+        return max(1, self.CHUNK_BYTES // (params.sampwidth * params.nchannels))
+    
+    def _low_bytes(self, frames, sample_width: int) -> np.ndarray:
+        """
+        Strided view of the least significant byte of each sample
+        
+        WAV samples are little-endian, so that is every sample_width-th
+        byte; the view is writable when frames is a bytearray.
+        """
+        return np.frombuffer(frames, dtype=np.uint8)[::sample_width]
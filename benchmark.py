@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks for the steganography engine
+Run: python benchmark.py [--size 1000x1000] [--payload 65536]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.steganography_engine import SteganographyEngine
+
+
+def _time_call(func, *args, repeat: int = 3) -> float:
+    """Return the best wall-clock time of several runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _parse_size(value: str):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def bench_embed_kernels(engine: SteganographyEngine, size, payload_size: int):
+    """Compare the reference loop with the vectorized and packed embedders"""
+    width, height = size
+    img_array = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+    payload = os.urandom(payload_size)
+    header = b'\x00' * (engine.HEADER_BITS // 8)
+    
+    print(f"Embed kernel: {width}x{height} RGB, payload {payload_size:,} bytes")
+    print(f"{'bits':<6} {'loop (s)':>10} {'vectorized (s)':>16} {'speedup':>10} {'packed (s)':>12}")
+    
+    for bits in [1, 2, 3]:
+        loop_time = _time_call(engine._embed_bits_safe, img_array,
+                               engine._bytes_to_bits(payload), bits, repeat=1)
+        vec_time = _time_call(engine._embed_bits_vectorized, img_array,
+                              engine._bytes_to_bit_array(payload), bits)
+        packed_time = _time_call(engine._embed_payload_vectorized, img_array,
+                                 header, payload, bits)
+        print(f"{bits:<6} {loop_time:>10.3f} {vec_time:>16.4f} "
+              f"{loop_time / vec_time:>9.0f}x {packed_time:>12.4f}")
+    print()
+
+
+def bench_parallel(values: int = 64 * 1024 * 1024):
+    """Embed and extract a payload filling a large region with 1..16 workers"""
+    img_array = np.random.randint(0, 256, values, dtype=np.uint8)
+    payload = os.urandom((values - 40) // 8)
+    header = b'\x00' * 5
+    
+    print(f"Parallel tiles: {values:,} channel values, payload {len(payload):,} bytes, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'backend':<9} {'workers':>8} {'embed (s)':>10} {'extract (s)':>12}")
+    
+    for backend, workers in [('thread', 1), ('thread', 2), ('thread', 4), ('thread', 8),
+                             ('thread', 16), ('process', 16)]:
+        engine = SteganographyEngine()
+        engine.max_threads = workers
+        engine.parallel_backend = backend
+        embed_time = _time_call(engine._embed_payload_vectorized, img_array, header,
+                                payload, 1, True)
+        extract_time = _time_call(engine._extract_payload_parallel, img_array[40:],
+                                  len(payload) * 8, 1)
+        print(f"{backend:<9} {workers:>8} {embed_time:>10.3f} {extract_time:>12.3f}")
+    print()
+
+
+def bench_early_exit(size):
+    """Extract a short message from a large stego PNG with and without early exit"""
+    from PIL import Image
+    
+    width, height = size
+    cover_path = tempfile.mktemp(suffix='.png')
+    stego_path = tempfile.mktemp(suffix='.png')
+    
+    try:
+        img_array = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+        Image.fromarray(img_array, 'RGB').save(cover_path, compress_level=1)
+        del img_array
+        
+        engine = SteganographyEngine()
+        ok, message = engine.embed_data(cover_path, b'short secret message', stego_path)
+        assert ok, message
+        
+        early_time = _time_call(engine.extract_data, stego_path)
+        engine.EARLY_EXIT_MAX_FRACTION = 0
+        full_time = _time_call(engine.extract_data, stego_path)
+        
+        print(f"Short message extraction: {width}x{height} RGB PNG")
+        print(f"Full decode: {full_time:.3f}s, early exit: {early_time:.4f}s")
+        print()
+    finally:
+        for path in [cover_path, stego_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def bench_output_profiles(size):
+    """Encode time against file size for each output encoder profile"""
+    from PIL import Image
+    
+    width, height = size
+    engine = SteganographyEngine()
+    img_array = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+    # Smooth gradient cover so the lossless codecs have something to compress
+    img_array //= 8
+    img_array += (np.arange(width, dtype=np.uint16) * 200 // max(1, width - 1)).astype(np.uint8)[:, None]
+    stego_array = engine._embed_payload_vectorized(img_array, b'\x00' * 5,
+                                                   os.urandom(width * height // 8), 1)
+    stego_image = Image.fromarray(stego_array, 'RGB')
+    raw_size = stego_array.nbytes
+    
+    print(f"Output profiles: {width}x{height} RGB stego image, 1 bit/value payload")
+    print(f"{'profile':<15} {'encode (s)':>11} {'size (KB)':>11} {'ratio':>7}")
+    
+    for profile, (image_format, extension, options) in engine.OUTPUT_PROFILES.items():
+        output_path = tempfile.mktemp(suffix=extension)
+        try:
+            encode_time = _time_call(
+                lambda: stego_image.save(output_path, format=image_format, **options))
+            file_size = os.path.getsize(output_path)
+            print(f"{profile:<15} {encode_time:>11.3f} {file_size / 1024:>11.0f} "
+                  f"{file_size / raw_size:>7.2f}")
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+    print()
+
+
+def bench_png_writer(size):
+    """Pillow's single-threaded PNG save against the block-parallel writer"""
+    from PIL import Image
+    
+    width, height = size
+    img_array = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+    img_array[:height // 2] //= 16
+    output_path = tempfile.mktemp(suffix='.png')
+    
+    print(f"PNG writer: {width}x{height} RGB, compress_level 6, {os.cpu_count()} CPUs")
+    print(f"{'writer':<18} {'save (s)':>9} {'size (KB)':>11}")
+    
+    try:
+        image = Image.fromarray(img_array, 'RGB')
+        pillow_time = _time_call(lambda: image.save(output_path, format='PNG'))
+        print(f"{'Pillow':<18} {pillow_time:>9.3f} {os.path.getsize(output_path) / 1024:>11.0f}")
+        
+        for threads in [1, 2, 4, 8]:
+            engine = SteganographyEngine()
+            engine.max_threads = threads
+            engine.PARALLEL_MIN_VALUES = 0
+            save_time = _time_call(engine._save_png_parallel, img_array, output_path,
+                                   'RGB', {})
+            print(f"{f'parallel x{threads}':<18} {save_time:>9.3f} "
+                  f"{os.path.getsize(output_path) / 1024:>11.0f}")
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+    print()
+
+
+def bench_codec_probe(payload_size: int = 8 * 1024 * 1024):
+    """Blind zlib against the probing codec selection on random and text payloads"""
+    import zlib
+    
+    engine = SteganographyEngine()
+    text = (b"The quick brown fox jumps over the lazy dog. " * (payload_size // 45 + 1))
+    payloads = [('random', os.urandom(payload_size)), ('text', text[:payload_size])]
+    
+    print(f"Codec selection: {payload_size:,} byte payloads")
+    print(f"{'payload':<9} {'zlib (s)':>9} {'probe+compress (s)':>19} {'codec':>6} {'ratio':>7}")
+    
+    for label, data in payloads:
+        zlib_time = _time_call(zlib.compress, data, engine.compression_level, repeat=1)
+        probe_time = _time_call(engine._compress, data, repeat=1)
+        codec, stored = engine._compress(data)
+        print(f"{label:<9} {zlib_time:>9.3f} {probe_time:>19.3f} {codec.name:>6} "
+              f"{len(stored) / len(data):>7.3f}")
+    print()
+
+
+def bench_payload_pipeline(payload_size: int = 1024 * 1024):
+    """Encrypt-then-compress (the old caller order) against the engine pipeline"""
+    from src.encryption_manager import EncryptionManager
+    
+    key = EncryptionManager().generate_key()
+    text = (b"The quick brown fox jumps over the lazy dog. " * (payload_size // 45 + 1))
+    data = text[:payload_size]
+    
+    legacy = SteganographyEngine()
+    pipeline = SteganographyEngine(encryption_key=key)._pipeline()
+    
+    def encrypt_then_compress():
+        token, _ = EncryptionManager().encrypt_data(data, key=key)
+        return legacy._pipeline().pack(token, 1)
+    
+    print(f"Payload pipeline: {payload_size:,} byte text payload")
+    print(f"{'order':<22} {'time (s)':>9} {'embedded bytes':>15}")
+    for label, func in [('encrypt, compress', encrypt_then_compress),
+                        ('compress, encrypt', lambda: pipeline.pack(data, 1))]:
+        elapsed = _time_call(func, repeat=1)
+        header, payload = func()
+        print(f"{label:<22} {elapsed:>9.3f} {len(payload):>15,}")
+    print()
+
+
+def bench_span(size, covers: int = 4):
+    """Spanning one payload across several covers against embedding one shard"""
+    import shutil
+    from PIL import Image
+    
+    width, height = size
+    engine = SteganographyEngine()
+    work_dir = tempfile.mkdtemp()
+    
+    try:
+        cover_paths = []
+        for index in range(covers):
+            cover_paths.append(os.path.join(work_dir, f"cover{index}.png"))
+            Image.fromarray(np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)).save(
+                cover_paths[-1], compress_level=1)
+        shard_size = engine.calculate_capacity(cover_paths[0])['available_bytes'] * 9 // 10
+        payload = os.urandom(shard_size * covers)
+        
+        single_time = _time_call(engine.embed_data, cover_paths[0], payload[:shard_size],
+                                 os.path.join(work_dir, 'single.png'), 1, False, repeat=1)
+        span_time = _time_call(engine.embed_span, cover_paths, payload, work_dir, 1, False,
+                               repeat=1)
+        
+        print(f"Spanning: {covers} covers of {width}x{height}, {len(payload):,} byte payload "
+              f"(max_threads={engine.max_threads}, {os.cpu_count()} CPUs)")
+        print(f"One shard: {single_time:.3f}s  Whole set: {span_time:.3f}s")
+        print()
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def bench_scatter(size, payload_size: int):
+    """Sequential against keyed scattered embedding of the same payload"""
+    from src.embedding_order import KeyedPermutation
+    
+    width, height = size
+    img_array = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+    payload = os.urandom(payload_size)
+    header = b'\x00' * (SteganographyEngine.HEADER_BITS // 8)
+    
+    engine = SteganographyEngine()
+    sequential_time = _time_call(engine._embed_payload_vectorized, img_array, header,
+                                 payload, 1)
+    engine.scatter_key = b'benchmark key'
+    scattered_time = _time_call(lambda: engine._embed_scattered(
+        img_array.copy().reshape(-1), header, payload, 1))
+    
+    # Only the payload's own positions are generated, however large the image
+    order = KeyedPermutation(b'benchmark key', 100_000_000)
+    prefix_time = _time_call(order.positions, 0, payload_size * 8)
+    
+    print(f"Scattered order: {width}x{height} RGB, {payload_size:,} byte payload")
+    print(f"Sequential: {sequential_time:.3f}s  Scattered: {scattered_time:.3f}s  "
+          f"Positions in a 100M-value image: {prefix_time:.3f}s")
+    print()
+
+
+def bench_matrix(size=(6000, 4000)):
+    """Plain LSB against Hamming matrix embedding, each filling a 24 MP cover"""
+    width, height = size
+    cover = np.random.randint(0, 256, width * height * 3, dtype=np.uint8)
+    header = b'\x00' * (SteganographyEngine.HEADER_BITS // 8)
+    header_bits = len(header) * 8
+    engine = SteganographyEngine()
+    
+    print(f"Matrix embedding: {width}x{height} RGB, payload filling the cover")
+    print(f"{'code':<6} {'payload (MB)':>13} {'changes/bit':>12} {'embed (s)':>10} "
+          f"{'cover MB/s':>11} {'payload MB/s':>13} {'extract (s)':>12}")
+    for matrix_k in [0] + SteganographyEngine.MATRIX_CODES:
+        values = cover.copy()
+        if matrix_k:
+            payload = os.urandom(engine._matrix_bits(len(cover) - header_bits, matrix_k) // 8)
+            header_info = {'matrix_k': matrix_k, 'data_length': len(payload),
+                           'header_bits': header_bits, 'bits_per_pixel': 1}
+            embed = lambda: engine._embed_matrix(values, header, payload, matrix_k)
+            extract = lambda: engine._extract_matrix(values, header_info)
+        else:
+            payload = os.urandom((len(cover) - header_bits) // 8)
+            embed = lambda: (engine._embed_region(values, header, 1),
+                             engine._embed_region(values, payload, 1, header_bits))
+            extract = lambda: engine._extract_region(values, len(payload) * 8, 1, header_bits)
+        
+        # Every run starts from the cover, or re-embedding would change nothing
+        embed_time = float('inf')
+        for _ in range(3):
+            np.copyto(values, cover)
+            embed_time = min(embed_time, _time_call(embed, repeat=1))
+        changes = np.count_nonzero(values[header_bits:] != cover[header_bits:])
+        extract_time = _time_call(extract)
+        
+        label = f"k={matrix_k}" if matrix_k else "plain"
+        print(f"{label:<6} {len(payload) / 1e6:>13.2f} {changes / (len(payload) * 8):>12.3f} "
+              f"{embed_time:>10.3f} {len(cover) / 1e6 / embed_time:>11.0f} "
+              f"{len(payload) / 1e6 / embed_time:>13.1f} {extract_time:>12.3f}")
+    print()
+
+
+def bench_cost_map(size=(6000, 4000)):
+    """Adaptive embedding: cost map, its cache and pixel selection on a 24 MP cover"""
+    from PIL import Image
+    from src.utils import calculate_file_hash
+    
+    width, height = size
+    img_array = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+    cover_path = tempfile.mktemp(suffix='.bmp')
+    
+    try:
+        Image.fromarray(img_array).save(cover_path)
+        engine = SteganographyEngine()
+        cold_time = _time_call(engine._cost_map, img_array, 1, repeat=1)
+        cover_hash = calculate_file_hash(cover_path)
+        engine._cost_map(img_array, 1, cover_hash)
+        cached_time = _time_call(lambda: engine._cost_map(
+            img_array, 1, calculate_file_hash(cover_path)))
+        cost = engine._cost_map(img_array, 1, cover_hash)
+        select_time = _time_call(engine._adaptive_pixels, cost, 54, width * height // 4)
+        
+        print(f"Cost map: {width}x{height} RGB ({width * height / 1e6:.0f} MP)")
+        print(f"Compute: {cold_time:.3f}s  Cached (hash + lookup): {cached_time:.3f}s  "
+              f"Select 25% of pixels: {select_time:.3f}s")
+        print()
+    finally:
+        if os.path.exists(cover_path):
+            os.remove(cover_path)
+
+
+def bench_jpeg(size):
+    """Coefficient decode/encode throughput and stego size of a JPEG cover"""
+    from PIL import Image
+    from src.jpeg_carrier import JpegCarrier
+    from src.jpeg_coefficients import JpegCoefficients
+    
+    width, height = size
+    cover_path = tempfile.mktemp(suffix='.jpg')
+    jpeg_path = tempfile.mktemp(suffix='.jpg')
+    png_path = tempfile.mktemp(suffix='.png')
+    
+    try:
+        # Photo-like cover: smooth gradients plus sensor-style noise
+        y, x = np.mgrid[0:height, 0:width]
+        base = (np.sin(x / 17) + np.cos(y / 23)) * 60 + 128
+        pixels = np.stack([base, base[::-1], base[:, ::-1]], axis=-1) + \
+            np.random.normal(0, 8, (height, width, 3))
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(cover_path, quality=90)
+        del y, x, base, pixels
+        
+        with open(cover_path, 'rb') as f:
+            data = f.read()
+        decode_time = _time_call(JpegCoefficients, data, repeat=1)
+        jpeg = JpegCoefficients(data)
+        encode_time = _time_call(jpeg.to_bytes, repeat=1)
+        
+        carrier = JpegCarrier()
+        payload = os.urandom(carrier.calculate_capacity(cover_path)['available_bytes'] // 2)
+        jpeg_time = _time_call(carrier.embed_data, cover_path, payload, jpeg_path, 1, False,
+                               repeat=1)
+        png_time = _time_call(SteganographyEngine().embed_data, cover_path, payload, png_path,
+                              1, False, repeat=1)
+        
+        megabytes = len(data) / (1024 * 1024)
+        print(f"JPEG coefficients: {width}x{height} quality 90, {len(data):,} bytes, "
+              f"{len(jpeg.coefficients):,} blocks")
+        print(f"Decode: {decode_time:.3f}s ({megabytes / decode_time:.2f} MB/s)  "
+              f"Encode: {encode_time:.3f}s ({megabytes / encode_time:.2f} MB/s)")
+        print(f"{len(payload):,} byte payload:")
+        print(f"{'carrier':<18} {'embed (s)':>10} {'output (KB)':>12}")
+        print(f"{'JPEG coefficients':<18} {jpeg_time:>10.3f} {os.path.getsize(jpeg_path) / 1024:>12.0f}")
+        print(f"{'PNG pixels':<18} {png_time:>10.3f} {os.path.getsize(png_path) / 1024:>12.0f}")
+        print()
+    finally:
+        for path in [cover_path, jpeg_path, png_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def bench_animation(size=(480, 360), frames: int = 48):
+    """Animated GIF and APNG embed/extract time against the number of worker threads"""
+    from PIL import Image
+    from src.animation_carrier import AnimationCarrier
+    
+    width, height = size
+    paths = {name: (tempfile.mktemp(suffix=suffix), tempfile.mktemp(suffix=suffix))
+             for name, suffix in [('GIF', '.gif'), ('APNG', '.png')]}
+    
+    try:
+        y, x = np.mgrid[0:height, 0:width]
+        images = []
+        for frame in range(frames):
+            pixels = np.stack([(x + frame * 7) % 256, (y + frame * 3) % 256,
+                               (x + y) % 256], axis=-1) + np.random.normal(0, 6, (height, width, 3))
+            images.append(Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)))
+        del y, x, pixels
+        palette_images = [image.quantize(256) for image in images]
+        palette_images[0].save(paths['GIF'][0], save_all=True,
+                               append_images=palette_images[1:], duration=40, loop=0)
+        images[0].save(paths['APNG'][0], save_all=True, append_images=images[1:], duration=40)
+        del images, palette_images
+        
+        print(f"Animation carrier: {frames} frames of {width}x{height}, payload filling the "
+              f"cover, {os.cpu_count()} CPU(s)")
+        print(f"{'format':<6} {'threads':>8} {'payload (KB)':>13} {'embed (s)':>10} "
+              f"{'extract (s)':>12}")
+        for name, (cover_path, output_path) in paths.items():
+            for threads in sorted({1, os.cpu_count() or 1, 4}):
+                engine = SteganographyEngine()
+                engine.max_threads = threads
+                carrier = AnimationCarrier(engine)
+                payload = os.urandom(carrier.calculate_capacity(cover_path)['available_bytes'])
+                embed_time = _time_call(carrier.embed_data, cover_path, payload, output_path,
+                                        1, False, repeat=1)
+                extract_time = _time_call(carrier.extract_data, output_path, repeat=1)
+                print(f"{name:<6} {threads:>8} {len(payload) / 1024:>13.0f} "
+                      f"{embed_time:>10.3f} {extract_time:>12.3f}")
+        print()
+    finally:
+        for path in [path for pair in paths.values() for path in pair]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+_PEAK_RSS_SCRIPT = """
+import resource, sys
+sys.path.insert(0, sys.argv[1])
+from src.steganography_engine import SteganographyEngine
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+ok, message = SteganographyEngine().embed_data(sys.argv[2], b'x' * 4096, sys.argv[3],
+                                               use_compression=False)
+assert ok, message
+print(before, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def bench_embed_memory(size):
+    """Measure the peak RSS of a full embed_data call in a fresh process"""
+    from PIL import Image
+    
+    width, height = size
+    cover_path = tempfile.mktemp(suffix='.png')
+    output_path = tempfile.mktemp(suffix='.png')
+    
+    try:
+        img_array = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+        Image.fromarray(img_array, 'RGB').save(cover_path, compress_level=1)
+        del img_array
+        
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        result = subprocess.run([sys.executable, '-c', _PEAK_RSS_SCRIPT, root,
+                                 cover_path, output_path],
+                                capture_output=True, text=True, check=True)
+        baseline_kb, peak_kb = map(int, result.stdout.split())
+        
+        image_mb = width * height * 3 / (1024 * 1024)
+        print(f"Embed memory: {width}x{height} RGB ({image_mb:.0f} MB of pixels)")
+        print(f"Peak RSS: {peak_kb / 1024:.0f} MB "
+              f"({(peak_kb - baseline_kb) / 1024:.0f} MB above interpreter baseline)")
+        print()
+    finally:
+        for path in [cover_path, output_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Steganography engine benchmarks")
+    parser.add_argument('--size', type=_parse_size, default=(1000, 1000),
+                        help='Cover size as WIDTHxHEIGHT (default: 1000x1000)')
+    parser.add_argument('--payload', type=int, default=64 * 1024,
+                        help='Payload size in bytes (default: 65536)')
+    args = parser.parse_args()
+    
+    engine = SteganographyEngine()
+    bench_embed_kernels(engine, args.size, args.payload)
+    bench_embed_memory(args.size)
+    bench_parallel()
+    bench_early_exit(args.size)
+    bench_output_profiles(args.size)
+    bench_png_writer(args.size)
+    bench_codec_probe()
+    bench_payload_pipeline()
+    bench_span(args.size)
+    bench_scatter(args.size, args.payload)
+    bench_cost_map()
+    bench_matrix()
+    bench_jpeg(args.size)
+    bench_animation()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
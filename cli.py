@@ -4,11 +4,17 @@ Command Line Interface for Steganography Tool
 import argparse
 import sys
 import os
+import time
 from pathlib import Path
 from datetime import datetime
 from .steganography_engine import SteganographyEngine
+from .animation_carrier import AnimationCarrier
+from .audio_carrier import WavCarrier
+from .jpeg_carrier import JpegCarrier
 from .encryption_manager import EncryptionManager
 from .database_manager import DatabaseManager
+from .payload_codecs import CODECS
+from .utils import list_image_files
 
 
 class SteganographyCLI:
@@ -16,6 +22,9 @@ class SteganographyCLI:
     
     def __init__(self):
         self.engine = SteganographyEngine()
+        self.wav_carrier = WavCarrier(self.engine)
+        self.jpeg_carrier = JpegCarrier(self.engine)
+        self.animation_carrier = AnimationCarrier(self.engine)
         self.db_manager = DatabaseManager()
         self.session_id = f"cli_session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         self.db_manager.start_session(self.session_id, "CLI", "Steganography CLI")
@@ -23,9 +32,27 @@ class SteganographyCLI:
     def encode(self, args):
         """Encode data into image"""
         try:
+            # WAV covers, animated covers and JPEG-to-JPEG embedding go through
+            # their own carriers
+            carrier = self._carrier(args)
+            if carrier is not None and (args.files or args.stream or args.span):
+                print("Error: WAV, JPEG and animated carriers take the secret from -t or -f only")
+                return 1
+            
             # Read secret data
-            if args.text:
+            members = None
+            if args.files:
+                members = {}
+                for path in args.files:
+                    with open(path, 'rb') as f:
+                        members[os.path.basename(path)] = f.read()
+                secret_data = b''.join(members.values())
+            elif args.text:
                 secret_data = args.text.encode('utf-8')
+            elif args.file and not (args.password or args.stream or args.span or args.scatter_key
+                                    or args.adaptive or args.matrix or carrier):
+                # Streamed from disk by embed_stream in bounded memory
+                secret_data = None
             elif args.file:
                 with open(args.file, 'rb') as f:
                     secret_data = f.read()
@@ -33,42 +60,96 @@ class SteganographyCLI:
                 print("Error: No secret data provided")
                 return 1
             
-            # Apply encryption if requested
+            # The engine encrypts after compressing (per member for containers)
             if args.password:
-                encryption_mgr = EncryptionManager(args.password)
-                encrypted_data, key = encryption_mgr.encrypt_data(secret_data)
-                secret_data = encrypted_data
-                print(f"Encryption key (save this!): {key.hex()}")
+                self.engine.encryption_key = self._encryption_key(args)
+                print(f"Encryption key (save this!): {self.engine.encryption_key.hex()}")
+            
+            self.engine.codec = args.codec
+            self.engine.scatter_key = self._scatter_key(args)
+            self.engine.exclude_alpha = args.skip_alpha
+            self.engine.adaptive = args.adaptive
+            self.engine.matrix_k = args.matrix or 0
+            
+            if args.span:
+                return self._encode_span(args, secret_data)
             
             # Determine output path
             if args.output:
                 output_path = args.output
             else:
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                output_path = f"stego_{timestamp}.png"
+                extension = self.engine.OUTPUT_PROFILES[args.profile or self.engine.output_profile][1]
+                if carrier is self.wav_carrier:
+                    extension = '.wav'
+                elif carrier is self.jpeg_carrier:
+                    extension = '.jpg'
+                elif carrier is self.animation_carrier:
+                    extension = carrier.output_extension(args.image)
+                output_path = f"stego_{timestamp}{extension}"
             
             # Encode data
             print(f"Encoding data into {args.image}...")
-            success, message = self.engine.embed_data(
-                cover_image_path=args.image,
-                secret_data=secret_data,
-                output_path=output_path,
-                bits_per_pixel=args.bits,
-                use_compression=not args.no_compress
-            )
+            if members is not None:
+                success, message = self.engine.embed_files(
+                    cover_image_path=args.image,
+                    files=members,
+                    output_path=output_path,
+                    bits_per_pixel=args.bits,
+                    use_compression=not args.no_compress,
+                    output_profile=args.profile
+                )
+            elif secret_data is None:
+                with open(args.file, 'rb') as reader:
+                    success, message = self.engine.embed_stream(
+                        cover_image_path=args.image,
+                        reader=reader,
+                        output_path=output_path,
+                        bits_per_pixel=args.bits,
+                        use_compression=not args.no_compress,
+                        output_profile=args.profile
+                    )
+            elif carrier is not None:
+                success, message = carrier.embed_data(args.image, secret_data, output_path,
+                                                      args.bits, not args.no_compress)
+            elif args.stream:
+                success, message = self.engine.embed_data_streaming(
+                    cover_image_path=args.image,
+                    secret_data=secret_data,
+                    output_path=output_path,
+                    bits_per_pixel=args.bits,
+                    use_compression=not args.no_compress,
+                    memory_budget=args.memory_mb * 1024 * 1024
+                )
+            else:
+                success, message = self.engine.embed_data(
+                    cover_image_path=args.image,
+                    secret_data=secret_data,
+                    output_path=output_path,
+                    bits_per_pixel=args.bits,
+                    use_compression=not args.no_compress,
+                    output_profile=args.profile
+                )
             
             # Log operation
             metadata = {
                 'bits_per_pixel': args.bits,
                 'compression': not args.no_compress,
-                'encryption': bool(args.password)
+                'codec': args.codec,
+                'encryption': bool(args.password),
+                'scatter': bool(args.scatter_key),
+                'skip_alpha': args.skip_alpha,
+                'adaptive': args.adaptive,
+                'matrix_k': args.matrix,
+                'output_profile': args.profile,
+                'members': list(members) if members is not None else None
             }
             
             self.db_manager.log_operation(
                 operation_type='embed',
                 input_file=args.image,
                 output_file=output_path,
-                data_size=len(secret_data),
+                data_size=len(secret_data) if secret_data is not None else os.path.getsize(args.file),
                 encryption_used=bool(args.password),
                 success=success,
                 metadata=metadata
@@ -85,51 +166,104 @@ class SteganographyCLI:
             print(f"Error: {str(e)}")
             return 1
     
+    def _carrier(self, args):
+        """Carrier for a WAV or animated cover or JPEG-to-JPEG embedding, None for the image engine"""
+        if args.image is None:
+            return None
+        if WavCarrier.handles(args.image):
+            return self.wav_carrier
+        if AnimationCarrier.handles(args.image):
+            return self.animation_carrier
+        # JPEG covers stay JPEGs unless a lossless output, or more than the
+        # 1 bit per coefficient a JPEG carries, is asked for
+        if JpegCarrier.handles(args.image) and \
+                (JpegCarrier.handles(args.output) if args.output
+                 else not args.profile and args.bits == 1):
+            return self.jpeg_carrier
+        return None
+    
+    def _encode_span(self, args, secret_data: bytes):
+        """Split secret data across the covers given with --span"""
+        if args.files:
+            print("Error: --span takes the secret from -t or -f")
+            return 1
+        
+        covers = list_image_files(args.span)
+        output_dir = args.output or '.'
+        os.makedirs(output_dir, exist_ok=True)
+        print(f"Spanning data across {len(covers)} candidate covers...")
+        success, message = self.engine.embed_span(
+            cover_paths=covers,
+            secret_data=secret_data,
+            output_dir=output_dir,
+            bits_per_pixel=args.bits,
+            use_compression=not args.no_compress,
+            output_profile=args.profile
+        )
+        
+        self.db_manager.log_operation(
+            operation_type='embed',
+            input_file=', '.join(covers),
+            output_file=output_dir,
+            data_size=len(secret_data),
+            encryption_used=bool(args.password),
+            success=success,
+            metadata={'bits_per_pixel': args.bits, 'codec': args.codec, 'span': True}
+        )
+        
+        if success:
+            print(f"Success! {message}")
+            return 0
+        print(f"Error: {message}")
+        return 1
+    
     def decode(self, args):
         """Decode data from image"""
         try:
             print(f"Decoding data from {args.image}...")
             
-            # Extract data
-            extracted_data, message = self.engine.extract_data(args.image)
+            # Plain output to a file is streamed to disk in bounded memory
+            self.engine.scatter_key = self._scatter_key(args)
+            carrier = self.engine
+            if WavCarrier.handles(args.image):
+                carrier = self.wav_carrier
+            elif JpegCarrier.handles(args.image):
+                carrier = self.jpeg_carrier
+            elif AnimationCarrier.handles(args.image):
+                carrier = self.animation_carrier
+            if args.output and not (args.password or args.key or args.stream or args.scatter_key):
+                with open(args.output, 'wb') as writer:
+                    written, message = carrier.extract_stream(args.image, writer)
+                if written is None:
+                    os.remove(args.output)
+                    print(f"Error: {message}")
+                    return 1
+                
+                self.db_manager.log_operation(
+                    operation_type='extract',
+                    input_file=args.image,
+                    output_file=args.output,
+                    data_size=written,
+                    encryption_used=False,
+                    success=True
+                )
+                print(f"Data written to {args.output}")
+                print(f"Success! {message}")
+                return 0
+            
+            # Extract data, decrypting it if a password or key was given
+            self.engine.encryption_key = self._encryption_key(args)
+            if args.stream and carrier is self.engine:
+                extracted_data, message = self.engine.extract_data_streaming(
+                    args.image, memory_budget=args.memory_mb * 1024 * 1024)
+            else:
+                extracted_data, message = carrier.extract_data(args.image)
             
             if extracted_data is None:
                 print(f"Error: {message}")
                 return 1
             
-            # Try decryption if password provided
-            if args.password or args.key:
-                encryption_mgr = EncryptionManager(args.password)
-                
-                if args.key:
-                    key = bytes.fromhex(args.key)
-                    decrypted_data, decrypt_msg = encryption_mgr.decrypt_data(
-                        extracted_data, key=key
-                    )
-                else:
-                    decrypted_data, decrypt_msg = encryption_mgr.decrypt_data(
-                        extracted_data, password=args.password
-                    )
-                
-                if decrypted_data:
-                    extracted_data = decrypted_data
-                    message += f"\n{decrypt_msg}"
-                else:
-                    print(f"Error: {decrypt_msg}")
-                    return 1
-            
-            # Output the data
-            if args.output:
-                with open(args.output, 'wb') as f:
-                    f.write(extracted_data)
-                print(f"Data written to {args.output}")
-            else:
-                # Try to display as text
-                try:
-                    text_data = extracted_data.decode('utf-8')
-                    print(f"Extracted text:\n{text_data}")
-                except:
-                    print(f"Binary data (hex): {extracted_data.hex()[:200]}..." if len(extracted_data) > 100 else extracted_data.hex())
+            self._write_output(args, extracted_data)
             
             # Log operation
             self.db_manager.log_operation(
@@ -147,15 +281,119 @@ class SteganographyCLI:
             print(f"Error: {str(e)}")
             return 1
     
+    def list_members(self, args):
+        """List the files in a stego container image"""
+        try:
+            members, message = self.engine.list_files(args.image)
+            if members is None:
+                print(f"Error: {message}")
+                return 1
+            
+            print(f"{'Name':<40} {'Size':>12} {'Stored':>12} {'Codec':<6}")
+            print("-" * 73)
+            codec_names = {codec_id: codec.name for codec_id, codec in CODECS.items()}
+            for member in members:
+                print(f"{member['name']:<40} {member['size']:>12,} "
+                      f"{member['stored_size']:>12,} {codec_names.get(member['codec'], '?'):<6}")
+            print(message)
+            return 0
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            return 1
+    
+    def extract(self, args):
+        """Extract one file from a stego container image, or a spanned payload"""
+        try:
+            self.engine.encryption_key = self._encryption_key(args)
+            if args.set:
+                stego_paths = list_image_files(args.set)
+                print(f"Reassembling spanned payload from {len(stego_paths)} images...")
+                extracted_data, message = self.engine.extract_span(stego_paths)
+                input_file = ', '.join(stego_paths)
+            elif args.member:
+                print(f"Extracting {args.member} from {args.image}...")
+                extracted_data, message = self.engine.extract_file(args.image, args.member)
+                input_file = args.image
+                if not args.output:
+                    args.output = os.path.basename(args.member)
+            else:
+                print("Error: -m/--member is required with -i/--image")
+                return 1
+            
+            if extracted_data is None:
+                print(f"Error: {message}")
+                return 1
+            
+            self._write_output(args, extracted_data)
+            
+            self.db_manager.log_operation(
+                operation_type='extract',
+                input_file=input_file,
+                output_file=args.output,
+                data_size=len(extracted_data),
+                encryption_used=bool(args.password or args.key),
+                success=True,
+                metadata={'member': args.member, 'span': bool(args.set)}
+            )
+            
+            print(f"Success! {message}")
+            return 0
+            
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            return 1
+    
+    def _encryption_key(self, args) -> bytes:
+        """Fernet key from the key or password given on the command line, if any"""
+        if getattr(args, 'key', None):
+            return bytes.fromhex(args.key)
+        if args.password:
+            return EncryptionManager(args.password).generate_key()
+        return None
+    
+    def _scatter_key(self, args) -> bytes:
+        """Scatter key given on the command line, if any"""
+        return args.scatter_key.encode('utf-8') if args.scatter_key else None
+    
+    def _write_output(self, args, data: bytes):
+        """Write extracted data to args.output, or print it"""
+        if args.output:
+            with open(args.output, 'wb') as f:
+                f.write(data)
+            print(f"Data written to {args.output}")
+        else:
+            # Try to display as text
+            try:
+                text_data = data.decode('utf-8')
+                print(f"Extracted text:\n{text_data}")
+            except:
+                print(f"Binary data (hex): {data.hex()[:200]}..." if len(data) > 100 else data.hex())
+    
     def capacity(self, args):
         """Calculate embedding capacity"""
+        self.engine.exclude_alpha = args.skip_alpha
+        self.engine.matrix_k = args.matrix or 0
+        if args.dir:
+            return self._plan_capacity(args)
+        
+        if WavCarrier.handles(args.image):
+            return self._audio_capacity(args)
+        if JpegCarrier.handles(args.image):
+            return self._jpeg_capacity(args)
+        if AnimationCarrier.handles(args.image):
+            return self._animation_capacity(args)
+        
         try:
-            capacity_info = self.engine.calculate_capacity(args.image, args.bits)
+            capacity_info = self.engine.calculate_capacity(args.image, args.bits or 1)
             
             print(f"Image: {args.image}")
+            print(f"Mode: {capacity_info['image_mode']}")
             print(f"Total pixels: {capacity_info['pixels']:,}")
             print(f"Channels: {capacity_info['channels']}")
             print(f"Bits per pixel: {capacity_info['bits_per_pixel']}")
+            if self.engine.matrix_k and capacity_info['bits_per_pixel'] == 1:
+                print(f"Matrix code: {self.engine.matrix_k} bits per "
+                      f"{(1 << self.engine.matrix_k) - 1} values")
             print(f"Available capacity: {capacity_info['available_bytes']:,} bytes")
             print(f"  ({capacity_info['available_bits']:,} bits)")
             print(f"Header overhead: {capacity_info['header_bits']} bits")
@@ -165,6 +403,98 @@ class SteganographyCLI:
             print(f"Error: {str(e)}")
             return 1
     
+    def _audio_capacity(self, args):
+        """Calculate embedding capacity of a WAV cover"""
+        try:
+            capacity_info = self.wav_carrier.calculate_capacity(args.image, args.bits or 1)
+            
+            print(f"Audio: {args.image}")
+            print(f"Samples: {capacity_info['samples']:,} "
+                  f"({capacity_info['channels']} channel(s), "
+                  f"{capacity_info['sample_width'] * 8}-bit, "
+                  f"{capacity_info['duration']:.1f}s)")
+            print(f"Bits per sample: {capacity_info['bits_per_sample']}")
+            print(f"Available capacity: {capacity_info['available_bytes']:,} bytes")
+            print(f"  ({capacity_info['available_bits']:,} bits)")
+            print(f"Header overhead: {capacity_info['header_bits']} bits")
+            
+            return 0
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            return 1
+    
+    def _jpeg_capacity(self, args):
+        """Calculate embedding capacity of a JPEG cover, kept as JPEG or made lossless"""
+        try:
+            capacity_info = self.jpeg_carrier.calculate_capacity(args.image)
+            lossless_info = self.engine.calculate_capacity(args.image, args.bits or 1)
+            
+            print(f"Image: {args.image}")
+            print(f"Size: {capacity_info['width']}x{capacity_info['height']}, "
+                  f"{capacity_info['components']} component(s), "
+                  f"{capacity_info['blocks']:,} blocks")
+            print(f"Usable coefficients: {capacity_info['usable_coefficients']:,}")
+            print(f"Available capacity (JPEG output): {capacity_info['available_bytes']:,} bytes")
+            print(f"  ({capacity_info['available_bits']:,} bits)")
+            print(f"Available capacity (lossless output, {lossless_info['bits_per_pixel']} "
+                  f"bit(s) per pixel): {lossless_info['available_bytes']:,} bytes")
+            print(f"Header overhead: {capacity_info['header_bits']} bits")
+            
+            return 0
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            return 1
+    
+    def _animation_capacity(self, args):
+        """Calculate embedding capacity of an animated GIF or APNG cover"""
+        try:
+            capacity_info = self.animation_carrier.calculate_capacity(args.image, args.bits or 1)
+            
+            print(f"Image: {args.image}")
+            print(f"Animation: {capacity_info['format']}, {capacity_info['frames']} frames of "
+                  f"up to {capacity_info['width']}x{capacity_info['height']}")
+            print(f"Usable values: {capacity_info['values']:,}")
+            print(f"Bits per pixel: {capacity_info['bits_per_pixel']}")
+            print(f"Available capacity: {capacity_info['available_bytes']:,} bytes")
+            print(f"  ({capacity_info['available_bits']:,} bits)")
+            print(f"Header overhead: {capacity_info['header_bits']} bits")
+            
+            return 0
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            return 1
+    
+    def _plan_capacity(self, args):
+        """Scan a cover library and report the smallest covers for a payload"""
+        try:
+            start_time = time.time()
+            image_paths = list_image_files(args.dir, recursive=True)
+            covers = self.engine.read_cover_info(image_paths, self.db_manager.get_cover_info())
+            self.db_manager.store_cover_info([cover for cover in covers if not cover['cached']])
+            
+            cached = sum(cover['cached'] for cover in covers)
+            print(f"Scanned {len(covers):,} images in {time.time() - start_time:.2f}s "
+                  f"({cached:,} cached, {len(covers) - cached:,} read, "
+                  f"{len(image_paths) - len(covers):,} unreadable)")
+            
+            bits_options = [args.bits] if args.bits else [1] if args.matrix else [1, 2, 3]
+            plans = self.engine.plan_covers(covers, args.payload, bits_options, args.limit)
+            for bits_per_pixel, plan in plans.items():
+                print(f"\n{bits_per_pixel} bit(s) per pixel: {plan['fitting']:,} covers "
+                      f"hold {args.payload:,} bytes")
+                if plan['span']:
+                    if plan['covers']:
+                        print(f"  No single cover fits; {len(plan['covers'])} covers "
+                              f"together (encode --span):")
+                    else:
+                        print("  The whole library is too small")
+                for path, available in plan['covers']:
+                    print(f"  {available:>14,} B  {path}")
+            return 0
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            return 1
+    
     def history(self, args):
         """Show operation history"""
         try:
@@ -223,8 +553,22 @@ class SteganographyCLI:
 Examples:
   %(prog)s encode -i cover.png -t "secret message" -o stego.png
   %(prog)s encode -i cover.jpg -f secret.txt -p password123
+  %(prog)s encode -i photo.jpg -t "secret" -o stego.png
+  %(prog)s encode -i cover.png -F a.txt b.pdf -o bundle.png
+  %(prog)s list -i bundle.png
+  %(prog)s extract -i bundle.png -m b.pdf -o b.pdf
+  %(prog)s encode --span covers/ -f big.zip -o shards/
+  %(prog)s extract --set shards/ -o big.zip
   %(prog)s decode -i stego.png -p password123
+  %(prog)s encode -i cover.png -t "secret" --scatter-key k1 -o stego.png
+  %(prog)s decode -i stego.png --scatter-key k1
+  %(prog)s encode -i logo.png -t "secret" --skip-alpha -o stego.png
+  %(prog)s encode -i photo.png -f notes.txt --adaptive -o stego.png
+  %(prog)s encode -i photo.jpg -t "secret" --matrix 4 -o stego.jpg
+  %(prog)s encode -i song.wav -f secret.zip -o stego.wav
+  %(prog)s encode -i loop.gif -f notes.txt -o stego.gif
   %(prog)s capacity -i image.jpg --bits 2
+  %(prog)s capacity --dir library/ --payload 5000000 --limit 3
   %(prog)s history --limit 10
             """
         )
@@ -233,15 +577,40 @@ Examples:
         
         # Encode command
         encode_parser = subparsers.add_parser('encode', help='Encode data into image')
-        encode_parser.add_argument('-i', '--image', required=True, help='Cover image path')
+        cover_group = encode_parser.add_mutually_exclusive_group(required=True)
+        cover_group.add_argument('-i', '--image', help='Cover image or WAV path')
+        cover_group.add_argument('--span', nargs='+', metavar='COVER',
+                                 help='Split the secret across these covers (files or '
+                                      'directories); -o names the output directory')
         encode_parser.add_argument('-t', '--text', help='Secret text to hide')
         encode_parser.add_argument('-f', '--file', help='Secret file to hide')
+        encode_parser.add_argument('-F', '--files', nargs='+',
+                                 help='Hide several files as a container (see list/extract)')
         encode_parser.add_argument('-o', '--output', help='Output stego image path')
         encode_parser.add_argument('-p', '--password', help='Encryption password')
         encode_parser.add_argument('-b', '--bits', type=int, default=1, choices=[1, 2, 3],
-                                 help='Bits per pixel (default: 1)')
+                                 help='Bits per pixel (default: 1; JPEG covers hold 1, '
+                                      'with more the stego image is a PNG)')
         encode_parser.add_argument('--no-compress', action='store_true',
                                  help='Disable data compression')
+        encode_parser.add_argument('--codec', default='auto',
+                                 choices=['auto'] + [codec.name for codec in CODECS.values()],
+                                 help='Compression codec (default: auto, chosen by probing the payload)')
+        encode_parser.add_argument('--profile', choices=list(SteganographyEngine.OUTPUT_PROFILES),
+                                 help='Output encoder profile (default: from the output extension, else png)')
+        encode_parser.add_argument('--scatter-key',
+                                 help='Scatter the payload in a pseudo-random order derived from this key')
+        encode_parser.add_argument('--skip-alpha', action='store_true',
+                                 help='Leave the alpha channel of LA/RGBA covers untouched')
+        encode_parser.add_argument('--adaptive', action='store_true',
+                                 help='Embed in the most textured pixels first')
+        encode_parser.add_argument('--matrix', type=int, choices=range(2, 8), metavar='K',
+                                 help='Matrix embedding: k bits per 2^k-1 values with at most '
+                                      'one change (2-7, 1 bit per value only)')
+        encode_parser.add_argument('--stream', action='store_true',
+                                 help='Process the PNG cover in row strips (for very large images)')
+        encode_parser.add_argument('--memory-mb', type=int, default=64,
+                                 help='Memory budget for --stream in MB (default: 64)')
         
         # Decode command
         decode_parser = subparsers.add_parser('decode', help='Decode data from image')
@@ -249,18 +618,53 @@ Examples:
         decode_parser.add_argument('-o', '--output', help='Output file path')
         decode_parser.add_argument('-p', '--password', help='Decryption password')
         decode_parser.add_argument('-k', '--key', help='Decryption key (hex)')
+        decode_parser.add_argument('--scatter-key', help='Key the payload was scattered with')
+        decode_parser.add_argument('--stream', action='store_true',
+                                 help='Read the PNG in row strips, stopping after the payload')
+        decode_parser.add_argument('--memory-mb', type=int, default=64,
+                                 help='Memory budget for --stream in MB (default: 64)')
         
         # Capacity command
         capacity_parser = subparsers.add_parser('capacity', help='Calculate embedding capacity')
-        capacity_parser.add_argument('-i', '--image', required=True, help='Image path')
-        capacity_parser.add_argument('-b', '--bits', type=int, default=1, choices=[1, 2, 3],
-                                   help='Bits per pixel (default: 1)')
+        image_group = capacity_parser.add_mutually_exclusive_group(required=True)
+        image_group.add_argument('-i', '--image', help='Image path')
+        image_group.add_argument('--dir', nargs='+',
+                               help='Plan over every image in these directories (recursive)')
+        capacity_parser.add_argument('-b', '--bits', type=int, choices=[1, 2, 3],
+                                   help='Bits per pixel (default: 1; with --dir, all of 1-3)')
+        capacity_parser.add_argument('--payload', type=int, default=0,
+                                   help='Payload size in bytes to find covers for (with --dir)')
+        capacity_parser.add_argument('--limit', type=int, default=1,
+                                   help='Covers to list per bits per pixel (with --dir, default: 1)')
+        capacity_parser.add_argument('--skip-alpha', action='store_true',
+                                   help='Count colour channels only, as encode --skip-alpha does')
+        capacity_parser.add_argument('--matrix', type=int, choices=range(2, 8), metavar='K',
+                                   help='Count capacity with matrix code k, as encode --matrix does')
         
         # History command
         history_parser = subparsers.add_parser('history', help='Show operation history')
         history_parser.add_argument('-l', '--limit', type=int, default=20,
                                   help='Number of records to show (default: 20)')
         
+        # List command
+        list_parser = subparsers.add_parser('list', help='List files in a stego container')
+        list_parser.add_argument('-i', '--image', required=True, help='Stego image path')
+        
+        # Extract command
+        extract_parser = subparsers.add_parser('extract',
+                                             help='Extract one file from a stego container, '
+                                                  'or a spanned payload')
+        stego_group = extract_parser.add_mutually_exclusive_group(required=True)
+        stego_group.add_argument('-i', '--image', help='Stego image path')
+        stego_group.add_argument('--set', nargs='+', metavar='STEGO',
+                                 help='Reassemble a spanned payload from these images '
+                                      '(files or directories, any order)')
+        extract_parser.add_argument('-m', '--member', help='File name to extract (with -i)')
+        extract_parser.add_argument('-o', '--output',
+                                  help='Output file path (default: the member name)')
+        extract_parser.add_argument('-p', '--password', help='Decryption password')
+        extract_parser.add_argument('-k', '--key', help='Decryption key (hex)')
+        
         # Integrity command
         integrity_parser = subparsers.add_parser('integrity', help='Verify file integrity')
         integrity_parser.add_argument('-f', '--file', required=True, help='File to verify')
@@ -277,6 +681,10 @@ Examples:
             return self.encode(args)
         elif args.command == 'decode':
             return self.decode(args)
+        elif args.command == 'list':
+            return self.list_members(args)
+        elif args.command == 'extract':
+            return self.extract(args)
         elif args.command == 'capacity':
             return self.capacity(args)
         elif args.command == 'history':
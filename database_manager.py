@@ -67,6 +67,22 @@ class DatabaseManager:
             )
         ''')
         
+        # Create cover_info table caching cover reads for the capacity planner
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cover_info (
+                file_path TEXT PRIMARY KEY,
+                file_size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                image_mode TEXT NOT NULL,
+                carrier TEXT NOT NULL DEFAULT 'image',
+                carrier_values INTEGER,
+                carrier_mode TEXT,
+                computed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
         conn.commit()
         conn.close()
     
@@ -242,4 +258,54 @@ class DatabaseManager:
                 'verified': False,
                 'error': 'No stored hash found',
                 'current_hash': current_hash
-            }
\ No newline at end of file
+            }
+    
+    def get_cover_info(self) -> Dict[str, Dict]:
+        """
+        Retrieve cached cover reads
+        
+        Returns:
+            Dictionary mapping file path to size, mtime_ns, width, height,
+            image_mode, carrier, carrier_values and carrier_mode; entries
+            are only valid while size and mtime_ns still match the file
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT file_path, file_size, mtime_ns, width, height, image_mode,
+                   carrier, carrier_values, carrier_mode
+            FROM cover_info
+        ''')
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return {row[0]: {'size': row[1], 'mtime_ns': row[2], 'width': row[3],
+                         'height': row[4], 'image_mode': row[5], 'carrier': row[6],
+                         'carrier_values': row[7], 'carrier_mode': row[8]}
+                for row in rows}
+    
+    def store_cover_info(self, covers: List[Dict]):
+        """
+        Cache cover reads, replacing stale entries
+        
+        Args:
+            covers: Dictionaries with path, size, mtime_ns, width, height,
+                image_mode, carrier, carrier_values and carrier_mode (see
+                SteganographyEngine.read_cover_info)
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT OR REPLACE INTO cover_info
+            (file_path, file_size, mtime_ns, width, height, image_mode,
+             carrier, carrier_values, carrier_mode)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(cover['path'], cover['size'], cover['mtime_ns'], cover['width'],
+               cover['height'], cover['image_mode'], cover['carrier'],
+               cover['carrier_values'], cover['carrier_mode']) for cover in covers])
+        
+        conn.commit()
+        conn.close()
\ No newline at end of file
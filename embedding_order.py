@@ -0,0 +1,90 @@
+"""
+Keyed pseudo-random embedding order for scattered payloads
+A Feistel network permutes channel value indices, so position i of the
+payload can be computed for any i without materializing the whole order.
+"""
+import hashlib
+
+import numpy as np
+
+# Constants of the splitmix64 finalizer used as the Feistel round function
+_MIX_MULTIPLIER_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_MULTIPLIER_2 = np.uint64(0x94D049BB133111EB)
+
+
+class KeyedPermutation:
+    """
+    Key-seeded permutation of range(size)
+    
+    A Feistel network over the smallest bit width covering size is a
+    permutation of [0, 2**bits), with bits < 2 * size; indices that land outside
+    range(size) are fed through the network again (cycle walking) until
+    they land inside, which keeps the mapping a permutation of range(size).
+    Everything is vectorized over blocks of indices.
+    """
+    
+    ROUNDS = 4
+    
+    def __init__(self, key: bytes, size: int):
+        """
+        Args:
+            key: Secret key the order is derived from
+            size: Number of positions to permute
+        """
+        if size < 1:
+            raise ValueError("Permutation size must be positive")
+        
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        # Unbalanced halves when bits is odd; they swap widths every round
+        self.left_bits = bits // 2
+        self.right_bits = bits - self.left_bits
+        
+        # Round keys come straight from the PCG64 bit generator, whose raw
+        # stream is stable across NumPy versions
+        seed = int.from_bytes(hashlib.sha256(key).digest(), 'big')
+        self.round_keys = np.random.Generator(np.random.PCG64(seed)).bit_generator.random_raw(
+            self.ROUNDS).astype(np.uint64)
+    
+    def positions(self, start: int, stop: int) -> np.ndarray:
+        """
+        Positions of indices [start, stop) under the permutation
+        
+        Returns:
+            int64 array of distinct positions in range(size)
+        """
+        if not 0 <= start <= stop <= self.size:
+            raise ValueError("Index range outside the permutation")
+        
+        positions = self._feistel(np.arange(start, stop, dtype=np.uint64))
+        outside = np.flatnonzero(positions >= self.size)
+        while len(outside):
+            walked = self._feistel(positions[outside])
+            positions[outside] = walked
+            outside = outside[walked >= self.size]
+        return positions.astype(np.int64)
+    
+    def _feistel(self, values: np.ndarray) -> np.ndarray:
+        """One pass of the Feistel network over an array of indices"""
+        left_bits, right_bits = self.left_bits, self.right_bits
+        left = values >> np.uint64(right_bits)
+        right = values & np.uint64((1 << right_bits) - 1)
+        for round_key in self.round_keys:
+            mixed = right ^ round_key
+            self._mix(mixed)
+            mixed &= np.uint64((1 << left_bits) - 1)
+            mixed ^= left
+            left, right = right, mixed
+            left_bits, right_bits = right_bits, left_bits
+        left <<= np.uint64(right_bits)
+        left |= right
+        return left
+    
+    @staticmethod
+    def _mix(values: np.ndarray):
+        """splitmix64 finalizer, in place (uint64 arithmetic wraps)"""
+        values ^= values >> np.uint64(30)
+        values *= _MIX_MULTIPLIER_1
+        values ^= values >> np.uint64(27)
+        values *= _MIX_MULTIPLIER_2
+        values ^= values >> np.uint64(31)
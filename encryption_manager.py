@@ -38,13 +38,15 @@ class EncryptionManager:
         key = base64.urlsafe_b64encode(kdf.derive(self.password))
         return key
     
-    def encrypt_data(self, data: bytes, password: str = None) -> Tuple[bytes, bytes]:
+    def encrypt_data(self, data: bytes, password: str = None,
+                     key: bytes = None) -> Tuple[bytes, bytes]:
         """
         Encrypt data using AES
         
         Args:
             data: Data to encrypt
             password: Optional password override
+            key: Encryption key to use instead of deriving one
             
         Returns:
             Tuple of (encrypted_data, key)
@@ -52,7 +54,8 @@ class EncryptionManager:
         if password:
             self.password = password.encode()
         
-        key = self.generate_key()
+        if not key:
+            key = self.generate_key()
         fernet = Fernet(key)
         
         # Add integrity check
@@ -337,6 +337,19 @@ class SteganographyGUI:
                                  values=[1, 2, 3], width=5, state='readonly')
         bits_combo.pack(side=tk.LEFT, padx=(10, 0))
         
+        # Output encoder profile
+        profile_frame = tk.Frame(stego_content, bg='#ffffff')
+        profile_frame.pack(fill=tk.X, pady=(0, 5))
+        
+        tk.Label(profile_frame, text="Output format:",
+                bg='#ffffff', font=('Helvetica', 9)).pack(side=tk.LEFT)
+        
+        self.output_profile_var = tk.StringVar(value=self.engine.output_profile)
+        profile_combo = ttk.Combobox(profile_frame, textvariable=self.output_profile_var,
+                                    values=list(self.engine.OUTPUT_PROFILES),
+                                    width=14, state='readonly')
+        profile_combo.pack(side=tk.LEFT, padx=(10, 0))
+        
         # Compression
         self.compression_var = tk.BooleanVar(value=True)
         compress_check = tk.Checkbutton(stego_content, text="Enable Compression",
@@ -344,6 +357,46 @@ class SteganographyGUI:
                                        bg='#ffffff', font=('Helvetica', 9))
         compress_check.pack(anchor=tk.W)
         
+        # Scattered embedding order
+        scatter_frame = tk.Frame(stego_content, bg='#ffffff')
+        scatter_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        tk.Label(scatter_frame, text="Scatter key (optional):",
+                bg='#ffffff', font=('Helvetica', 9)).pack(side=tk.LEFT)
+        
+        self.scatter_key_var = tk.StringVar()
+        scatter_entry = tk.Entry(scatter_frame, textvariable=self.scatter_key_var,
+                                show="*", bg='#f8f9fa', font=('Helvetica', 9),
+                                relief='solid', borderwidth=1)
+        scatter_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(10, 0), ipady=3)
+        
+        # Alpha channel
+        self.skip_alpha_var = tk.BooleanVar(value=False)
+        alpha_check = tk.Checkbutton(stego_content, text="Leave alpha channel untouched",
+                                    variable=self.skip_alpha_var,
+                                    bg='#ffffff', font=('Helvetica', 9))
+        alpha_check.pack(anchor=tk.W, pady=(5, 0))
+        
+        # Content-adaptive embedding order
+        self.adaptive_var = tk.BooleanVar(value=False)
+        adaptive_check = tk.Checkbutton(stego_content, text="Embed in textured areas first",
+                                       variable=self.adaptive_var,
+                                       bg='#ffffff', font=('Helvetica', 9))
+        adaptive_check.pack(anchor=tk.W)
+        
+        # Matrix embedding
+        matrix_frame = tk.Frame(stego_content, bg='#ffffff')
+        matrix_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        tk.Label(matrix_frame, text="Matrix code k (fewer changes):",
+                bg='#ffffff', font=('Helvetica', 9)).pack(side=tk.LEFT)
+        
+        self.matrix_var = tk.StringVar(value='off')
+        matrix_combo = ttk.Combobox(matrix_frame, textvariable=self.matrix_var,
+                                   values=['off'] + [str(k) for k in self.engine.MATRIX_CODES],
+                                   width=5, state='readonly')
+        matrix_combo.pack(side=tk.LEFT, padx=(10, 0))
+        
         # Output options
         output_frame = ttk.LabelFrame(main_frame,
                                      text="5. Output Options",
@@ -445,6 +498,19 @@ class SteganographyGUI:
                              relief='solid', borderwidth=1)
         pass_entry.pack(fill=tk.X, pady=(5, 0), ipady=3)
         
+        # Scatter key field
+        scatter_frame = tk.Frame(decrypt_content, bg='#ffffff')
+        scatter_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        tk.Label(scatter_frame, text="Scatter key (if scattered):",
+                bg='#ffffff', font=('Helvetica', 9)).pack(anchor=tk.W)
+        
+        self.decode_scatter_key_var = tk.StringVar()
+        scatter_entry = tk.Entry(scatter_frame, textvariable=self.decode_scatter_key_var,
+                                show="*", bg='#f8f9fa', font=('Helvetica', 9),
+                                relief='solid', borderwidth=1)
+        scatter_entry.pack(fill=tk.X, pady=(5, 0), ipady=3)
+        
         # Output options
         output_frame = ttk.LabelFrame(main_frame,
                                      text="3. Output Options",
@@ -755,9 +821,10 @@ class SteganographyGUI:
             self.status_var.set(f"Selected: {os.path.basename(filename)}")
     
     def browse_output(self):
-        filetypes = [("PNG files", "*.png"), ("All files", "*.*")]
+        image_format, extension, _ = self.engine.OUTPUT_PROFILES[self.output_profile_var.get()]
+        filetypes = [(f"{image_format} files", f"*{extension}"), ("All files", "*.*")]
         filename = filedialog.asksaveasfilename(title="Save Output Image",
-                                               defaultextension=".png",
+                                               defaultextension=extension,
                                                filetypes=filetypes)
         if filename:
             self.output_path_var.set(filename)
@@ -798,7 +865,17 @@ class SteganographyGUI:
             messagebox.showerror("Error", "Please provide secret data or select a file")
             return
         
-        if secret_file and self.data_type.get() == "file":
+        stream_file = None
+        if secret_file and self.data_type.get() == "file" and \
+                not (self.encryption_var.get() or self.scatter_key_var.get() or
+                     self.adaptive_var.get() or self.matrix_var.get() != 'off'):
+            # Unencrypted, sequential files are streamed from disk by embed_stream
+            if not os.path.isfile(secret_file):
+                messagebox.showerror("Error", f"Cannot read secret file: {secret_file}")
+                return
+            stream_file = secret_file
+            secret_bytes = None
+        elif secret_file and self.data_type.get() == "file":
             try:
                 with open(secret_file, 'rb') as f:
                     secret_bytes = f.read()
@@ -811,6 +888,7 @@ class SteganographyGUI:
         
         # Show key if encryption is enabled but no password provided
         show_key = False
+        encryption_key = None
         if self.encryption_var.get():
             password = self.password_var.get()
             if not password:
@@ -822,42 +900,69 @@ class SteganographyGUI:
                 messagebox.showinfo("Encryption Key", 
                                    f"Your auto-generated encryption key is:\n{key.hex()}\n\nSAVE THIS KEY to decrypt your message!")
             
-            encrypted_data, key = self.encryption_manager.encrypt_data(secret_bytes, self.password_var.get())
-            secret_bytes = encrypted_data
+            # The engine encrypts after compressing the data
+            encryption_key = EncryptionManager(self.password_var.get()).generate_key()
         
         self.progress_encode.start()
         self.status_var.set("Encoding data...")
         
         threading.Thread(target=self._encode_thread,
-                        args=(secret_bytes,),
+                        args=(secret_bytes, stream_file, encryption_key),
                         daemon=True).start()
     
-    def _encode_thread(self, secret_bytes):
+    def _encode_thread(self, secret_bytes, stream_file=None, encryption_key=None):
         try:
+            self.engine.encryption_key = encryption_key
+            self.engine.scatter_key = self.scatter_key_var.get().encode('utf-8') or None
+            self.engine.exclude_alpha = self.skip_alpha_var.get()
+            self.engine.adaptive = self.adaptive_var.get()
+            matrix = self.matrix_var.get()
+            self.engine.matrix_k = 0 if matrix == 'off' else int(matrix)
+            output_profile = self.output_profile_var.get()
             output_path = self.output_path_var.get()
             if not output_path:
-                output_path = f"stego_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
+                extension = self.engine.OUTPUT_PROFILES[output_profile][1]
+                output_path = f"stego_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
                 self.output_path_var.set(output_path)
             
-            success, message = self.engine.embed_data(
-                cover_image_path=self.cover_path_var.get(),
-                secret_data=secret_bytes,
-                output_path=output_path,
-                bits_per_pixel=self.bits_var.get(),
-                use_compression=self.compression_var.get()
-            )
+            if stream_file:
+                with open(stream_file, 'rb') as reader:
+                    success, message = self.engine.embed_stream(
+                        cover_image_path=self.cover_path_var.get(),
+                        reader=reader,
+                        output_path=output_path,
+                        bits_per_pixel=self.bits_var.get(),
+                        use_compression=self.compression_var.get(),
+                        output_profile=output_profile
+                    )
+                data_size = os.path.getsize(stream_file)
+            else:
+                success, message = self.engine.embed_data(
+                    cover_image_path=self.cover_path_var.get(),
+                    secret_data=secret_bytes,
+                    output_path=output_path,
+                    bits_per_pixel=self.bits_var.get(),
+                    use_compression=self.compression_var.get(),
+                    output_profile=output_profile
+                )
+                data_size = len(secret_bytes)
             
             metadata = {
                 'bits_per_pixel': self.bits_var.get(),
                 'compression': self.compression_var.get(),
-                'encryption': self.encryption_var.get()
+                'encryption': self.encryption_var.get(),
+                'scatter': bool(self.engine.scatter_key),
+                'skip_alpha': self.engine.exclude_alpha,
+                'adaptive': self.engine.adaptive,
+                'matrix_k': self.engine.matrix_k,
+                'output_profile': output_profile
             }
             
             self.db_manager.log_operation(
                 operation_type='embed',
                 input_file=self.cover_path_var.get(),
                 output_file=output_path,
-                data_size=len(secret_bytes),
+                data_size=data_size,
                 encryption_used=self.encryption_var.get(),
                 success=success,
                 metadata=metadata
@@ -900,6 +1005,11 @@ class SteganographyGUI:
     def _decode_thread(self):
         """Thread for decoding"""
         try:
+            # The engine decrypts the payload if a password was provided
+            password = self.decode_password_var.get()
+            self.engine.encryption_key = \
+                EncryptionManager(password).generate_key() if password else None
+            self.engine.scatter_key = self.decode_scatter_key_var.get().encode('utf-8') or None
             extracted_data, message = self.engine.extract_data(
                 stego_image_path=self.stego_path_var.get()
             )
@@ -911,24 +1021,6 @@ class SteganographyGUI:
             # Store the extracted data for later use
             self.current_extracted_data = extracted_data
             
-            # Try decryption if password provided
-            password = self.decode_password_var.get()
-            if password:
-                try:
-                    decrypted_data, decrypt_msg = self.encryption_manager.decrypt_data(
-                        extracted_data, password=password
-                    )
-                    if decrypted_data:
-                        extracted_data = decrypted_data
-                        self.current_extracted_data = extracted_data
-                        message += f"\n{decrypt_msg}"
-                    else:
-                        self.root.after(0, self._decode_complete, False, decrypt_msg, extracted_data)
-                        return
-                except Exception as e:
-                    self.root.after(0, self._decode_complete, False, f"Decryption error: {str(e)}", extracted_data)
-                    return
-            
             # Save to file if requested
             if self.decode_output_option.get() == "file" and self.decode_output_path_var.get():
                 with open(self.decode_output_path_var.get(), 'wb') as f:
@@ -0,0 +1,250 @@
+"""
+JPEG coefficient carrier for the steganography engine
+The payload goes into the quantized DCT coefficients of a baseline JPEG,
+which is written back as a JPEG of about the cover's size instead of a
+lossless image many times larger.
+"""
+import os
+import time
+from typing import BinaryIO, Optional, Tuple
+
+import numpy as np
+
+from .jpeg_coefficients import JpegCoefficients
+from .steganography_engine import SteganographyEngine, _ValueStream
+
+
+class JpegCarrier:
+    """
+    LSB carrier for the AC coefficients of baseline JPEGs
+    
+    The usable values are the AC coefficients whose magnitude is at least
+    2, in coefficient order. Each carries one bit in the LSB of its
+    magnitude: 2 and 3, 4 and 5 and so on swap, so the sign, the set of
+    usable coefficients and every Huffman symbol stay the same and only
+    magnitude bits change in the re-encoded scans. The header and payload
+    use the same layout as SteganographyEngine uses for channel values,
+    including the engine's matrix code when matrix_k is set.
+    """
+    
+    EXTENSIONS = ['.jpg', '.jpeg', '.jpe', '.jfif']
+    
+    # Smallest coefficient magnitude that carries a bit
+    MIN_MAGNITUDE = 2
+    
+    def __init__(self, engine: SteganographyEngine = None):
+        """
+        Args:
+            engine: Engine whose header layout, codec settings, scatter key
+                and encryption key are used; a default engine if None
+        """
+        self.engine = engine or SteganographyEngine()
+    
+    @classmethod
+    def handles(cls, path: str) -> bool:
+        """Check whether a path names a JPEG file by its extension"""
+        return os.path.splitext(path)[1].lower() in cls.EXTENSIONS
+    
+    def calculate_capacity(self, image_path: str, bits_per_pixel: int = 1) -> dict:
+        """
+        Calculate maximum embeddable data size
+        
+        The scans have to be decoded to count the usable coefficients.
+        
+        Args:
+            image_path: Path to cover JPEG
+            bits_per_pixel: Ignored; each usable coefficient carries one bit
+        
+        Returns:
+            Dictionary with capacity information
+        """
+        try:
+            jpeg = JpegCoefficients.read(image_path)
+        except Exception as e:
+            raise ValueError(f"Capacity calculation failed: {str(e)}")
+        return self._capacity(jpeg, len(self._usable_positions(jpeg)))
+    
+    def embed_data(self, cover_image_path: str, secret_data: bytes, output_path: str,
+                   bits_per_pixel: int = 1, use_compression: bool = True,
+                   container: bool = False) -> Tuple[bool, str]:
+        """
+        Embed secret data into the coefficients of a JPEG
+        
+        Args:
+            cover_image_path: Path to cover JPEG
+            secret_data: Bytes to hide
+            output_path: Output stego JPEG path
+            bits_per_pixel: Must be 1
+            use_compression: Whether to compress data before embedding
+            container: secret_data is a file container from _build_container
+        
+        Returns:
+            Tuple of (success, message)
+        """
+        start_time = time.time()
+        engine = self.engine
+        
+        try:
+            if bits_per_pixel != 1:
+                return False, "JPEG covers carry 1 bit per coefficient"
+            if engine.adaptive:
+                return False, "Adaptive embedding is not supported for JPEG coefficients"
+            if engine.matrix_k:
+                if engine.matrix_k not in engine.MATRIX_CODES:
+                    return False, "Matrix code k must be between 2 and 7"
+                if engine.scatter_key:
+                    return False, "Matrix embedding cannot be combined with scattered embedding"
+            
+            jpeg = JpegCoefficients.read(cover_image_path)
+            positions = self._usable_positions(jpeg)
+            capacity_info = self._capacity(jpeg, len(positions))
+            
+            header, secret_data = engine._pipeline().pack(secret_data, 1, use_compression,
+                                                          container,
+                                                          scatter=bool(engine.scatter_key),
+                                                          matrix_k=engine.matrix_k)
+            required_bits = len(secret_data) * 8
+            if required_bits > capacity_info['available_bits']:
+                return False, f"Data too large. Available: {capacity_info['available_bytes']}B, Required: {len(header) + len(secret_data)}B"
+            
+            flat = jpeg.coefficients.reshape(-1)
+            coefficients = flat[positions]
+            values = np.abs(coefficients).astype(np.uint16)
+            if engine.scatter_key:
+                engine._embed_scattered(values, header, secret_data, 1)
+            elif engine.matrix_k:
+                engine._embed_matrix(values, header, secret_data, engine.matrix_k)
+            else:
+                engine._embed_region(values, header, 1)
+                engine._embed_region(values, secret_data, 1, len(header) * 8)
+            flat[positions] = np.where(coefficients < 0, -values.astype(np.int16),
+                                       values.astype(np.int16))
+            
+            changed = int(np.count_nonzero(flat[positions] != coefficients))
+            jpeg.write(output_path)
+            elapsed_time = time.time() - start_time
+            
+            return True, f"Embedding successful! Output: {output_path}\n" \
+                        f"Data size: {len(secret_data)} bytes\n" \
+                        f"Capacity used: {(required_bits/max(1, capacity_info['available_bits']))*100:.1f}%\n" \
+                        f"Coefficients changed: {changed:,} of {len(positions):,} usable\n" \
+                        f"Output size: {os.path.getsize(output_path):,} bytes " \
+                        f"(cover {os.path.getsize(cover_image_path):,} bytes)\n" \
+                        f"Time: {elapsed_time:.2f}s"
+        
+        except Exception as e:
+            if os.path.exists(output_path) and \
+                    os.path.abspath(output_path) != os.path.abspath(cover_image_path):
+                os.remove(output_path)
+            return False, f"Embedding failed: {str(e)}"
+    
+    def extract_data(self, stego_image_path: str) -> Tuple[Optional[bytes], str]:
+        """
+        Extract hidden data from the coefficients of a JPEG
+        
+        Args:
+            stego_image_path: Path to stego JPEG
+        
+        Returns:
+            Tuple of (extracted_data, message)
+        """
+        start_time = time.time()
+        engine = self.engine
+        
+        try:
+            values = self._read_values(stego_image_path)
+            header_info = engine._read_header(_ValueStream([values]), len(values))
+            if header_info['scatter']:
+                payload = engine._extract_scattered(values, header_info)
+            elif header_info['matrix_k']:
+                payload = engine._extract_matrix(values, header_info)
+            else:
+                payload = engine._extract_region(values, header_info['data_length'] * 8,
+                                                 header_info['bits_per_pixel'],
+                                                 header_info['header_bits'])
+            extracted_bytes = engine._pipeline().unpack(payload, header_info)
+        
+        except ValueError as e:
+            return None, str(e)
+        except Exception as e:
+            return None, f"Extraction failed: {str(e)}"
+        
+        elapsed_time = time.time() - start_time
+        
+        return extracted_bytes, f"Extraction successful!\n" \
+                               f"Data size: {len(extracted_bytes)} bytes\n" \
+                               f"Time: {elapsed_time:.2f}s"
+    
+    def extract_stream(self, stego_image_path: str,
+                       writer: BinaryIO) -> Tuple[Optional[int], str]:
+        """
+        Extract hidden data from a JPEG into a file object
+        
+        The coefficients are decoded in full, but the payload is
+        decompressed and written in chunks.
+        
+        Args:
+            stego_image_path: Path to stego JPEG
+            writer: Binary file object the payload is written to
+        
+        Returns:
+            Tuple of (number of bytes written, message)
+        """
+        start_time = time.time()
+        
+        try:
+            values = self._read_values(stego_image_path)
+            stream = _ValueStream([values])
+            header_info = self.engine._read_header(stream, len(values))
+            if header_info['scatter'] or header_info['matrix_k']:
+                # Scattered and matrix-coded payloads are read from all usable values
+                if header_info['scatter']:
+                    payload = self.engine._extract_scattered(values, header_info)
+                else:
+                    payload = self.engine._extract_matrix(values, header_info)
+                data = self.engine._pipeline().unpack(payload, header_info)
+                writer.write(data)
+                written = len(data)
+            else:
+                written = self.engine._write_payload_stream(stream, header_info, writer)
+        except ValueError as e:
+            return None, str(e)
+        except Exception as e:
+            return None, f"Extraction failed: {str(e)}"
+        
+        elapsed_time = time.time() - start_time
+        
+        return written, f"Extraction successful!\n" \
+                       f"Data size: {written} bytes\n" \
+                       f"Time: {elapsed_time:.2f}s"
+    
+    def _usable_positions(self, jpeg: JpegCoefficients) -> np.ndarray:
+        """Flat indices of the AC coefficients that carry a bit"""
+        usable = np.abs(jpeg.coefficients) >= self.MIN_MAGNITUDE
+        usable[:, 0] = False
+        return np.flatnonzero(usable)
+    
+    def _read_values(self, image_path: str) -> np.ndarray:
+        """Magnitudes of the usable coefficients of a JPEG, in embedding order"""
+        jpeg = JpegCoefficients.read(image_path)
+        coefficients = jpeg.coefficients.reshape(-1)[self._usable_positions(jpeg)]
+        return np.abs(coefficients).astype(np.uint16)
+    
+    def _capacity(self, jpeg: JpegCoefficients, usable: int) -> dict:
+        """Capacity dictionary of a decoded JPEG with usable coefficients"""
+        header_bits = self.engine.HEADER_BITS
+        available_bits = max(0, usable - header_bits)
+        if self.engine.matrix_k:
+            available_bits = self.engine._matrix_bits(usable - header_bits, self.engine.matrix_k)
+        
+        return {
+            'width': jpeg.width,
+            'height': jpeg.height,
+            'components': len(jpeg.components),
+            'blocks': len(jpeg.coefficients),
+            'usable_coefficients': usable,
+            'bits_per_pixel': 1,
+            'available_bytes': available_bits // 8,
+            'available_bits': available_bits,
+            'header_bits': header_bits
+        }
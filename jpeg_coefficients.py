@@ -0,0 +1,496 @@
+"""
+Baseline JPEG coefficient codec
+Decodes the Huffman-coded scans of a sequential JPEG into its quantized
+DCT coefficients and encodes them back with the file's own Huffman tables,
+so coefficients can be changed without touching pixels or quantization.
+"""
+import re
+import struct
+from array import array
+
+import numpy as np
+
+# Start-of-frame markers of sequential Huffman-coded JPEGs (baseline and extended)
+SEQUENTIAL_SOF = [0xC0, 0xC1]
+# Progressive, lossless, hierarchical and arithmetic-coded frames
+UNSUPPORTED_SOF = [0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF]
+
+DHT, DRI, SOS, DNL, EOI = 0xC4, 0xDD, 0xDA, 0xDC, 0xD9
+
+# Entropy-coded data ends at the first marker that is not a restart marker
+_SCAN_END = re.compile(rb'\xff(?![\x00\xd0-\xd7])')
+_RESTART = re.compile(rb'\xff[\xd0-\xd7]')
+
+# Emissions spread into bits per NumPy pass when a scan is encoded
+_PACK_CHUNK = 1 << 15
+
+# Bit windows are precomputed for this many bytes of a scan at a time
+_WINDOW_CHUNK = 1 << 16
+# Upper bound on the bytes one block takes: 64 codes of 16 + 11 bits
+_MAX_BLOCK_BYTES = 64 * 27 // 8 + 1
+
+
+class HuffmanTable:
+    """Canonical Huffman table from a DHT segment"""
+    
+    def __init__(self, counts: bytes, symbols: bytes):
+        """
+        Args:
+            counts: Number of codes of each length 1-16
+            symbols: Symbols in order of increasing code
+        
+        Raises:
+            ValueError: If the code lengths overflow 16 bits
+        """
+        # Next 16 stream bits -> (code length << 8) | symbol, -1 for invalid codes
+        self.lookup = [-1] * 65536
+        self.codes = np.zeros(256, dtype=np.int64)
+        self.lengths = np.zeros(256, dtype=np.int64)
+        
+        code = 0
+        index = 0
+        for length in range(1, 17):
+            for symbol in symbols[index:index + counts[length - 1]]:
+                if code >= 1 << length:
+                    raise ValueError("Invalid JPEG: Huffman table overflow")
+                span = 1 << (16 - length)
+                start = code << (16 - length)
+                self.lookup[start:start + span] = [(length << 8) | symbol] * span
+                self.codes[symbol] = code
+                self.lengths[symbol] = length
+                code += 1
+            index += counts[length - 1]
+            code <<= 1
+
+
+class JpegCoefficients:
+    """
+    Quantized DCT coefficients of a sequential Huffman-coded JPEG
+    
+    coefficients holds one row of 64 int16 values per 8x8 block, in zigzag
+    order (index 0 is the DC coefficient). Each component's blocks follow
+    the previous component's, row by row over the component's MCU-padded
+    block grid. Everything but the entropy-coded scan data is kept byte
+    for byte, so to_bytes() re-emits the original file when no coefficient
+    was changed.
+    """
+    
+    def __init__(self, data: bytes):
+        """
+        Args:
+            data: Contents of a JPEG file
+        
+        Raises:
+            ValueError: If the file is not a sequential Huffman-coded 8-bit JPEG
+        """
+        self.width = 0
+        self.height = 0
+        self.components = []  # id, h, v, rows, cols and first_block of each component
+        self.coefficients = None
+        self._parts = []  # Marker segment bytes, or scan dicts re-encoded by to_bytes
+        self._parse(data)
+    
+    @classmethod
+    def read(cls, path: str) -> 'JpegCoefficients':
+        """Decode the coefficients of a JPEG file"""
+        with open(path, 'rb') as f:
+            return cls(f.read())
+    
+    def write(self, path: str):
+        """Write the JPEG with the current coefficients"""
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+    
+    def to_bytes(self) -> bytes:
+        """Encode the current coefficients back into a JPEG file"""
+        return b''.join(part if isinstance(part, bytes) else self._encode_scan(part)
+                        for part in self._parts)
+    
+    def _parse(self, data: bytes):
+        """Split the file into marker segments and decode each scan"""
+        if data[:2] != b'\xff\xd8':
+            raise ValueError("Not a JPEG file")
+        
+        tables = {}
+        restart_interval = 0
+        buffer = None
+        segment_start = 0
+        pos = 2
+        
+        while True:
+            while pos + 1 < len(data) and data[pos] == 0xFF and data[pos + 1] == 0xFF:
+                pos += 1  # Fill bytes before a marker
+            if pos + 1 >= len(data) or data[pos] != 0xFF:
+                raise ValueError("Invalid JPEG: Truncated file or missing marker")
+            marker = data[pos + 1]
+            
+            if marker == EOI:
+                break
+            if 0xD0 <= marker <= 0xD7 or marker == 0x01:
+                pos += 2
+                continue
+            
+            end = pos + 2 + int.from_bytes(data[pos + 2:pos + 4], 'big')
+            body = data[pos + 4:end]
+            if end > len(data):
+                raise ValueError("Invalid JPEG: Truncated file or missing marker")
+            
+            if marker in SEQUENTIAL_SOF:
+                self._parse_frame(body)
+                buffer = array('h', bytes(self._total_blocks() * 128))
+            elif marker in UNSUPPORTED_SOF:
+                raise ValueError("Only baseline JPEGs are supported "
+                                 "(not progressive, lossless or arithmetic-coded)")
+            elif marker == DNL:
+                raise ValueError("JPEGs that define their height after the scan are not supported")
+            elif marker == DHT:
+                self._parse_huffman(body, tables)
+            elif marker == DRI:
+                restart_interval = int.from_bytes(body[:2], 'big')
+            elif marker == SOS:
+                if buffer is None:
+                    raise ValueError("Invalid JPEG: Scan before frame header")
+                scan = self._parse_scan(body, tables, restart_interval)
+                match = _SCAN_END.search(data, end)
+                if match is None:
+                    raise ValueError("Invalid JPEG: Truncated file or missing marker")
+                self._decode_scan(scan, data[end:match.start()], buffer)
+                self._parts.append(data[segment_start:end])
+                self._parts.append(scan)
+                segment_start = pos = match.start()
+                continue
+            pos = end
+        
+        if buffer is None:
+            raise ValueError("Invalid JPEG: No frame header")
+        # The EOI marker and anything after it are kept as they are
+        self._parts.append(data[segment_start:])
+        self.coefficients = np.frombuffer(buffer, dtype=np.int16).reshape(-1, 64)
+    
+    def _parse_frame(self, body: bytes):
+        """Read the image size and component sampling from an SOF segment"""
+        if self.components:
+            raise ValueError("Invalid JPEG: More than one frame header")
+        precision, self.height, self.width, count = struct.unpack('>BHHB', body[:6])
+        if precision != 8:
+            raise ValueError("Only 8-bit JPEGs are supported")
+        if not self.width or not self.height:
+            raise ValueError("JPEGs that define their height after the scan are not supported")
+        
+        for index in range(count):
+            component_id, sampling, _ = body[6 + 3 * index:9 + 3 * index]
+            self.components.append({'id': component_id, 'h': sampling >> 4,
+                                    'v': sampling & 0x0F})
+        if not self.components:
+            raise ValueError("Invalid JPEG: Frame without components")
+        if not all(1 <= c['h'] <= 4 and 1 <= c['v'] <= 4 for c in self.components):
+            raise ValueError("Invalid JPEG: Bad sampling factors")
+        
+        mcu_cols, mcu_rows = self._mcu_grid()
+        first_block = 0
+        for component in self.components:
+            component['rows'] = mcu_rows * component['v']
+            component['cols'] = mcu_cols * component['h']
+            component['first_block'] = first_block
+            first_block += component['rows'] * component['cols']
+    
+    def _parse_huffman(self, body: bytes, tables: dict):
+        """Read the Huffman tables of a DHT segment into tables"""
+        pos = 0
+        while pos < len(body):
+            table_class, table_id = body[pos] >> 4, body[pos] & 0x0F
+            counts = body[pos + 1:pos + 17]
+            symbols = body[pos + 17:pos + 17 + sum(counts)]
+            tables[table_class, table_id] = HuffmanTable(counts, symbols)
+            pos += 17 + sum(counts)
+    
+    def _parse_scan(self, body: bytes, tables: dict, restart_interval: int) -> dict:
+        """Read an SOS segment and work out the order of its blocks"""
+        count = body[0]
+        ids = [component['id'] for component in self.components]
+        indices, dc_tables, ac_tables = [], [], []
+        
+        try:
+            for slot in range(count):
+                component_id, table_ids = body[1 + 2 * slot:3 + 2 * slot]
+                indices.append(ids.index(component_id))
+                dc_tables.append(tables[0, table_ids >> 4])
+                ac_tables.append(tables[1, table_ids & 0x0F])
+        except (ValueError, KeyError):
+            raise ValueError("Invalid JPEG: Scan references a missing component or table")
+        
+        spectral_start, spectral_end, approximation = body[1 + 2 * count:4 + 2 * count]
+        if spectral_start != 0 or spectral_end != 63 or approximation != 0:
+            raise ValueError("Only baseline JPEGs are supported "
+                             "(not progressive, lossless or arithmetic-coded)")
+        
+        blocks, slots, blocks_per_mcu = self._scan_blocks(indices)
+        return {'dc_tables': dc_tables, 'ac_tables': ac_tables, 'blocks': blocks,
+                'slots': slots, 'restart_interval': restart_interval,
+                'blocks_per_interval': (restart_interval or len(blocks)) * blocks_per_mcu}
+    
+    def _mcu_grid(self):
+        """Number of MCU columns and rows of an interleaved scan"""
+        h_max = max(component['h'] for component in self.components)
+        v_max = max(component['v'] for component in self.components)
+        return _ceil_div(self.width, 8 * h_max), _ceil_div(self.height, 8 * v_max)
+    
+    def _total_blocks(self) -> int:
+        last = self.components[-1]
+        return last['first_block'] + last['rows'] * last['cols']
+    
+    def _scan_blocks(self, indices: list):
+        """
+        Coefficient rows of a scan's blocks in coding order
+        
+        Returns:
+            Tuple of (block indices, scan component slot of each block,
+            blocks per MCU)
+        """
+        if len(indices) == 1:
+            # Non-interleaved scans cover only the blocks inside the image
+            component = self.components[indices[0]]
+            h_max = max(c['h'] for c in self.components)
+            v_max = max(c['v'] for c in self.components)
+            cols = _ceil_div(_ceil_div(self.width * component['h'], h_max), 8)
+            rows = _ceil_div(_ceil_div(self.height * component['v'], v_max), 8)
+            grid = component['first_block'] + \
+                np.arange(rows)[:, None] * component['cols'] + np.arange(cols)
+            return grid.reshape(-1), np.zeros(grid.size, dtype=np.int64), 1
+        
+        mcu_cols, mcu_rows = self._mcu_grid()
+        grids, slots = [], []
+        for slot, index in enumerate(indices):
+            component = self.components[index]
+            h, v = component['h'], component['v']
+            rows = np.arange(mcu_rows)[:, None, None, None] * v + np.arange(v)[:, None]
+            cols = np.arange(mcu_cols)[:, None, None] * h + np.arange(h)
+            grid = component['first_block'] + rows * component['cols'] + cols
+            grids.append(grid.reshape(mcu_rows * mcu_cols, v * h))
+            slots.extend([slot] * (v * h))
+        
+        blocks = np.concatenate(grids, axis=1).reshape(-1)
+        return blocks, np.tile(np.array(slots, dtype=np.int64), mcu_rows * mcu_cols), len(slots)
+    
+    def _decode_scan(self, scan: dict, entropy: bytes, buffer: array):
+        """Huffman-decode one scan's coefficients into buffer"""
+        blocks = scan['blocks'].tolist()
+        slots = scan['slots'].tolist()
+        per_interval = scan['blocks_per_interval']
+        pieces = _RESTART.split(entropy) if scan['restart_interval'] else [entropy]
+        dc_lookups = [table.lookup for table in scan['dc_tables']]
+        ac_lookups = [table.lookup for table in scan['ac_tables']]
+        
+        for interval, start in enumerate(range(0, len(blocks), per_interval)):
+            if interval >= len(pieces):
+                raise ValueError("Invalid JPEG: Truncated scan")
+            _decode_interval(pieces[interval].replace(b'\xff\x00', b'\xff'),
+                             blocks[start:start + per_interval],
+                             slots[start:start + per_interval], dc_lookups, ac_lookups,
+                             buffer)
+    
+    def _encode_scan(self, scan: dict) -> bytes:
+        """
+        Huffman-encode one scan's coefficients with the scan's own tables
+        
+        Every code is built with NumPy: DC differences, run lengths, ZRL
+        and EOB symbols are computed for all blocks at once, sorted into
+        coding order and spread into a bit array.
+        """
+        blocks = self.coefficients[scan['blocks']].astype(np.int64)
+        slots = scan['slots']
+        block_count = len(blocks)
+        per_interval = scan['blocks_per_interval']
+        interval = np.arange(block_count) // per_interval
+        
+        # DC: difference to the previous block of the same component, reset
+        # at each restart interval
+        dc = blocks[:, 0]
+        diff = dc.copy()
+        for slot in range(len(scan['dc_tables'])):
+            index = np.flatnonzero(slots == slot)
+            continued = np.zeros(len(index), dtype=bool)
+            continued[1:] = interval[index[1:]] == interval[index[:-1]]
+            diff[index[continued]] -= dc[index[np.flatnonzero(continued) - 1]]
+        dc_codes, dc_bits = _emissions(scan['dc_tables'], slots, diff, 0)
+        
+        # AC: one symbol per nonzero coefficient, preceded by a ZRL per 16
+        # skipped zeros, then an EOB unless the block ends on coefficient 63
+        rows, columns = np.nonzero(blocks[:, 1:])
+        positions = columns + 1
+        values = blocks[rows, positions]
+        previous = np.zeros(len(rows), dtype=np.int64)
+        same_block = np.zeros(len(rows), dtype=bool)
+        same_block[1:] = rows[1:] == rows[:-1]
+        previous[1:] = positions[:-1]
+        previous[~same_block] = 0
+        runs = positions - previous - 1
+        zrl_counts = runs >> 4
+        
+        last = np.zeros(block_count, dtype=np.int64)
+        block_ends = np.ones(len(rows), dtype=bool)
+        block_ends[:-1] = ~same_block[1:]
+        last[rows[block_ends]] = positions[block_ends]
+        eob_blocks = np.flatnonzero(last < 63)
+        zrl_rows = np.repeat(rows, zrl_counts)
+        
+        ac_codes, ac_bits = _emissions(scan['ac_tables'], slots[rows], values,
+                                       (runs & 15) << 4)
+        zrl_codes, zrl_bits = _emissions(scan['ac_tables'], slots[zrl_rows],
+                                         np.zeros(len(zrl_rows), dtype=np.int64), 0xF0)
+        eob_codes, eob_bits = _emissions(scan['ac_tables'], slots[eob_blocks],
+                                         np.zeros(len(eob_blocks), dtype=np.int64), 0x00)
+        
+        # Coding order: DC, then (ZRLs, symbol) per coefficient, then EOB
+        keys = np.concatenate([np.arange(block_count) * 128,
+                               rows * 128 + 2 * positions,
+                               zrl_rows * 128 + 2 * np.repeat(positions, zrl_counts) - 1,
+                               eob_blocks * 128 + 127])
+        order = np.argsort(keys, kind='stable')
+        codes = np.concatenate([dc_codes, ac_codes, zrl_codes, eob_codes])[order]
+        lengths = np.concatenate([dc_bits, ac_bits, zrl_bits, eob_bits])[order]
+        
+        # Each restart interval is padded with 1-bits to a whole byte
+        interval_count = _ceil_div(block_count, per_interval)
+        interval_ends = np.searchsorted(keys[order] >> 7,
+                                        np.arange(1, interval_count + 1) * per_interval)
+        interval_bits = np.add.reduceat(lengths, np.r_[0, interval_ends[:-1]])
+        padding = -interval_bits % 8
+        codes = np.insert(codes, interval_ends, (1 << padding) - 1)
+        lengths = np.insert(lengths, interval_ends, padding)
+        
+        data = _pack_codes(codes, lengths)
+        byte_ends = np.cumsum((interval_bits + padding) // 8)
+        pieces = np.split(data, byte_ends[:-1])
+        
+        output = []
+        for index, piece in enumerate(pieces):
+            if index:
+                output.append(bytes([0xFF, 0xD0 + (index - 1) % 8]))
+            output.append(piece.tobytes().replace(b'\xff', b'\xff\x00'))
+        return b''.join(output)
+
+
+def _ceil_div(numerator: int, denominator: int) -> int:
+    return -(-numerator // denominator)
+
+
+def _decode_interval(data: bytes, blocks: list, slots: list, dc_lookups: list,
+                     ac_lookups: list, buffer: array):
+    """
+    Decode the blocks of one restart interval from unstuffed entropy data
+    
+    Each symbol is read from the 40-bit window starting at its byte, which
+    holds the longest Huffman code plus its magnitude bits at any bit
+    offset. Windows are computed with NumPy for a chunk of bytes at a time.
+    """
+    bit_count = len(data) * 8
+    padded = np.frombuffer(data + b'\xff' * 8, dtype=np.uint8).astype(np.int64)
+    predictions = [0] * len(dc_lookups)
+    windows = []
+    first = 0
+    pos = 0
+    
+    for block, slot in zip(blocks, slots):
+        base = block * 64
+        if (pos >> 3) + _MAX_BLOCK_BYTES > first + len(windows):
+            first = pos >> 3
+            windows = _byte_windows(padded, first, _WINDOW_CHUNK + _MAX_BLOCK_BYTES)
+        
+        window = windows[(pos >> 3) - first]
+        shift = 40 - (pos & 7)
+        entry = dc_lookups[slot][(window >> (shift - 16)) & 0xFFFF]
+        if entry < 0:
+            raise ValueError("Invalid JPEG: Bad Huffman code")
+        length = entry >> 8
+        size = entry & 0xFF
+        if size:
+            value = (window >> (shift - length - size)) & ((1 << size) - 1)
+            if value < 1 << (size - 1):
+                value -= (1 << size) - 1
+            predictions[slot] += value
+        pos += length + size
+        buffer[base] = predictions[slot]
+        
+        lookup = ac_lookups[slot]
+        k = 1
+        while k < 64:
+            window = windows[(pos >> 3) - first]
+            shift = 40 - (pos & 7)
+            entry = lookup[(window >> (shift - 16)) & 0xFFFF]
+            if entry < 0:
+                raise ValueError("Invalid JPEG: Bad Huffman code")
+            length = entry >> 8
+            size = entry & 0x0F
+            if not size:
+                pos += length
+                if entry & 0xF0 != 0xF0:
+                    break  # End of block
+                k += 16
+                continue
+            
+            k += (entry >> 4) & 0x0F
+            if k > 63:
+                raise ValueError("Invalid JPEG: Coefficient index out of range")
+            value = (window >> (shift - length - size)) & ((1 << size) - 1)
+            if value < 1 << (size - 1):
+                value -= (1 << size) - 1
+            pos += length + size
+            buffer[base + k] = value
+            k += 1
+    
+    if pos > bit_count:
+        raise ValueError("Invalid JPEG: Truncated scan")
+
+
+def _byte_windows(padded: np.ndarray, first: int, count: int) -> list:
+    """40-bit big-endian windows starting at count bytes from first"""
+    stop = min(first + count, len(padded) - 4)
+    if stop <= first:
+        raise ValueError("Invalid JPEG: Truncated scan")
+    windows = padded[first:stop] << 32
+    for offset in range(1, 5):
+        windows |= padded[first + offset:stop + offset] << (32 - 8 * offset)
+    return windows.tolist()
+
+
+def _emissions(tables: list, slots: np.ndarray, values: np.ndarray, symbols):
+    """
+    Codes and code lengths of Huffman symbols followed by magnitude bits
+    
+    Args:
+        tables: HuffmanTable of each scan component slot
+        slots: Slot of each emission
+        values: Coefficient or DC difference of each emission (0 for ZRL/EOB)
+        symbols: Symbol high bits (run length << 4 for AC); the magnitude
+            size of each value is added to form the symbol
+    
+    Returns:
+        Tuple of (codes, code lengths) including the magnitude bits
+    """
+    sizes = np.frexp(np.abs(values))[1].astype(np.int64)
+    symbols = symbols + sizes
+    codes = np.stack([table.codes for table in tables])[slots, symbols]
+    lengths = np.stack([table.lengths for table in tables])[slots, symbols]
+    if len(lengths) and not lengths.all():
+        raise ValueError("JPEG Huffman table has no code for a coefficient")
+    
+    magnitudes = np.where(values < 0, values + (1 << sizes) - 1, values)
+    return (codes << sizes) | magnitudes, lengths + sizes
+
+
+def _pack_codes(codes: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenate codes of the given bit lengths, most significant bit first"""
+    ends = np.cumsum(lengths)
+    total = int(ends[-1]) if len(ends) else 0
+    bits = np.empty(total, dtype=np.uint8)
+    
+    for start in range(0, len(codes), _PACK_CHUNK):
+        stop = min(len(codes), start + _PACK_CHUNK)
+        chunk_lengths = lengths[start:stop]
+        first = ends[start] - chunk_lengths[0]
+        chunk_ends = ends[start:stop] - first
+        shifts = np.repeat(chunk_ends, chunk_lengths) - 1 - np.arange(chunk_ends[-1])
+        bits[first:first + chunk_ends[-1]] = \
+            (np.repeat(codes[start:stop], chunk_lengths) >> shifts) & 1
+    return np.packbits(bits)
@@ -0,0 +1,205 @@
+"""
+Payload compression codecs and the sample probe that picks one
+Codec IDs are stored in the stego header, so extraction dispatches on them.
+"""
+import bz2
+import lzma
+import zlib
+from typing import Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+CODEC_STORE = 0
+CODEC_ZLIB = 1
+CODEC_BZ2 = 2
+CODEC_LZMA = 3
+
+# Payloads at or below this size are never compressed
+MIN_COMPRESS_SIZE = 100
+
+# The probe looks at up to this many bytes, taken from evenly spaced slices
+PROBE_SAMPLE_SIZE = 64 * 1024
+PROBE_SLICES = 4
+
+# Samples above this byte entropy (bits per byte) are treated as incompressible
+PROBE_MAX_ENTROPY = 7.5
+
+# A codec must shrink the sample below this ratio to be worth a full pass
+PROBE_MAX_RATIO = 0.97
+
+# Candidates are listed fastest first; a slower one must save at least this
+# fraction of the sample over the best faster one to be picked
+PROBE_MIN_SAVING = 0.02
+
+
+class _StoreCompressor:
+    """Compressor interface for the store codec"""
+    
+    def compress(self, data: bytes) -> bytes:
+        return data
+    
+    def flush(self) -> bytes:
+        return b''
+
+
+class PayloadCodec:
+    """A compression codec identified by the ID stored in stego headers"""
+    
+    def __init__(self, codec_id: int, name: str):
+        self.codec_id = codec_id
+        self.name = name
+    
+    def compress(self, data: bytes, level: int = 6) -> bytes:
+        """Compress a whole payload"""
+        compressor = self.compressor(level)
+        return compressor.compress(data) + compressor.flush()
+    
+    def decompress(self, data: bytes) -> bytes:
+        """
+        Decompress a whole payload
+        
+        Raises:
+            ValueError: If the data is corrupted or truncated
+        """
+        return b''.join(self.iter_decompress([data]))
+    
+    def compressor(self, level: int = 6):
+        """Incremental compressor with compress() and flush() methods"""
+        if self.codec_id == CODEC_ZLIB:
+            return zlib.compressobj(level)
+        if self.codec_id == CODEC_BZ2:
+            return bz2.BZ2Compressor(max(1, level))
+        if self.codec_id == CODEC_LZMA:
+            return lzma.LZMACompressor(preset=level)
+        return _StoreCompressor()
+    
+    def iter_decompress(self, chunks: Iterable[bytes],
+                        max_length: int = 4 * 1024 * 1024) -> Iterator[bytes]:
+        """
+        Decompress a stream of compressed chunks
+        
+        Each yielded block holds at most max_length bytes, so highly
+        compressible data cannot blow up memory.
+        
+        Raises:
+            ValueError: If the data is corrupted or truncated
+        """
+        if self.codec_id == CODEC_STORE:
+            yield from chunks
+            return
+        
+        try:
+            if self.codec_id == CODEC_ZLIB:
+                decompressor = zlib.decompressobj()
+                for chunk in chunks:
+                    while chunk and not decompressor.eof:
+                        yield decompressor.decompress(chunk, max_length)
+                        chunk = decompressor.unconsumed_tail
+                yield decompressor.flush()
+            else:
+                decompressor = bz2.BZ2Decompressor() if self.codec_id == CODEC_BZ2 \
+                    else lzma.LZMADecompressor()
+                for chunk in chunks:
+                    if decompressor.eof:
+                        break
+                    yield decompressor.decompress(chunk, max_length)
+                    while not decompressor.eof and not decompressor.needs_input:
+                        yield decompressor.decompress(b'', max_length)
+        except (zlib.error, OSError, lzma.LZMAError) as e:
+            raise ValueError(f"Decompression failed: {str(e)}")
+        
+        if not decompressor.eof:
+            raise ValueError("Decompression failed: Truncated compressed payload")
+
+
+CODECS = {codec.codec_id: codec for codec in [
+    PayloadCodec(CODEC_STORE, 'store'),
+    PayloadCodec(CODEC_ZLIB, 'zlib'),
+    PayloadCodec(CODEC_BZ2, 'bz2'),
+    PayloadCodec(CODEC_LZMA, 'lzma'),
+]}
+
+
+def get_codec(codec_id: int) -> PayloadCodec:
+    """
+    Look up a codec by the ID stored in a header
+    
+    Raises:
+        ValueError: If the ID is unknown
+    """
+    if codec_id not in CODECS:
+        raise ValueError(f"Unknown compression codec: {codec_id}")
+    return CODECS[codec_id]
+
+
+def codec_by_name(name: str) -> PayloadCodec:
+    """
+    Look up a codec by name
+    
+    Raises:
+        ValueError: If the name is unknown
+    """
+    for codec in CODECS.values():
+        if codec.name == name:
+            return codec
+    raise ValueError(f"Unknown compression codec: {name}")
+
+
+def byte_entropy(data: bytes) -> float:
+    """Shannon entropy of the byte values in data, in bits per byte"""
+    if not data:
+        return 0.0
+    counts = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+    probabilities = counts[counts > 0] / len(data)
+    return float(-(probabilities * np.log2(probabilities)).sum())
+
+
+def _probe_sample(data: bytes) -> bytes:
+    """Evenly spaced slices of data totalling at most PROBE_SAMPLE_SIZE bytes"""
+    if len(data) <= PROBE_SAMPLE_SIZE:
+        return data
+    
+    slice_size = PROBE_SAMPLE_SIZE // PROBE_SLICES
+    step = (len(data) - slice_size) // (PROBE_SLICES - 1)
+    return b''.join(data[i * step:i * step + slice_size] for i in range(PROBE_SLICES))
+
+
+def probe_codec(data: bytes, level: int = 6,
+                candidates: Iterable[str] = ('zlib', 'bz2', 'lzma')
+                ) -> Tuple[PayloadCodec, Optional[bytes]]:
+    """
+    Pick a codec for a payload from a small sample of it
+    
+    High-entropy samples (encrypted or already compressed data) are
+    stored without any trial compression; otherwise each candidate
+    compresses the sample and a slower codec only wins when it is
+    clearly smaller.
+    
+    Args:
+        data: Payload (or its first chunk when streaming)
+        level: Compression level passed to the codecs
+        candidates: Names of the codecs to try, fastest first
+    
+    Returns:
+        Tuple of (codec, compressed data); the compressed data is only
+        returned when the sample was the whole payload, otherwise None
+    """
+    store = CODECS[CODEC_STORE]
+    if len(data) <= MIN_COMPRESS_SIZE:
+        return store, None
+    
+    sample = _probe_sample(data)
+    if byte_entropy(sample) > PROBE_MAX_ENTROPY:
+        return store, None
+    
+    best_codec, best_output = store, None
+    for name in candidates:
+        codec = codec_by_name(name)
+        output = codec.compress(sample, level)
+        if best_output is None or \
+                len(best_output) - len(output) > len(sample) * PROBE_MIN_SAVING:
+            best_codec, best_output = codec, output
+    
+    if best_output is None or len(best_output) > len(sample) * PROBE_MAX_RATIO:
+        return store, None
+    return best_codec, best_output if sample is data else None
@@ -0,0 +1,437 @@
+"""
+Strip-based PNG reader and writer for images that do not fit in memory
+Scanlines are inflated/deflated incrementally with zlib, so only one strip
+of rows is held as a NumPy array at a time.
+"""
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import BinaryIO, Iterator, Optional
+
+import numpy as np
+from PIL import Image
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# PNG colour type -> (channels, Pillow mode)
+COLOR_TYPES = {
+    0: (1, 'L'),
+    2: (3, 'RGB'),
+    3: (1, 'P'),
+    4: (2, 'LA'),
+    6: (4, 'RGBA'),
+}
+
+
+def _chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """Serialize one PNG chunk"""
+    crc = zlib.crc32(chunk_type + data) & 0xFFFFFFFF
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', crc)
+
+
+def _adler32_combine(adler1: int, adler2: int, length2: int) -> int:
+    """
+    Combine the Adler-32 checksums of two consecutive blocks (zlib's adler32_combine)
+    
+    Args:
+        adler1: Checksum of the first block
+        adler2: Checksum of the second block
+        length2: Length of the second block in bytes
+    """
+    base = 65521
+    rem = length2 % base
+    sum1 = adler1 & 0xFFFF
+    sum2 = (rem * sum1) % base
+    sum1 += (adler2 & 0xFFFF) + base - 1
+    sum2 += ((adler1 >> 16) & 0xFFFF) + ((adler2 >> 16) & 0xFFFF) + base - rem
+    sum1 %= base
+    sum2 %= base
+    return (sum2 << 16) | sum1
+
+
+def _deflate_block(data: bytes, dictionary: bytes, level: int, last: bool):
+    """
+    Raw-deflate one block of a parallel zlib stream
+    
+    The block is primed with the tail of the previous block and ends on a
+    byte boundary (Z_SYNC_FLUSH), so blocks can simply be concatenated.
+    
+    Returns:
+        Tuple of (compressed bytes, Adler-32 of data)
+    """
+    if dictionary:
+        deflater = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=dictionary)
+    else:
+        deflater = zlib.compressobj(level, zlib.DEFLATED, -15)
+    compressed = deflater.compress(data)
+    compressed += deflater.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    return compressed, zlib.adler32(data)
+
+
+def _read_chunk(stream: BinaryIO):
+    """Read one PNG chunk, returning (type, data)"""
+    head = stream.read(8)
+    if len(head) < 8:
+        raise ValueError("Truncated PNG file")
+    length, chunk_type = struct.unpack('>I4s', head)
+    data = stream.read(length)
+    stream.read(4)  # CRC
+    if len(data) < length:
+        raise ValueError("Truncated PNG file")
+    return chunk_type, data
+
+
+class PNGStripReader:
+    """Reads a non-interlaced 8-bit PNG one strip of rows at a time"""
+    
+    READ_SIZE = 256 * 1024
+    
+    def __init__(self, path: str):
+        """
+        Open a PNG file and parse its header chunks
+        
+        Args:
+            path: Path to PNG file
+        """
+        self._file = open(path, 'rb')
+        try:
+            if self._file.read(8) != PNG_SIGNATURE:
+                raise ValueError("Not a PNG file")
+            
+            chunk_type, data = _read_chunk(self._file)
+            if chunk_type != b'IHDR':
+                raise ValueError("PNG file does not start with IHDR")
+            (self.width, self.height, bit_depth, self.color_type,
+             _, _, interlace) = struct.unpack('>IIBBBBB', data)
+            
+            if bit_depth != 8 or self.color_type not in COLOR_TYPES:
+                raise ValueError("Streaming supports 8-bit PNG images only")
+            if interlace:
+                raise ValueError("Streaming does not support interlaced PNG images")
+            
+            self.channels, self.mode = COLOR_TYPES[self.color_type]
+            self.row_bytes = self.width * self.channels
+            self.palette = None
+            
+            # Advance to the first IDAT chunk
+            self._idat_remaining = 0
+            while self._peek_chunk_type() != b'IDAT':
+                chunk_type, data = _read_chunk(self._file)
+                if chunk_type == b'PLTE':
+                    self.palette = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+                elif chunk_type == b'IEND':
+                    raise ValueError("PNG file has no image data")
+        except Exception:
+            self._file.close()
+            raise
+        
+        self._inflater = zlib.decompressobj()
+        self._pending = bytearray()
+        self._previous_row = bytes(self.row_bytes)
+        self.rows_read = 0
+    
+    def _peek_chunk_type(self) -> bytes:
+        """Look at the next chunk's type without consuming it"""
+        position = self._file.tell()
+        head = self._file.read(8)
+        self._file.seek(position)
+        if len(head) < 8:
+            raise ValueError("Truncated PNG file")
+        return head[4:]
+    
+    def _read_compressed(self) -> bytes:
+        """Return the next block of IDAT payload, or b'' after the last IDAT"""
+        while self._idat_remaining == 0:
+            head = self._file.read(8)
+            if len(head) < 8:
+                return b''
+            length, chunk_type = struct.unpack('>I4s', head)
+            if chunk_type != b'IDAT':
+                return b''
+            self._idat_remaining = length
+            if length == 0:
+                self._file.read(4)
+        
+        data = self._file.read(min(self.READ_SIZE, self._idat_remaining))
+        self._idat_remaining -= len(data)
+        if self._idat_remaining == 0:
+            self._file.read(4)  # CRC
+        return data
+    
+    def _unfilter(self, filtered: bytes, rows: int) -> np.ndarray:
+        """
+        Undo PNG row filters for a strip using Pillow's decoder
+        
+        The strip is wrapped in a tiny stored-deflate PNG whose first row is
+        the previous unfiltered row, so Up/Average/Paeth filters of the first
+        strip row see the right neighbours.
+        """
+        color_type = 0 if self.color_type == 3 else self.color_type
+        raw = b'\x00' + self._previous_row + filtered
+        ihdr = struct.pack('>IIBBBBB', self.width, rows + 1, 8, color_type, 0, 0, 0)
+        png = (PNG_SIGNATURE + _chunk(b'IHDR', ihdr) +
+               _chunk(b'IDAT', zlib.compress(raw, 0)) + _chunk(b'IEND', b''))
+        
+        with Image.open(BytesIO(png)) as img:
+            strip = np.array(img)[1:]
+        return strip.reshape(rows, self.width, self.channels)
+    
+    def read_rows(self, count: int) -> Optional[np.ndarray]:
+        """
+        Decode the next rows of the image
+        
+        Args:
+            count: Maximum number of rows to decode
+        
+        Returns:
+            uint8 array of shape (rows, width, channels), or None at the end
+        """
+        count = min(count, self.height - self.rows_read)
+        if count <= 0:
+            return None
+        
+        needed = count * (self.row_bytes + 1)
+        while len(self._pending) < needed:
+            # Inflate no more than the strip needs, even for very compressible data
+            compressed = self._inflater.unconsumed_tail or self._read_compressed()
+            if not compressed:
+                break
+            self._pending += self._inflater.decompress(compressed, needed - len(self._pending))
+        
+        if len(self._pending) < needed:
+            raise ValueError("Truncated PNG image data")
+        
+        filtered = bytes(self._pending[:needed])
+        del self._pending[:needed]
+        strip = self._unfilter(filtered, count)
+        
+        self._previous_row = strip[-1].tobytes()
+        self.rows_read += count
+        return strip
+    
+    def expand_palette(self, strip: np.ndarray) -> np.ndarray:
+        """
+        Expand a palette strip to RGB the way Image.convert('RGB') does
+        
+        Strips of the other modes are returned unchanged.
+        """
+        if self.mode != 'P':
+            return strip
+        palette = np.zeros((256, 3), dtype=np.uint8)
+        if self.palette is not None:
+            palette[:len(self.palette)] = self.palette[:256]
+        return palette[strip[..., 0]]
+    
+    def iter_strips(self, rows_per_strip: int) -> Iterator[np.ndarray]:
+        """Yield the remaining rows in strips of at most rows_per_strip rows"""
+        while True:
+            strip = self.read_rows(rows_per_strip)
+            if strip is None:
+                return
+            yield strip
+    
+    def close(self):
+        self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PNGStripWriter:
+    """
+    Writes an 8-bit PNG incrementally, one strip of rows at a time
+    
+    With threads > 1 the filtered scanlines are cut into blocks that are
+    deflated in parallel and stitched into a single zlib stream, as pigz
+    does; zlib releases the GIL while compressing.
+    """
+    
+    IDAT_SIZE = 1024 * 1024
+    BLOCK_SIZE = 1024 * 1024  # Uncompressed bytes per parallel deflate block
+    DICTIONARY_SIZE = 32 * 1024  # Deflate window primed from the previous block
+    
+    def __init__(self, path: str, width: int, height: int, mode: str = 'RGB',
+                 compress_level: int = 6, threads: int = 1):
+        """
+        Create a PNG file and write its header
+        
+        Args:
+            path: Output path
+            width: Image width in pixels
+            height: Image height in pixels
+            mode: 'L', 'LA', 'RGB' or 'RGBA'
+            compress_level: zlib compression level (0-9)
+            threads: Number of threads deflating blocks in parallel
+        """
+        color_types = {mode_name: color_type for color_type, (_, mode_name)
+                       in COLOR_TYPES.items() if mode_name != 'P'}
+        if mode not in color_types:
+            raise ValueError(f"Unsupported PNG mode: {mode}")
+        
+        self.width = width
+        self.height = height
+        self.channels = COLOR_TYPES[color_types[mode]][0]
+        self.rows_written = 0
+        
+        self.compress_level = compress_level
+        self.threads = max(1, threads)
+        self._buffer = bytearray()
+        
+        if self.threads > 1:
+            self._deflater = None
+            self._executor = ThreadPoolExecutor(max_workers=self.threads)
+            self._pending_blocks = deque()
+            self._block = bytearray()
+            self._dictionary = b''
+            self._adler = 1
+            # zlib header for a 32K window, with FLEVEL matching compress_level
+            level_flag = 0 if compress_level < 2 else 1 if compress_level < 6 else \
+                2 if compress_level == 6 else 3
+            header = 0x7800 | (level_flag << 6)
+            self._buffer += struct.pack('>H', header + 31 - header % 31)
+        else:
+            self._deflater = zlib.compressobj(compress_level)
+        
+        self._previous_row = np.zeros(width * self.channels, dtype=np.uint8)
+        
+        self._file = open(path, 'wb')
+        ihdr = struct.pack('>IIBBBBB', width, height, 8, color_types[mode], 0, 0, 0)
+        self._file.write(PNG_SIGNATURE + _chunk(b'IHDR', ihdr))
+    
+    def _filter_rows(self, rows: np.ndarray) -> bytes:
+        """
+        Apply the PNG filter with the smallest sum of absolute residuals to each row
+        
+        Encoding only looks at original pixel values, so all five filters
+        are computed for the whole strip at once with wrapping uint8 maths.
+        """
+        bpp = self.channels
+        x = rows
+        b = np.empty_like(x)
+        b[0] = self._previous_row
+        b[1:] = x[:-1]
+        a = np.zeros_like(x)
+        a[:, bpp:] = x[:, :-bpp]
+        c = np.zeros_like(x)
+        c[:, bpp:] = b[:, :-bpp]
+        
+        # Paeth predictor: pa = |p - a| = |b - c|, pb = |a - c|, pc = |a + b - 2c|
+        ac = a.astype(np.int16) - c
+        bc = b.astype(np.int16) - c
+        pa, pb, pc = np.abs(bc), np.abs(ac), np.abs(ac + bc)
+        paeth = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+        del ac, bc, pa, pb, pc
+        
+        candidates = np.empty((5,) + x.shape, dtype=np.uint8)
+        candidates[0] = x
+        np.subtract(x, a, out=candidates[1])
+        np.subtract(x, b, out=candidates[2])
+        np.subtract(x, (a >> 1) + (b >> 1) + (a & b & 1), out=candidates[3])
+        np.subtract(x, paeth, out=candidates[4])
+        
+        # |residual| as a signed byte; abs(-128) wraps back to 128 in the uint8 view
+        costs = np.abs(candidates.view(np.int8)).view(np.uint8)
+        choice = costs.sum(axis=2, dtype=np.uint32).argmin(axis=0)
+        del costs
+        
+        out = np.empty((len(x), x.shape[1] + 1), dtype=np.uint8)
+        out[:, 0] = choice
+        out[:, 1:] = candidates[choice, np.arange(len(x))]
+        return out.tobytes()
+    
+    def _submit_block(self, last: bool = False):
+        """Queue the current block for compression and write finished blocks in order"""
+        data = bytes(self._block)
+        self._block = bytearray()
+        future = self._executor.submit(_deflate_block, data, self._dictionary,
+                                       self.compress_level, last)
+        self._pending_blocks.append((future, len(data)))
+        self._dictionary = data[-self.DICTIONARY_SIZE:]
+        
+        # Keep a bounded number of blocks in flight
+        while self._pending_blocks and (last or len(self._pending_blocks) > 2 * self.threads):
+            self._collect_block()
+    
+    def _collect_block(self):
+        """Append the oldest compressed block to the IDAT buffer"""
+        future, length = self._pending_blocks.popleft()
+        compressed, adler = future.result()
+        self._adler = _adler32_combine(self._adler, adler, length)
+        self._buffer += compressed
+        self._flush_idat()
+    
+    def _flush_idat(self, force: bool = False):
+        while len(self._buffer) >= self.IDAT_SIZE or (force and self._buffer):
+            data = bytes(self._buffer[:self.IDAT_SIZE])
+            del self._buffer[:self.IDAT_SIZE]
+            self._file.write(_chunk(b'IDAT', data))
+    
+    def write_rows(self, rows: np.ndarray):
+        """
+        Append rows to the image
+        
+        Args:
+            rows: uint8 array of shape (rows, width[, channels])
+        """
+        rows = np.ascontiguousarray(rows, dtype=np.uint8).reshape(len(rows), -1)
+        if rows.shape[1] != self.width * self.channels:
+            raise ValueError("Row width does not match the PNG header")
+        if self.rows_written + len(rows) > self.height:
+            raise ValueError("More rows written than declared in the PNG header")
+        if not len(rows):
+            return
+        
+        filtered = self._filter_rows(rows)
+        if self._deflater is not None:
+            self._buffer += self._deflater.compress(filtered)
+            self._flush_idat()
+        else:
+            position = 0
+            while position < len(filtered):
+                take = min(self.BLOCK_SIZE - len(self._block), len(filtered) - position)
+                self._block += filtered[position:position + take]
+                position += take
+                if len(self._block) == self.BLOCK_SIZE:
+                    self._submit_block()
+        self._previous_row = rows[-1].copy()
+        self.rows_written += len(rows)
+    
+    def close(self):
+        """Finish the zlib stream and write the trailing chunks"""
+        if self._file.closed:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"Only {self.rows_written} of {self.height} rows written")
+            if self._deflater is not None:
+                self._buffer += self._deflater.flush()
+            else:
+                self._submit_block(last=True)
+                self._buffer += struct.pack('>I', self._adler)
+            self._flush_idat(force=True)
+            self._file.write(_chunk(b'IEND', b''))
+        finally:
+            self._shutdown()
+    
+    def _shutdown(self):
+        """Close the file and stop the compression threads"""
+        self._file.close()
+        if self._deflater is None:
+            # shutdown(cancel_futures=True) needs Python 3.9
+            for future, _ in self._pending_blocks:
+                future.cancel()
+            self._executor.shutdown(wait=True)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._shutdown()
@@ -0,0 +1,250 @@
+"""
+Unit tests for the animated GIF/APNG frame codecs and carrier
+"""
+import unittest
+import tempfile
+import io
+import os
+import sys
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+# Add parent directory to path to import src modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.animation_carrier import AnimationCarrier
+from src.animation_frames import GifAnimation, ApngAnimation
+from src.steganography_engine import SteganographyEngine
+
+def frames(count: int, width: int = 64, height: int = 48, mode: str = 'RGB') -> list:
+    """Moving gradients plus noise, different in every frame"""
+    rng = np.random.default_rng(11)
+    y, x = np.mgrid[0:height, 0:width]
+    images = []
+    for frame in range(count):
+        pixels = np.stack([(x * 4 + frame * 9) % 256, (y * 5 + frame * 3) % 256,
+                           ((x + y) * 2) % 256], axis=-1) + rng.normal(0, 8, (height, width, 3))
+        images.append(Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).convert(mode))
+    return images
+
+def gif_bytes(images: list, **options) -> bytes:
+    """Save palette frames as an animated GIF with Pillow"""
+    buffer = io.BytesIO()
+    images[0].save(buffer, 'GIF', save_all=True, append_images=images[1:], **options)
+    return buffer.getvalue()
+
+def apng_bytes(images: list, **options) -> bytes:
+    """Save frames as an animated PNG with Pillow"""
+    buffer = io.BytesIO()
+    images[0].save(buffer, 'PNG', save_all=True, append_images=images[1:], **options)
+    return buffer.getvalue()
+
+def rendered(path: str) -> list:
+    """Composited RGBA frames as Pillow displays them"""
+    with Image.open(path) as img:
+        return [np.asarray(frame.convert('RGBA'), dtype=np.int16)
+                for frame in ImageSequence.Iterator(img)]
+
+class TestAnimationFrames(unittest.TestCase):
+    """Test cases for GifAnimation and ApngAnimation"""
+    
+    def test_unchanged_frames_reserialize_identically(self):
+        """Test that parsing and writing back without changes gives the same file"""
+        gif = gif_bytes([image.quantize(64) for image in frames(3)], duration=50, loop=0,
+                        comment=b'note')
+        self.assertEqual(GifAnimation(gif).to_bytes(), gif)
+        
+        apng = apng_bytes(frames(3, mode='RGBA'), duration=70)
+        self.assertEqual(ApngAnimation(apng).to_bytes(), apng)
+    
+    def test_reencoded_frames_render_the_same(self):
+        """Test that paired palettes and re-encoded frames display unchanged"""
+        images = [image.convert('P', palette=Image.Palette.ADAPTIVE, colors=100)
+                  for image in frames(4)]
+        cases = [
+            ('.gif', gif_bytes(images, duration=40, transparency=3, disposal=2)),
+            ('.png', apng_bytes(images, duration=40)),
+            ('.png', apng_bytes(frames(3, mode='LA'), duration=40, default_image=True)),
+        ]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for number, (suffix, data) in enumerate(cases):
+                with self.subTest(case=number):
+                    path = os.path.join(temp_dir, f'cover{number}{suffix}')
+                    with open(path, 'wb') as f:
+                        f.write(data)
+                    
+                    animation = (GifAnimation if suffix == '.gif' else ApngAnimation)(data)
+                    animation.decode(2)
+                    animation.pair_palettes()
+                    for frame in animation.frames:
+                        # Force interlaced GIF data where Pillow allows it
+                        frame.interlaced = True
+                    animation.encode(2)
+                    output = os.path.join(temp_dir, f'output{number}{suffix}')
+                    animation.write(output)
+                    
+                    for before, after in zip(rendered(path), rendered(output)):
+                        np.testing.assert_array_equal(before, after)
+    
+    def test_rejects_unsupported_files(self):
+        """Test that 16-bit APNGs and other files are refused"""
+        image = Image.fromarray(np.zeros((8, 8), dtype=np.uint16))
+        with self.assertRaisesRegex(ValueError, "Only 8-bit and palette APNGs"):
+            ApngAnimation(apng_bytes([image, image]))
+        with self.assertRaisesRegex(ValueError, "Not a GIF"):
+            GifAnimation(b'\x89PNG\r\n\x1a\n')
+        with self.assertRaises(ValueError):
+            GifAnimation(gif_bytes([image.quantize(8) for image in frames(2)])[:200])
+
+class TestAnimationCarrier(unittest.TestCase):
+    """Test cases for AnimationCarrier"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.carrier = AnimationCarrier(SteganographyEngine())
+        
+        palette_frames = [image.convert('P', palette=Image.Palette.ADAPTIVE, colors=200)
+                          for image in frames(6)]
+        self.gif_path = os.path.join(self.temp_dir, 'cover.gif')
+        with open(self.gif_path, 'wb') as f:
+            f.write(gif_bytes(palette_frames, duration=[50, 60, 70, 80, 90, 100], loop=0,
+                              transparency=5, disposal=2))
+    
+    def tearDown(self):
+        """Clean up test fixtures"""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_gif_round_trip_keeps_frames(self):
+        """Test that a payload spread over all GIF frames survives with frames and timing"""
+        capacity = self.carrier.calculate_capacity(self.gif_path)
+        self.assertEqual(capacity['frames'], 6)
+        secret_data = os.urandom(capacity['available_bytes'] - 64)
+        output_path = os.path.join(self.temp_dir, 'stego.gif')
+        
+        success, message = self.carrier.embed_data(self.gif_path, secret_data, output_path,
+                                                   use_compression=False)
+        self.assertTrue(success, message)
+        extracted, message = self.carrier.extract_data(output_path)
+        self.assertEqual(extracted, secret_data, message)
+        
+        with Image.open(output_path) as img:
+            self.assertEqual(img.n_frames, 6)
+            self.assertEqual(img.info['loop'], 0)
+            self.assertEqual([frame.info['duration'] for frame in ImageSequence.Iterator(img)],
+                             [50, 60, 70, 80, 90, 100])
+        
+        # Every frame carries data, within the pair distance and without touching alpha
+        limit = AnimationCarrier.MAX_PAIR_DISTANCE
+        for before, after in zip(rendered(self.gif_path), rendered(output_path)):
+            self.assertTrue((before != after).any())
+            np.testing.assert_array_equal(before[..., 3], after[..., 3])
+            distances = np.sqrt(((before - after).astype(np.int32) ** 2).sum(axis=-1))
+            self.assertLessEqual(distances.max(), limit)
+    
+    def test_apng_round_trip(self):
+        """Test truecolour and palette APNGs, with several bits per pixel and skip-alpha"""
+        cases = [
+            ('RGB', 3, False),
+            ('RGBA', 1, True),
+            ('LA', 2, False),
+            ('P', 1, False),
+        ]
+        for mode, bits, skip_alpha in cases:
+            with self.subTest(mode=mode, bits=bits, skip_alpha=skip_alpha):
+                cover_path = os.path.join(self.temp_dir, f'{mode}.png')
+                with open(cover_path, 'wb') as f:
+                    images = frames(4, mode='RGB' if mode == 'P' else mode)
+                    if mode == 'P':
+                        # Adaptive palettes have close colours to pair, unlike the web palette
+                        images = [image.convert('P', palette=Image.Palette.ADAPTIVE, colors=200)
+                                  for image in images]
+                    f.write(apng_bytes(images, duration=70, loop=2))
+                self.carrier.engine.exclude_alpha = skip_alpha
+                capacity = self.carrier.calculate_capacity(cover_path, bits)
+                secret_data = os.urandom(max(1, capacity['available_bytes'] - 64))
+                output_path = os.path.join(self.temp_dir, f'{mode}_stego.apng')
+                
+                success, message = self.carrier.embed_data(cover_path, secret_data,
+                                                           output_path, bits,
+                                                           use_compression=False)
+                self.assertTrue(success, message)
+                
+                writer = io.BytesIO()
+                written, message = self.carrier.extract_stream(output_path, writer)
+                self.assertEqual(writer.getvalue(), secret_data, message)
+                self.assertEqual(written, len(secret_data))
+                
+                with Image.open(output_path) as img:
+                    self.assertEqual(img.n_frames, 4)
+                    self.assertEqual(img.info['loop'], 2)
+                if skip_alpha:
+                    for before, after in zip(rendered(cover_path), rendered(output_path)):
+                        np.testing.assert_array_equal(before[..., 3], after[..., 3])
+    
+    def test_capacity_scales_with_frames(self):
+        """Test that capacity grows with the frame count"""
+        paths = []
+        for count in [2, 8]:
+            path = os.path.join(self.temp_dir, f'frames{count}.png')
+            with open(path, 'wb') as f:
+                f.write(apng_bytes(frames(count)))
+            paths.append(path)
+        
+        short, long = (self.carrier.calculate_capacity(path) for path in paths)
+        self.assertEqual(long['values'], 4 * short['values'])
+        self.assertGreater(long['available_bytes'], 3.9 * short['available_bytes'])
+    
+    def test_worker_count_does_not_change_output(self):
+        """Test that frames processed on one or several threads give the same file"""
+        outputs = []
+        for threads in [1, 4]:
+            self.carrier.engine.max_threads = threads
+            output_path = os.path.join(self.temp_dir, f'threads{threads}.gif')
+            success, message = self.carrier.embed_data(self.gif_path, b'frames' * 200,
+                                                       output_path)
+            self.assertTrue(success, message)
+            with open(output_path, 'rb') as f:
+                outputs.append(f.read())
+        self.assertEqual(outputs[0], outputs[1])
+    
+    def test_refusals(self):
+        """Test bad options, oversized payloads and files without data"""
+        output_path = os.path.join(self.temp_dir, 'stego.gif')
+        
+        success, message = self.carrier.embed_data(self.gif_path, b'x', output_path[:-4] + '.png')
+        self.assertFalse(success)
+        self.assertIn("must be saved as .gif", message)
+        
+        success, message = self.carrier.embed_data(self.gif_path, b'x', output_path, 2)
+        self.assertFalse(success)
+        self.assertIn("1 bit per index", message)
+        
+        success, message = self.carrier.embed_data(self.gif_path, os.urandom(100000),
+                                                   output_path, use_compression=False)
+        self.assertFalse(success)
+        self.assertIn("Data too large", message)
+        self.assertFalse(os.path.exists(output_path))
+        
+        self.carrier.engine.matrix_k = 3
+        success, message = self.carrier.embed_data(self.gif_path, b'x', output_path)
+        self.assertFalse(success)
+        self.assertIn("not supported for animated covers", message)
+        self.carrier.engine.matrix_k = 0
+        
+        data, message = self.carrier.extract_data(self.gif_path)
+        self.assertIsNone(data)
+    
+    def test_handles_only_animated_files(self):
+        """Test that single-frame images stay with the image engine"""
+        single_path = os.path.join(self.temp_dir, 'single.png')
+        frames(1)[0].save(single_path)
+        
+        self.assertTrue(AnimationCarrier.handles(self.gif_path))
+        self.assertFalse(AnimationCarrier.handles(single_path))
+        self.assertFalse(AnimationCarrier.handles(os.path.join(self.temp_dir, 'missing.gif')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+Unit tests for the WAV audio carrier
+"""
+import unittest
+import tempfile
+import io
+import os
+import sys
+import wave
+
+import numpy as np
+
+# Add parent directory to path to import src modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.audio_carrier import WavCarrier
+from src.steganography_engine import SteganographyEngine
+from src.encryption_manager import EncryptionManager
+
+class TestWavCarrier(unittest.TestCase):
+    """Test cases for WavCarrier"""
+    
+    def setUp(self):
+        """Set up a carrier that streams in small chunks"""
+        self.carrier = WavCarrier()
+        self.carrier.CHUNK_BYTES = 4096
+        self.paths = []
+    
+    def tearDown(self):
+        """Clean up test files"""
+        for path in self.paths:
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def create_wav(self, sample_width: int, channels: int, frames: int):
+        """Write a random PCM WAV file and return its path and frame bytes"""
+        path = tempfile.mktemp(suffix='.wav')
+        self.paths.append(path)
+        data = os.urandom(frames * channels * sample_width)
+        with wave.open(path, 'wb') as writer:
+            writer.setnchannels(channels)
+            writer.setsampwidth(sample_width)
+            writer.setframerate(8000)
+            writer.writeframes(data)
+        return path, data
+    
+    def read_frames(self, path: str):
+        """Parameters and frame bytes of a WAV file"""
+        with wave.open(path, 'rb') as reader:
+            return reader.getparams(), reader.readframes(reader.getnframes())
+    
+    def test_round_trip_sample_widths(self):
+        """Test embedding and extraction for 8- to 32-bit samples"""
+        payload = os.urandom(3000)
+        
+        for sample_width, channels in [(1, 1), (2, 2), (3, 2), (4, 1)]:
+            for bits in [1, 3]:
+                with self.subTest(sample_width=sample_width, channels=channels, bits=bits):
+                    cover_path, cover_frames = self.create_wav(sample_width, channels, 30000)
+                    output_path = tempfile.mktemp(suffix='.wav')
+                    self.paths.append(output_path)
+                    
+                    success, message = self.carrier.embed_data(
+                        cover_path, payload, output_path, bits_per_sample=bits,
+                        use_compression=False)
+                    self.assertTrue(success, message)
+                    
+                    cover_params, _ = self.read_frames(cover_path)
+                    params, frames = self.read_frames(output_path)
+                    self.assertEqual(params, cover_params)
+                    
+                    # Only the low bits of each sample's least significant byte change
+                    cover_bytes = np.frombuffer(cover_frames, dtype=np.uint8)
+                    stego_bytes = np.frombuffer(frames, dtype=np.uint8)
+                    changed = np.flatnonzero(cover_bytes != stego_bytes)
+                    self.assertFalse((changed % sample_width).any())
+                    self.assertFalse(((cover_bytes ^ stego_bytes) >> bits).any())
+                    
+                    extracted_data, message = self.carrier.extract_data(output_path)
+                    self.assertEqual(extracted_data, payload, message)
+    
+    def test_stream_extraction_and_encryption(self):
+        """Test bounded-memory extraction and the engine's payload pipeline"""
+        cover_path, _ = self.create_wav(2, 2, 40000)
+        output_path = tempfile.mktemp(suffix='.wav')
+        self.paths.append(output_path)
+        text = b"Audio carriers share the image header format. " * 100
+        
+        success, message = self.carrier.embed_data(cover_path, text, output_path, 2)
+        self.assertTrue(success, message)
+        writer = io.BytesIO()
+        written, message = self.carrier.extract_stream(output_path, writer)
+        self.assertEqual(written, len(text), message)
+        self.assertEqual(writer.getvalue(), text)
+        
+        engine = SteganographyEngine(EncryptionManager("password").generate_key())
+        success, message = WavCarrier(engine).embed_data(cover_path, text, output_path)
+        self.assertTrue(success, message)
+        
+        extracted_data, message = self.carrier.extract_data(output_path)
+        self.assertIsNone(extracted_data)
+        self.assertIn("password or key is required", message)
+        extracted_data, message = WavCarrier(engine).extract_data(output_path)
+        self.assertEqual(extracted_data, text)
+    
+    def test_capacity_and_rejection(self):
+        """Test capacity limits and WAV files without hidden data"""
+        cover_path, _ = self.create_wav(2, 1, 1000)
+        capacity = self.carrier.calculate_capacity(cover_path, 2)
+        self.assertEqual(capacity['samples'], 1000)
+        self.assertEqual(capacity['available_bytes'], (1000 - capacity['header_bits']) * 2 // 8)
+        
+        output_path = tempfile.mktemp(suffix='.wav')
+        self.paths.append(output_path)
+        success, message = self.carrier.embed_data(cover_path, os.urandom(1000), output_path)
+        self.assertFalse(success)
+        self.assertIn("Data too large", message)
+        self.assertFalse(os.path.exists(output_path))
+        
+        extracted_data, message = self.carrier.extract_data(cover_path)
+        self.assertIsNone(extracted_data)
+        self.assertTrue(WavCarrier.handles("song.WAV"))
+        self.assertFalse(WavCarrier.handles("cover.png"))
+
+
+if __name__ == '__main__':
+    unittest.main()
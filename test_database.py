@@ -135,6 +135,24 @@ class TestDatabaseManager(unittest.TestCase):
         self.assertEqual(result['stored_hash'], test_hash)
         self.assertFalse(result['verified'])  # File doesn't exist, so can't verify
     
+    def test_cover_info_cache(self):
+        """Test caching and replacing cover reads"""
+        cover = {'path': 'covers/a.png', 'size': 1234, 'mtime_ns': 10, 'width': 64,
+                 'height': 32, 'image_mode': 'RGB', 'carrier': 'image',
+                 'carrier_values': None, 'carrier_mode': None}
+        self.db_manager.store_cover_info([cover])
+        self.db_manager.store_cover_info([dict(cover, mtime_ns=20, width=128),
+                                          dict(cover, path='covers/b.gif', carrier='animation',
+                                               carrier_values=5000, carrier_mode='P')])
+        
+        cache = self.db_manager.get_cover_info()
+        self.assertEqual(sorted(cache), ['covers/a.png', 'covers/b.gif'])
+        self.assertEqual(cache['covers/a.png']['mtime_ns'], 20)
+        self.assertEqual(cache['covers/a.png']['width'], 128)
+        self.assertEqual(cache['covers/a.png']['carrier'], 'image')
+        self.assertEqual((cache['covers/b.gif']['carrier_values'],
+                          cache['covers/b.gif']['carrier_mode']), (5000, 'P'))
+    
     def test_metadata_json(self):
         """Test JSON metadata storage"""
         metadata = {
@@ -0,0 +1,50 @@
+"""
+Unit tests for the keyed embedding order
+"""
+import unittest
+import os
+import sys
+
+import numpy as np
+
+# Add parent directory to path to import src modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.embedding_order import KeyedPermutation
+
+class TestKeyedPermutation(unittest.TestCase):
+    """Test cases for KeyedPermutation"""
+    
+    def test_is_permutation(self):
+        """Test that every size maps onto each position exactly once"""
+        for size in [1, 2, 3, 7, 8, 9, 1000, 65537]:
+            with self.subTest(size=size):
+                positions = KeyedPermutation(b"key", size).positions(0, size)
+                self.assertTrue(np.array_equal(np.sort(positions), np.arange(size)))
+    
+    def test_blocks_match_whole_order(self):
+        """Test that positions computed in blocks match a single pass"""
+        order = KeyedPermutation(b"key", 50000)
+        whole = order.positions(0, 12000)
+        blocks = np.concatenate([order.positions(start, min(12000, start + 777))
+                                 for start in range(0, 12000, 777)])
+        self.assertTrue(np.array_equal(whole, blocks))
+    
+    def test_order_depends_on_key(self):
+        """Test that the order is deterministic per key and differs between keys"""
+        first = KeyedPermutation(b"key", 100000).positions(0, 1000)
+        self.assertTrue(np.array_equal(first, KeyedPermutation(b"key", 100000).positions(0, 1000)))
+        self.assertFalse(np.array_equal(first, KeyedPermutation(b"other", 100000).positions(0, 1000)))
+    
+    def test_short_prefix_of_huge_domain(self):
+        """Test that a few positions of a 100M-value image are cheap and in range"""
+        positions = KeyedPermutation(b"key", 100_000_000).positions(0, 1000)
+        self.assertEqual(len(np.unique(positions)), 1000)
+        self.assertTrue((positions >= 0).all() and (positions < 100_000_000).all())
+        
+        with self.assertRaises(ValueError):
+            KeyedPermutation(b"key", 10).positions(5, 11)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -337,14 +337,13 @@ class TestIntegration(unittest.TestCase):
         output_path = tempfile.mktemp(suffix='.png')
         
         try:
-            # Encrypt
-            enc_mgr = EncryptionManager(password)
-            encrypted_data, key = enc_mgr.encrypt_data(compressible_data)
+            # The engine compresses, then encrypts
+            self.engine.encryption_key = EncryptionManager(password).generate_key()
             
             # Embed with compression
             success, message = self.engine.embed_data(
                 self.test_image_path,
-                encrypted_data,
+                compressible_data,
                 output_path,
                 bits_per_pixel=2,
                 use_compression=True
@@ -352,13 +351,13 @@ class TestIntegration(unittest.TestCase):
             
             self.assertTrue(success)
             
-            # Extract
-            extracted_encrypted, message = self.engine.extract_data(output_path)
-            self.assertIsNotNone(extracted_encrypted)
+            # Compression ran on the plaintext, so the embedded token is small
+            header, payload = self.engine._pipeline().pack(compressible_data, 2)
+            self.assertLess(len(payload), len(compressible_data) // 10)
             
-            # Decrypt
-            decrypted_data, message = enc_mgr.decrypt_data(extracted_encrypted, password=password)
-            self.assertIsNotNone(decrypted_data)
+            # Extract and decrypt
+            decrypted_data, message = self.engine.extract_data(output_path)
+            self.assertIsNotNone(decrypted_data, message)
             self.assertEqual(decrypted_data, compressible_data)
             
         finally:
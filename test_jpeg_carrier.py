@@ -0,0 +1,197 @@
+"""
+Unit tests for the JPEG coefficient codec and carrier
+"""
+import unittest
+import tempfile
+import io
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+# Add parent directory to path to import src modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.jpeg_carrier import JpegCarrier
+from src.jpeg_coefficients import JpegCoefficients
+from src.steganography_engine import SteganographyEngine
+from src.encryption_manager import EncryptionManager
+
+def photo(width: int, height: int, mode: str = 'RGB') -> Image.Image:
+    """Smooth gradients plus noise, so blocks have a spread of AC coefficients"""
+    rng = np.random.default_rng(7)
+    y, x = np.mgrid[0:height, 0:width]
+    base = (np.sin(x / 17) + np.cos(y / 23)) * 60 + 128
+    pixels = np.stack([base, base[::-1], base[:, ::-1]], axis=-1) + \
+        rng.normal(0, 12, (height, width, 3))
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).convert(mode)
+
+def jpeg_bytes(image: Image.Image, **options) -> bytes:
+    """Encode an image as a JPEG with Pillow"""
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', **options)
+    return buffer.getvalue()
+
+class TestJpegCoefficients(unittest.TestCase):
+    """Test cases for JpegCoefficients"""
+    
+    def test_reencode_is_byte_identical(self):
+        """Test that unchanged coefficients re-encode to the original file"""
+        cases = [
+            ('RGB', (37, 23), {}),
+            ('RGB', (101, 67), {'subsampling': 0}),
+            ('RGB', (99, 65), {'subsampling': 1}),
+            ('RGB', (120, 80), {'optimize': True}),
+            ('RGB', (150, 90), {'restart_marker_blocks': 3}),
+            ('L', (53, 41), {}),
+            ('L', (130, 70), {'quality': 95, 'restart_marker_rows': 1}),
+        ]
+        for mode, size, options in cases:
+            with self.subTest(mode=mode, size=size, options=options):
+                data = jpeg_bytes(photo(*size, mode), **options)
+                jpeg = JpegCoefficients(data)
+                self.assertEqual((jpeg.width, jpeg.height), size)
+                self.assertEqual(jpeg.to_bytes(), data)
+    
+    def test_changed_coefficients_decode_with_pillow(self):
+        """Test that changed AC coefficients give a valid JPEG with nearby pixels"""
+        data = jpeg_bytes(photo(96, 64), quality=90)
+        jpeg = JpegCoefficients(data)
+        jpeg.coefficients[::3, 5] += 1
+        
+        changed = jpeg.to_bytes()
+        self.assertEqual(JpegCoefficients(changed).coefficients.tolist(),
+                         jpeg.coefficients.tolist())
+        
+        original = np.asarray(Image.open(io.BytesIO(data)), dtype=np.int16)
+        decoded = np.asarray(Image.open(io.BytesIO(changed)), dtype=np.int16)
+        self.assertEqual(decoded.shape, original.shape)
+        self.assertLess(np.abs(decoded - original).mean(), 3)
+    
+    def test_rejects_unsupported_files(self):
+        """Test that progressive and non-JPEG files are refused"""
+        with self.assertRaisesRegex(ValueError, "Only baseline JPEGs"):
+            JpegCoefficients(jpeg_bytes(photo(64, 64), progressive=True))
+        with self.assertRaisesRegex(ValueError, "Not a JPEG"):
+            JpegCoefficients(b'\x89PNG\r\n\x1a\n')
+        with self.assertRaises(ValueError):
+            JpegCoefficients(jpeg_bytes(photo(64, 64))[:400])
+
+class TestJpegCarrier(unittest.TestCase):
+    """Test cases for JpegCarrier"""
+    
+    def setUp(self):
+        """Set up a baseline JPEG cover"""
+        self.cover_path = tempfile.mktemp(suffix='.jpg')
+        self.output_path = tempfile.mktemp(suffix='.jpg')
+        photo(240, 160).save(self.cover_path, quality=90)
+        self.carrier = JpegCarrier()
+    
+    def tearDown(self):
+        """Clean up test files"""
+        for path in [self.cover_path, self.output_path]:
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def test_round_trip_keeps_jpeg_size(self):
+        """Test that a full payload round-trips and the output stays a similar JPEG"""
+        capacity = self.carrier.calculate_capacity(self.cover_path)
+        payload = os.urandom(capacity['available_bytes'])
+        
+        success, message = self.carrier.embed_data(self.cover_path, payload, self.output_path,
+                                                   use_compression=False)
+        self.assertTrue(success, message)
+        extracted_data, message = self.carrier.extract_data(self.output_path)
+        self.assertEqual(extracted_data, payload, message)
+        
+        cover_size = os.path.getsize(self.cover_path)
+        self.assertLess(abs(os.path.getsize(self.output_path) - cover_size), cover_size // 100)
+        with Image.open(self.output_path) as img:
+            self.assertEqual(img.format, 'JPEG')
+            self.assertEqual(img.size, (240, 160))
+        
+        # Only usable magnitudes change, by one, keeping their sign
+        cover = JpegCoefficients.read(self.cover_path).coefficients.astype(np.int32)
+        stego = JpegCoefficients.read(self.output_path).coefficients.astype(np.int32)
+        changed = cover != stego
+        self.assertFalse(changed[:, 0].any())
+        self.assertTrue((np.abs(cover[changed]) >= 2).all())
+        self.assertTrue((np.abs(stego[changed] - cover[changed]) == 1).all())
+        self.assertTrue((np.sign(stego) == np.sign(cover)).all())
+    
+    def test_pipeline_and_scatter(self):
+        """Test encryption, scattered order and streamed extraction"""
+        text = b"Coefficients share the image header format. " * 20
+        engine = SteganographyEngine(EncryptionManager("password").generate_key())
+        engine.scatter_key = b"order key"
+        
+        success, message = JpegCarrier(engine).embed_data(self.cover_path, text,
+                                                          self.output_path)
+        self.assertTrue(success, message)
+        extracted_data, message = JpegCarrier(engine).extract_data(self.output_path)
+        self.assertEqual(extracted_data, text, message)
+        
+        extracted_data, message = self.carrier.extract_data(self.output_path)
+        self.assertIsNone(extracted_data)
+        self.assertIn("scatter key is required", message)
+        
+        scatter_engine = SteganographyEngine()
+        scatter_engine.scatter_key = b"order key"
+        success, message = JpegCarrier(scatter_engine).embed_data(self.cover_path, text,
+                                                                  self.output_path)
+        self.assertTrue(success, message)
+        writer = io.BytesIO()
+        written, message = JpegCarrier(scatter_engine).extract_stream(self.output_path, writer)
+        self.assertEqual(written, len(text), message)
+        self.assertEqual(writer.getvalue(), text)
+        
+        success, message = self.carrier.embed_data(self.cover_path, text, self.output_path)
+        self.assertTrue(success, message)
+        writer = io.BytesIO()
+        written, message = self.carrier.extract_stream(self.output_path, writer)
+        self.assertEqual(written, len(text), message)
+        self.assertEqual(writer.getvalue(), text)
+    
+    def test_matrix_embedding(self):
+        """Test matrix-coded payloads in coefficient magnitudes"""
+        engine = SteganographyEngine()
+        engine.matrix_k = 3
+        carrier = JpegCarrier(engine)
+        capacity = carrier.calculate_capacity(self.cover_path)
+        payload = os.urandom(capacity['available_bytes'])
+        
+        success, message = carrier.embed_data(self.cover_path, payload, self.output_path,
+                                              use_compression=False)
+        self.assertTrue(success, message)
+        extracted_data, message = self.carrier.extract_data(self.output_path)
+        self.assertEqual(extracted_data, payload, message)
+        writer = io.BytesIO()
+        written, message = self.carrier.extract_stream(self.output_path, writer)
+        self.assertEqual(writer.getvalue(), payload, message)
+        
+        # Fewer than half a change per payload bit, as with plain LSBs
+        cover = JpegCoefficients.read(self.cover_path).coefficients
+        stego = JpegCoefficients.read(self.output_path).coefficients
+        self.assertLess(np.count_nonzero(cover != stego), len(payload) * 8 * 0.35)
+    
+    def test_capacity_and_rejection(self):
+        """Test capacity limits and JPEGs without hidden data"""
+        capacity = self.carrier.calculate_capacity(self.cover_path)
+        success, message = self.carrier.embed_data(
+            self.cover_path, os.urandom(capacity['available_bytes'] + 1), self.output_path,
+            use_compression=False)
+        self.assertFalse(success)
+        self.assertIn("Data too large", message)
+        
+        success, message = self.carrier.embed_data(self.cover_path, b"x", self.output_path, 2)
+        self.assertFalse(success)
+        
+        extracted_data, message = self.carrier.extract_data(self.cover_path)
+        self.assertIsNone(extracted_data)
+        self.assertTrue(JpegCarrier.handles("photo.JPEG"))
+        self.assertFalse(JpegCarrier.handles("cover.png"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Unit tests for payload compression codecs
+"""
+import unittest
+import os
+import sys
+
+# Add parent directory to path to import src modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.payload_codecs import (CODECS, CODEC_STORE, byte_entropy, codec_by_name,
+                                get_codec, probe_codec)
+
+class TestPayloadCodecs(unittest.TestCase):
+    """Test cases for the codec registry and probe"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.text_data = b"The quick brown fox jumps over the lazy dog. " * 2000
+        self.random_data = os.urandom(200000)
+    
+    def test_round_trip_all_codecs(self):
+        """Test that every codec decompresses what it compressed"""
+        for codec in CODECS.values():
+            with self.subTest(codec=codec.name):
+                compressed = codec.compress(self.text_data)
+                self.assertEqual(codec.decompress(compressed), self.text_data)
+                if codec.codec_id != CODEC_STORE:
+                    self.assertLess(len(compressed), len(self.text_data))
+    
+    def test_streaming_decompress_is_bounded(self):
+        """Test chunked decompression with a small output limit"""
+        for codec in CODECS.values():
+            with self.subTest(codec=codec.name):
+                compressed = codec.compress(self.text_data)
+                chunks = [compressed[i:i + 1000] for i in range(0, len(compressed), 1000)]
+                blocks = list(codec.iter_decompress(chunks, max_length=4096))
+                
+                self.assertEqual(b''.join(blocks), self.text_data)
+                if codec.codec_id != CODEC_STORE:
+                    self.assertLessEqual(max(len(block) for block in blocks), 4096)
+    
+    def test_corrupted_data_raises(self):
+        """Test that truncated or corrupted payloads raise ValueError"""
+        for name in ['zlib', 'bz2', 'lzma']:
+            with self.subTest(codec=name):
+                codec = codec_by_name(name)
+                compressed = codec.compress(self.text_data)
+                with self.assertRaises(ValueError):
+                    codec.decompress(compressed[:len(compressed) // 2])
+                with self.assertRaises(ValueError):
+                    codec.decompress(b"\x00garbage" * 10)
+        
+        with self.assertRaises(ValueError):
+            get_codec(7)
+        with self.assertRaises(ValueError):
+            codec_by_name('brotli')
+    
+    def test_probe_skips_incompressible_data(self):
+        """Test that the probe stores random data without trial compression"""
+        self.assertGreater(byte_entropy(self.random_data), 7.9)
+        codec, compressed = probe_codec(self.random_data)
+        self.assertEqual(codec.codec_id, CODEC_STORE)
+        self.assertIsNone(compressed)
+        
+        codec, compressed = probe_codec(b"short")
+        self.assertEqual(codec.codec_id, CODEC_STORE)
+    
+    def test_probe_picks_compressing_codec(self):
+        """Test that the probe picks a real codec for redundant data"""
+        codec, compressed = probe_codec(self.text_data)
+        self.assertNotEqual(codec.codec_id, CODEC_STORE)
+        self.assertIsNone(compressed)  # Only a sample was compressed
+        
+        small = self.text_data[:5000]
+        codec, compressed = probe_codec(small)
+        self.assertNotEqual(codec.codec_id, CODEC_STORE)
+        self.assertEqual(codec.decompress(compressed), small)
+
+
+if __name__ == '__main__':
+    unittest.main()
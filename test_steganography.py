@@ -53,6 +53,20 @@ class TestSteganographyEngine(unittest.TestCase):
         # With 1 bit per pixel, should have reasonable capacity
         self.assertGreater(capacity['available_bytes'], 1000)
     
+    def test_capacity_reads_header_only(self):
+        """Test that capacity calculation does not decode pixel data"""
+        from unittest import mock
+        from PIL import ImageFile
+        
+        with mock.patch.object(ImageFile.ImageFile, 'load',
+                               side_effect=AssertionError("pixels decoded")):
+            capacity = self.engine.calculate_capacity(self.test_image_path, bits_per_pixel=2)
+        
+        self.assertEqual(capacity['pixels'], 30000)
+        self.assertEqual(capacity['channels'], 3)
+        self.assertEqual(capacity['available_bits'],
+                         (30000 - self.engine.HEADER_BITS) * 2)
+    
     def test_embed_extract_cycle(self):
         """Test complete embed/extract cycle"""
         output_path = tempfile.mktemp(suffix='.png')
@@ -239,6 +253,911 @@ class TestSteganographyEngine(unittest.TestCase):
         
         self.assertEqual(bytes_data, b"\x01\x02\x03")
     
+    def test_vectorized_embedding_matches_loop(self):
+        """Test that the vectorized embedder matches the reference loop"""
+        img_array = np.random.randint(0, 256, (40, 40, 3), dtype=np.uint8)
+        data = os.urandom(200)
+        
+        for bits in [1, 2, 3]:
+            with self.subTest(bits=bits):
+                expected = self.engine._embed_bits_safe(
+                    img_array, self.engine._bytes_to_bits(data), bits)
+                actual = self.engine._embed_bits_vectorized(
+                    img_array, self.engine._bytes_to_bit_array(data), bits)
+                
+                np.testing.assert_array_equal(actual, expected)
+    
+    def test_vectorized_extraction_layout(self):
+        """Test that the vectorized extractor reads bit i from value i // bits"""
+        flat_array = np.random.randint(0, 256, 500, dtype=np.uint8)
+        
+        for bits in [1, 2, 3]:
+            with self.subTest(bits=bits):
+                expected = [(flat_array[i // bits] >> (i % bits)) & 1
+                            for i in range(40, 400)]
+                actual = self.engine._extract_bits_vectorized(flat_array, 40, 400, bits)
+                
+                self.assertEqual(actual.tolist(), expected)
+    
+    def test_packed_mode_touches_fewer_values(self):
+        """Test that each channel value carries bits_per_pixel payload bits"""
+        data = os.urandom(300)
+        
+        for bits in [2, 3]:
+            with self.subTest(bits=bits):
+                output_path = tempfile.mktemp(suffix='.png')
+                
+                try:
+                    success, message = self.engine.embed_data(
+                        self.test_image_path, data, output_path,
+                        bits_per_pixel=bits, use_compression=False
+                    )
+                    self.assertTrue(success, message)
+                    
+                    cover = np.array(Image.open(self.test_image_path)).reshape(-1)
+                    stego = np.array(Image.open(output_path)).reshape(-1)
+                    used_values = self.engine.HEADER_BITS + -(-len(data) * 8 // bits)
+                    np.testing.assert_array_equal(stego[used_values:], cover[used_values:])
+                    
+                    extracted_data, message = self.engine.extract_data(output_path)
+                    self.assertEqual(extracted_data, data)
+                finally:
+                    if os.path.exists(output_path):
+                        os.remove(output_path)
+    
+    def test_legacy_replicated_layout_extraction(self):
+        """Test that images without the packed flag are still readable"""
+        import struct
+        
+        data = b"legacy payload"
+        header = struct.pack('>IB', len(data), 2)
+        img_array = np.array(Image.open(self.test_image_path))
+        legacy_array = self.engine._embed_bits_vectorized(
+            img_array, self.engine._bytes_to_bit_array(header + data), 2)
+        
+        output_path = tempfile.mktemp(suffix='.png')
+        
+        try:
+            Image.fromarray(legacy_array, 'RGB').save(output_path)
+            
+            extracted_data, message = self.engine.extract_data(output_path)
+            self.assertEqual(extracted_data, data)
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+    
+    def test_v2_header_checksum_and_fast_rejection(self):
+        """Test the v2 header fields, CRC check and early rejection of clean images"""
+        from src.steganography_engine import _ValueStream
+        
+        header, payload = self.engine._pipeline().pack(self.test_data, 2, False)
+        self.assertEqual(len(header) * 8, self.engine.HEADER_BITS)
+        self.assertTrue(header.startswith(self.engine.HEADER_MAGIC))
+        
+        header_info = self.engine._parse_header(header, 30000)
+        self.assertEqual(header_info['version'], 2)
+        self.assertEqual(header_info['data_length'], len(self.test_data))
+        self.assertEqual(header_info['bits_per_pixel'], 2)
+        
+        corrupted = header[:12] + bytes([header[12] ^ 1]) + header[13:]
+        with self.assertRaises(ValueError):
+            self.engine._parse_header(corrupted, 30000)
+        with self.assertRaises(ValueError):
+            self.engine._parse_header(header, 100)
+        
+        # A clean image is rejected after the v1-sized prefix has been read
+        rejected = 0
+        for _ in range(50):
+            values = _ValueStream([np.random.randint(0, 256, 30000, dtype=np.uint8)])
+            try:
+                self.engine._read_header(values, 30000)
+            except ValueError:
+                rejected += 1
+                self.assertEqual(len(values.read(30000)),
+                                 30000 - self.engine.HEADER_BITS_V1)
+        self.assertGreaterEqual(rejected, 45)
+        
+        extracted_data, message = self.engine.extract_data(self.test_image_path)
+        self.assertIsNone(extracted_data)
+    
+    def test_file_container_random_access(self):
+        """Test listing and extracting single members of a file container"""
+        from unittest import mock
+        
+        files = {
+            'notes.txt': b"container member " * 40,
+            'random.bin': os.urandom(777),
+            'empty': b""
+        }
+        output_path = tempfile.mktemp(suffix='.png')
+        
+        try:
+            for bits in [1, 2, 3]:
+                with self.subTest(bits=bits):
+                    success, message = self.engine.embed_files(
+                        self.test_image_path, files, output_path, bits_per_pixel=bits)
+                    self.assertTrue(success, message)
+                    
+                    members, message = self.engine.list_files(output_path)
+                    self.assertEqual([m['name'] for m in members], list(files))
+                    self.assertEqual([m['size'] for m in members],
+                                     [len(data) for data in files.values()])
+                    
+                    # Members are read from the value stream, not a full decode
+                    with mock.patch.object(SteganographyEngine, '_image_to_array',
+                                           side_effect=AssertionError("full decode")):
+                        for name, data in files.items():
+                            extracted_data, message = self.engine.extract_file(
+                                output_path, name)
+                            self.assertEqual(extracted_data, data, message)
+            
+            extracted_data, message = self.engine.extract_file(output_path, 'missing')
+            self.assertIsNone(extracted_data)
+            
+            self.engine.embed_data(self.test_image_path, self.test_data, output_path)
+            members, message = self.engine.list_files(output_path)
+            self.assertIsNone(members)
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+    
+    def test_stream_payload_round_trip(self):
+        """Test embed_stream/extract_stream with payloads spanning many chunks"""
+        import io
+        
+        engine = SteganographyEngine()
+        engine.PAYLOAD_CHUNK_BYTES = 999
+        output_path = tempfile.mktemp(suffix='.png')
+        
+        try:
+            for bits in [1, 3]:
+                for compress in [True, False]:
+                    with self.subTest(bits=bits, compress=compress):
+                        data = (os.urandom(1500) + b"stream " * 400)[:3300 * bits]
+                        success, message = engine.embed_stream(
+                            self.test_image_path, io.BytesIO(data), output_path,
+                            bits_per_pixel=bits, use_compression=compress)
+                        self.assertTrue(success, message)
+                        
+                        writer = io.BytesIO()
+                        written, message = engine.extract_stream(output_path, writer)
+                        self.assertEqual(written, len(data), message)
+                        self.assertEqual(writer.getvalue(), data)
+                        
+                        extracted_data, message = engine.extract_data(output_path)
+                        self.assertEqual(extracted_data, data)
+            
+            success, message = engine.embed_stream(
+                self.test_image_path, io.BytesIO(os.urandom(20000)), output_path,
+                use_compression=False)
+            self.assertFalse(success)
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+    
+    def test_codec_recorded_in_header(self):
+        """Test that the chosen codec is stored in the header and used to extract"""
+        from src.payload_codecs import CODEC_STORE, codec_by_name
+        
+        text = b"codec registry payload " * 60
+        output_path = tempfile.mktemp(suffix='.png')
+        
+        try:
+            for name in ['store', 'zlib', 'bz2', 'lzma']:
+                with self.subTest(codec=name):
+                    engine = SteganographyEngine()
+                    engine.codec = name
+                    header, payload = engine._pipeline().pack(text, 1, True)
+                    header_info = engine._parse_header(header, 30000)
+                    self.assertEqual(header_info['codec'], codec_by_name(name).codec_id)
+                    
+                    success, message = engine.embed_data(self.test_image_path, text,
+                                                         output_path)
+                    self.assertTrue(success, message)
+                    extracted_data, message = self.engine.extract_data(output_path)
+                    self.assertEqual(extracted_data, text)
+            
+            # Auto mode stores random data without compressing it
+            header, payload = self.engine._pipeline().pack(os.urandom(2000), 1, True)
+            self.assertEqual(self.engine._parse_header(header, 30000)['codec'], CODEC_STORE)
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+    
+    def test_payload_pipeline_encryption(self):
+        """Test that payloads are compressed before they are encrypted"""
+        from cryptography.fernet import Fernet
+        from src.encryption_manager import EncryptionManager
+        from src.payload_codecs import CODEC_STORE
+        
+        text = b"pipeline payload compresses before encryption " * 40
+        key = Fernet.generate_key()
+        engine = SteganographyEngine(encryption_key=key)
+        output_path = tempfile.mktemp(suffix='.png')
+        
+        try:
+            header, payload = engine._pipeline().pack(text, 1, True)
+            header_info = engine._parse_header(header, 30000)
+            self.assertTrue(header_info['encrypted'])
+            self.assertNotEqual(header_info['codec'], CODEC_STORE)
+            legacy_token, _ = EncryptionManager().encrypt_data(text, key=key)
+            self.assertLess(len(payload), len(legacy_token) // 4)
+            
+            success, message = engine.embed_data(self.test_image_path, text, output_path)
+            self.assertTrue(success, message)
+            extracted_data, message = engine.extract_data(output_path)
+            self.assertEqual(extracted_data, text, message)
+            
+            for other in [SteganographyEngine(),
+                          SteganographyEngine(encryption_key=Fernet.generate_key())]:
+                extracted_data, message = other.extract_data(output_path)
+                self.assertIsNone(extracted_data)
+            
+            # Tokens encrypted by the caller before embedding still decrypt
+            # from v1 images, while v2 plaintext is never treated as a token
+            import struct
+            img_array = np.array(Image.open(self.test_image_path))
+            legacy_array = self.engine._embed_bits_vectorized(
+                img_array, self.engine._bytes_to_bit_array(
+                    struct.pack('>IB', len(legacy_token), 1) + legacy_token), 1)
+            Image.fromarray(legacy_array, 'RGB').save(output_path)
+            extracted_data, message = engine.extract_data(output_path)
+            self.assertEqual(extracted_data, text, message)
+            
+            self.engine.embed_data(self.test_image_path, legacy_token, output_path)
+            extracted_data, message = engine.extract_data(output_path)
+            self.assertEqual(extracted_data, legacy_token, message)
+            
+            # Container members are sealed one by one
+            files = {'a.txt': text, 'b.bin': os.urandom(300)}
+            success, message = engine.embed_files(self.test_image_path, files, output_path)
+            self.assertTrue(success, message)
+            members, message = engine.list_files(output_path)
+            self.assertTrue(all(member['encrypted'] for member in members))
+            for name, data in files.items():
+                extracted_data, message = engine.extract_file(output_path, name)
+                self.assertEqual(extracted_data, data, message)
+            extracted_data, message = self.engine.extract_file(output_path, 'a.txt')
+            self.assertIsNone(extracted_data)
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+    
+    def test_span_payload_across_covers(self):
+        """Test splitting a payload across several covers and reassembling it"""
+        import random
+        
+        output_dir = tempfile.mkdtemp()
+        covers = []
+        for index in range(4):
+            covers.append(os.path.join(output_dir, f"cover{index}.png"))
+            Image.fromarray(np.random.randint(0, 256, (100, 100, 3), dtype=np.uint8)).save(
+                covers[-1])
+        data = os.urandom(8000)
+        
+        try:
+            success, message = self.engine.embed_data(covers[0], data, covers[0] + '.png')
+            self.assertFalse(success)
+            
+            success, message = self.engine.embed_span(covers, data, output_dir,
+                                                      use_compression=False)
+            self.assertTrue(success, message)
+            shards = sorted(path for path in os.listdir(output_dir) if 'of3' in path)
+            self.assertEqual(len(shards), 3)
+            shards = [os.path.join(output_dir, path) for path in shards]
+            
+            # Any order, with unrelated images mixed in
+            random.shuffle(shards)
+            extracted_data, message = self.engine.extract_span(shards + covers)
+            self.assertEqual(extracted_data, data, message)
+            
+            extracted_data, message = self.engine.extract_span(shards[:2])
+            self.assertIsNone(extracted_data)
+            self.assertIn("Missing", message)
+            extracted_data, message = self.engine.extract_data(shards[0])
+            self.assertIsNone(extracted_data)
+            
+            success, message = self.engine.embed_span(covers, data * 3, output_dir)
+            self.assertFalse(success)
+        finally:
+            for path in os.listdir(output_dir):
+                os.remove(os.path.join(output_dir, path))
+            os.rmdir(output_dir)
+    
+    def test_scattered_embedding_order(self):
+        """Test keyed scattered embedding across the whole image"""
+        import io
+        from src.steganography_engine import _ValueStream
+        
+        engine = SteganographyEngine()
+        engine.scatter_key = b"scatter key"
+        data = os.urandom(1200)
+        output_path = tempfile.mktemp(suffix='.png')
+        
+        try:
+            for bits in [1, 2, 3]:
+                with self.subTest(bits=bits):
+                    success, message = engine.embed_data(self.test_image_path, data,
+                                                         output_path, bits_per_pixel=bits)
+                    self.assertTrue(success, message)
+                    extracted_data, message = engine.extract_data(output_path)
+                    self.assertEqual(extracted_data, data, message)
+            
+            # Changes reach the last rows instead of stopping after the payload
+            cover = np.array(Image.open(self.test_image_path))
+            stego = np.array(Image.open(output_path))
+            changed_rows = np.flatnonzero((cover != stego).any(axis=(1, 2)))
+            self.assertGreater(changed_rows.max(), 90)
+            
+            header_info = engine._read_header(_ValueStream([stego.reshape(-1)]), stego.size)
+            self.assertTrue(header_info['scatter'])
+            
+            writer = io.BytesIO()
+            written, message = engine.extract_stream(output_path, writer)
+            self.assertEqual(writer.getvalue(), data, message)
+            self.assertEqual(written, len(data))
+            
+            extracted_data, message = self.engine.extract_data(output_path)
+            self.assertIsNone(extracted_data)
+            self.assertIn("scatter key", message)
+            
+            success, message = engine.embed_files(self.test_image_path, {'a': data},
+                                                  output_path)
+            self.assertFalse(success)
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+    
+    def test_adaptive_embedding(self):
+        """Test that adaptive payloads avoid flat areas and round-trip without settings"""
+        from unittest import mock
+        
+        # Left half flat, right half noise
+        cover = np.full((100, 120, 3), 128, dtype=np.uint8)
+        cover[:, 60:] = np.random.randint(0, 256, (100, 60, 3), dtype=np.uint8)
+        Image.fromarray(cover, 'RGB').save(self.test_image_path)
+        engine = SteganographyEngine()
+        engine.adaptive = True
+        data = os.urandom(1500)
+        output_path = tempfile.mktemp(suffix='.png')
+        
+        try:
+            for bits in [1, 3]:
+                with self.subTest(bits=bits):
+                    success, message = engine.embed_data(self.test_image_path, data,
+                                                         output_path, bits_per_pixel=bits,
+                                                         use_compression=False)
+                    self.assertTrue(success, message)
+                    
+                    # Past the header row, the flat half away from the noise edge is untouched
+                    stego = np.array(Image.open(output_path))
+                    changed = (stego != cover).any(axis=2)
+                    self.assertFalse(changed[1:, :59].any())
+                    
+                    extracted_data, message = self.engine.extract_data(output_path)
+                    self.assertEqual(extracted_data, data, message)
+            
+            # A second embed into the same cover reuses the cached cost map
+            with mock.patch.object(engine, '_box_sum') as box_sum:
+                success, message = engine.embed_data(self.test_image_path, data, output_path,
+                                                     bits_per_pixel=3, use_compression=False)
+                self.assertTrue(success, message)
+                box_sum.assert_not_called()
+            
+            success, message = engine.embed_files(self.test_image_path, {'a': data},
+                                                  output_path)
+            self.assertFalse(success)
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+    
+    def test_matrix_embedding(self):
+        """Test that matrix-coded payloads change at most one value per block"""
+        from unittest import mock
+        
+        engine = SteganographyEngine()
+        cover = np.array(Image.open(self.test_image_path)).reshape(-1)
+        output_path = tempfile.mktemp(suffix='.png')
+        
+        try:
+            for matrix_k in [2, 4, 7]:
+                with self.subTest(matrix_k=matrix_k):
+                    engine.matrix_k = matrix_k
+                    capacity = engine.calculate_capacity(self.test_image_path)
+                    self.assertEqual(capacity['available_bits'],
+                                     (cover.size - capacity['header_bits']) //
+                                     ((1 << matrix_k) - 1) * matrix_k)
+                    data = os.urandom(capacity['available_bytes'])
+                    
+                    success, message = engine.embed_data(self.test_image_path, data,
+                                                         output_path, use_compression=False)
+                    self.assertTrue(success, message)
+                    
+                    # Payload blocks (interleaved, one per column) change by at
+                    # most one LSB each
+                    stego = np.array(Image.open(output_path)).reshape(-1)
+                    header_bits = capacity['header_bits']
+                    changed = stego[header_bits:] != cover[header_bits:]
+                    block_size = (1 << matrix_k) - 1
+                    blocks = -(-len(data) * 8 // matrix_k)
+                    self.assertTrue((np.abs(stego.astype(int) - cover) <= 1).all())
+                    self.assertLessEqual(
+                        changed[:blocks * block_size].reshape(block_size, blocks).sum(axis=0).max(), 1)
+                    self.assertFalse(changed[blocks * block_size:].any())
+                    
+                    extracted_data, message = self.engine.extract_data(output_path)
+                    self.assertEqual(extracted_data, data, message)
+            
+            # Blocks split into several chunks coded by parallel workers
+            with mock.patch.object(SteganographyEngine, 'MATRIX_CHUNK_BLOCKS', 64):
+                engine.matrix_k, engine.max_threads = 3, 2
+                success, message = engine.embed_data(self.test_image_path, data, output_path,
+                                                     use_compression=False)
+                self.assertTrue(success, message)
+                extracted_data, message = engine.extract_data(output_path)
+                self.assertEqual(extracted_data, data, message)
+            
+            success, message = engine.embed_data(self.test_image_path, b"x", output_path,
+                                                 bits_per_pixel=2)
+            self.assertFalse(success)
+            engine.scatter_key = b"order key"
+            success, message = engine.embed_data(self.test_image_path, b"x", output_path)
+            self.assertFalse(success)
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+    
+    def test_cover_planner(self):
+        """Test header-only cover scans, their cache and the smallest-cover planner"""
+        from unittest import mock
+        
+        cover_dir = tempfile.mkdtemp()
+        paths = []
+        for index, (width, height) in enumerate([(120, 100), (40, 40), (80, 60)]):
+            paths.append(os.path.join(cover_dir, f"cover{index}.png"))
+            Image.new('RGB', (width, height)).save(paths[-1])
+        paths.append(os.path.join(cover_dir, "broken.png"))
+        with open(paths[-1], 'wb') as f:
+            f.write(b"not an image")
+        
+        try:
+            with mock.patch.object(SteganographyEngine, '_image_to_array',
+                                   side_effect=AssertionError("pixel decode")):
+                covers = self.engine.read_cover_info(paths)
+            self.assertEqual([cover['path'] for cover in covers], paths[:3])
+            self.assertFalse(any(cover['cached'] for cover in covers))
+            
+            # Unchanged files come from the cache, touched files are read again
+            known = {cover['path']: cover for cover in covers}
+            os.utime(paths[0], ns=(0, 0))
+            rescanned = self.engine.read_cover_info(paths, known)
+            self.assertEqual([cover['cached'] for cover in rescanned], [False, True, True])
+            
+            plans = self.engine.plan_covers(covers, 1000, limit=2)
+            self.assertEqual([path for path, _ in plans[1]['covers']], [paths[2], paths[0]])
+            self.assertEqual(plans[1]['fitting'], 2)
+            self.assertEqual([path for path, _ in plans[3]['covers']], [paths[1], paths[2]])
+            for bits, plan in plans.items():
+                for path, available in plan['covers']:
+                    self.assertEqual(available,
+                                     self.engine.calculate_capacity(path, bits)['available_bytes'])
+            
+            # Too large for any single cover: the fewest covers that span it
+            plan = self.engine.plan_covers(covers, 5000, [1])[1]
+            self.assertTrue(plan['span'])
+            self.assertEqual([path for path, _ in plan['covers']], [paths[0], paths[2]])
+            
+            # Matrix embedding plans with the same capacity as calculate_capacity
+            engine = SteganographyEngine()
+            engine.matrix_k = 3
+            plan = engine.plan_covers(covers, 500, [1], limit=3)[1]
+            self.assertEqual([path for path, _ in plan['covers']], [paths[2], paths[0]])
+            for path, available in plan['covers']:
+                self.assertEqual(available, engine.calculate_capacity(path)['available_bytes'])
+            self.assertFalse(engine.plan_covers(covers, 5000, [1])[1]['span'])
+            with self.assertRaises(ValueError):
+                engine.plan_covers(covers, 500, [1, 2])
+        finally:
+            for path in paths:
+                os.remove(path)
+            os.rmdir(cover_dir)
+    
+    def test_plan_covers_mixed_formats(self):
+        """Test that JPEG and animated covers are sized with the carrier encode uses"""
+        import shutil
+        from src.animation_carrier import AnimationCarrier
+        from src.jpeg_carrier import JpegCarrier
+        from src.utils import list_image_files
+        
+        cover_dir = tempfile.mkdtemp()
+        frames = [Image.fromarray(np.random.randint(0, 256, (48, 64, 4), dtype=np.uint8))
+                  for _ in range(3)]
+        Image.fromarray(np.random.randint(0, 256, (80, 100, 3), dtype=np.uint8)).save(
+            os.path.join(cover_dir, 'still.png'))
+        Image.fromarray(np.random.randint(0, 256, (200, 200, 3), dtype=np.uint8)).save(
+            os.path.join(cover_dir, 'photo.jpg'), quality=90)
+        palette_frames = [frame.convert('RGB').quantize(200) for frame in frames]
+        palette_frames[0].save(os.path.join(cover_dir, 'loop.gif'), save_all=True,
+                               append_images=palette_frames[1:])
+        frames[0].save(os.path.join(cover_dir, 'clip.png'), save_all=True,
+                       append_images=frames[1:])
+        
+        try:
+            paths = list_image_files([cover_dir])
+            covers = self.engine.read_cover_info(paths)
+            carriers = {os.path.basename(cover['path']): cover['carrier'] for cover in covers}
+            self.assertEqual(carriers, {'still.png': 'image', 'photo.jpg': 'jpeg',
+                                        'loop.gif': 'animation', 'clip.png': 'animation'})
+            
+            for exclude_alpha in [False, True]:
+                engine = SteganographyEngine()
+                engine.exclude_alpha = exclude_alpha
+                plans = engine.plan_covers(covers, 1, limit=4)
+                
+                for bits, plan in plans.items():
+                    with self.subTest(exclude_alpha=exclude_alpha, bits=bits):
+                        expected = {}
+                        for path in paths:
+                            if AnimationCarrier.handles(path):
+                                if path.endswith('.gif') and bits > 1:
+                                    continue  # Palette frames carry 1 bit per index
+                                capacity = AnimationCarrier(engine).calculate_capacity(path, bits)
+                            elif JpegCarrier.handles(path) and bits == 1:
+                                capacity = JpegCarrier(engine).calculate_capacity(path)
+                            else:
+                                capacity = engine.calculate_capacity(path, bits)
+                            expected[path] = capacity['available_bytes']
+                        self.assertEqual(dict(plan['covers']), expected)
+            
+            # A payload the JPEG only holds when saved losslessly
+            jpeg_path = os.path.join(cover_dir, 'photo.jpg')
+            jpeg_bytes = JpegCarrier(self.engine).calculate_capacity(jpeg_path)['available_bytes']
+            plan = self.engine.plan_covers(covers, jpeg_bytes + 1, [1, 2], limit=4)
+            self.assertNotIn(jpeg_path, dict(plan[1]['covers']))
+            self.assertIn(jpeg_path, dict(plan[2]['covers']))
+        finally:
+            shutil.rmtree(cover_dir)
+    
+    def test_streaming_embed_matches_in_memory(self):
+        """Test that strip streaming produces the same stego pixels as embed_data"""
+        data = os.urandom(2000)
+        stream_path = tempfile.mktemp(suffix='.png')
+        memory_path = tempfile.mktemp(suffix='.png')
+        
+        try:
+            for bits in [1, 3]:
+                with self.subTest(bits=bits):
+                    # A tiny budget forces many single-row strips
+                    success, message = self.engine.embed_data_streaming(
+                        self.test_image_path, data, stream_path,
+                        bits_per_pixel=bits, memory_budget=1
+                    )
+                    self.assertTrue(success, message)
+                    
+                    success, message = self.engine.embed_data(
+                        self.test_image_path, data, memory_path, bits_per_pixel=bits
+                    )
+                    self.assertTrue(success, message)
+                    
+                    np.testing.assert_array_equal(np.array(Image.open(stream_path)),
+                                                  np.array(Image.open(memory_path)))
+                    
+                    extracted_data, message = self.engine.extract_data_streaming(
+                        memory_path, memory_budget=1)
+                    self.assertEqual(extracted_data, data)
+        finally:
+            for path in [stream_path, memory_path]:
+                if os.path.exists(path):
+                    os.remove(path)
+    
+    def test_streaming_extract_stops_after_payload(self):
+        """Test that streaming extraction only decodes rows holding the payload"""
+        output_path = tempfile.mktemp(suffix='.png')
+        
+        try:
+            success, message = self.engine.embed_data(
+                self.test_image_path, self.test_data, output_path
+            )
+            self.assertTrue(success, message)
+            
+            extracted_data, message = self.engine.extract_data_streaming(
+                output_path, memory_budget=1)
+            
+            self.assertEqual(extracted_data, self.test_data)
+            self.assertIn("Rows decoded: 2 of 100", message)
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+    
+    def test_extract_decodes_only_payload_rows(self):
+        """Test that short messages in PNGs are extracted without a full decode"""
+        from unittest import mock
+        
+        output_path = tempfile.mktemp(suffix='.png')
+        
+        try:
+            success, message = self.engine.embed_data(
+                self.test_image_path, self.test_data, output_path
+            )
+            self.assertTrue(success, message)
+            
+            with mock.patch.object(SteganographyEngine, '_image_to_array',
+                                   side_effect=AssertionError("full decode")):
+                extracted_data, message = self.engine.extract_data(output_path)
+            
+            self.assertEqual(extracted_data, self.test_data)
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+    
+    def test_parallel_tiles_match_single_thread(self):
+        """Test that tiled thread and process workers give the same result"""
+        img_array = np.random.randint(0, 256, (60, 60, 3), dtype=np.uint8)
+        header = b"\x00" * 5
+        payload = os.urandom(1001)
+        
+        for bits in [1, 2, 3]:
+            expected = self.engine._embed_payload_vectorized(img_array, header, payload, bits)
+            
+            for backend in ['thread', 'process']:
+                with self.subTest(bits=bits, backend=backend):
+                    engine = SteganographyEngine()
+                    engine.max_threads = 4
+                    engine.parallel_backend = backend
+                    engine.PARALLEL_MIN_VALUES = 100
+                    
+                    self.assertEqual(len(engine._tile_bounds(1001 * 8 // bits)), 4)
+                    actual = engine._embed_payload_vectorized(img_array, header, payload, bits)
+                    np.testing.assert_array_equal(actual, expected)
+                    
+                    extracted = engine._extract_payload_parallel(
+                        actual.reshape(-1)[40:], len(payload) * 8, bits)
+                    self.assertEqual(extracted, payload)
+                    
+                    if backend == 'process':
+                        # Workers wrote into the returned array, from one reused pool
+                        from src.steganography_engine import _SharedArray
+                        self.assertIsNotNone(_SharedArray.locate(actual.reshape(-1)))
+                        pool = engine._process_pool()
+                        engine._embed_payload_vectorized(actual, header, payload, bits, True)
+                        self.assertIs(engine._process_pool(), pool)
+                        engine.close()
+    
+    def test_mapped_embedding_for_uncompressed_formats(self):
+        """Test in-place embedding for BMP, PPM and TIFF covers"""
+        img_array = np.random.randint(0, 256, (80, 70, 3), dtype=np.uint8)
+        payload = os.urandom(600)
+        
+        for fmt, suffix, options in [('BMP', '.bmp', {}), ('PPM', '.ppm', {}),
+                                     ('TIFF', '.tif', {'rowsperstrip': 7})]:
+            cover_path = tempfile.mktemp(suffix=suffix)
+            output_path = tempfile.mktemp(suffix=suffix)
+            Image.fromarray(img_array, 'RGB').save(cover_path, fmt, **options)
+            
+            try:
+                for bits in [1, 3]:
+                    with self.subTest(fmt=fmt, bits=bits):
+                        success, message = self.engine.embed_data(
+                            cover_path, payload, output_path,
+                            bits_per_pixel=bits, use_compression=False)
+                        self.assertTrue(success, message)
+                        self.assertIn("Rows rewritten in place", message)
+                        self.assertEqual(os.path.getsize(output_path),
+                                         os.path.getsize(cover_path))
+                        
+                        with Image.open(output_path) as img:
+                            self.assertEqual(img.format, fmt)
+                            stego_array = np.array(img)
+                        self.assertFalse(((stego_array ^ img_array) >> bits).any())
+                        
+                        extracted_data, message = self.engine.extract_data(output_path)
+                        self.assertEqual(extracted_data, payload)
+            finally:
+                for path in [cover_path, output_path]:
+                    if os.path.exists(path):
+                        os.remove(path)
+    
+    def test_output_profiles_are_lossless(self):
+        """Test that every output encoder profile preserves the embedded data"""
+        for profile, (image_format, extension, _) in self.engine.OUTPUT_PROFILES.items():
+            output_path = tempfile.mktemp(suffix=extension)
+            try:
+                with self.subTest(profile=profile):
+                    success, message = self.engine.embed_data(
+                        self.test_image_path, self.test_data, output_path,
+                        bits_per_pixel=2, output_profile=profile)
+                    self.assertTrue(success, message)
+                    
+                    with Image.open(output_path) as img:
+                        self.assertEqual(img.format, image_format)
+                    
+                    extracted_data, message = self.engine.extract_data(output_path)
+                    self.assertEqual(extracted_data, self.test_data)
+            finally:
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+        
+        success, message = self.engine.embed_data(
+            self.test_image_path, self.test_data, tempfile.mktemp(suffix='.png'),
+            output_profile='jpeg')
+        self.assertFalse(success)
+    
+    def test_parallel_png_writer(self):
+        """Test that block-parallel PNG output decodes to the same pixels"""
+        from src.png_stream import PNGStripWriter
+        
+        img_array = np.random.randint(0, 256, (90, 70, 4), dtype=np.uint8)
+        img_array[:45] //= 32
+        output_path = tempfile.mktemp(suffix='.png')
+        
+        try:
+            for level in [1, 6, 9]:
+                with self.subTest(level=level):
+                    with PNGStripWriter(output_path, 70, 90, 'RGBA', level, threads=3) as writer:
+                        writer.BLOCK_SIZE = 4000
+                        for top in range(0, 90, 13):
+                            writer.write_rows(img_array[top:top + 13])
+                    
+                    with Image.open(output_path) as img:
+                        self.assertEqual(img.mode, 'RGBA')
+                        np.testing.assert_array_equal(np.array(img), img_array)
+            
+            # Executors without the Python 3.9 cancel_futures keyword
+            from concurrent.futures import ThreadPoolExecutor
+            from unittest import mock
+            shutdown = ThreadPoolExecutor.shutdown
+            
+            def shutdown_38(executor, wait=True):
+                return shutdown(executor, wait)
+            
+            with mock.patch.object(ThreadPoolExecutor, 'shutdown', shutdown_38):
+                engine = SteganographyEngine()
+                engine.PARALLEL_MIN_VALUES = 100
+                success, message = engine.embed_data(self.test_image_path, self.test_data,
+                                                     output_path, bits_per_pixel=2)
+                self.assertTrue(success, message)
+                extracted_data, message = engine.extract_data(output_path)
+                self.assertEqual(extracted_data, self.test_data)
+                
+                # An aborted save cancels the queued blocks and closes the file
+                with self.assertRaises(RuntimeError):
+                    with PNGStripWriter(output_path, 70, 90, 'RGBA', 9, threads=3) as writer:
+                        writer.BLOCK_SIZE = 1000
+                        writer.write_rows(img_array[:60])
+                        raise RuntimeError("stop")
+                self.assertTrue(writer._file.closed)
+                self.assertTrue(all(future.done() for future, _ in writer._pending_blocks))
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+    
+    def test_native_image_modes(self):
+        """Test that L, LA, RGBA and 16-bit covers are embedded and saved in their own mode"""
+        payload = os.urandom(300)
+        covers = [
+            ('L', '.png', np.random.randint(0, 256, (60, 70), dtype=np.uint8)),
+            ('LA', '.png', np.random.randint(0, 256, (60, 70, 2), dtype=np.uint8)),
+            ('RGBA', '.png', np.random.randint(0, 256, (60, 70, 4), dtype=np.uint8)),
+            ('I;16', '.png', np.random.randint(0, 65536, (60, 70), dtype=np.uint16)),
+            ('I;16', '.tif', np.random.randint(0, 65536, (60, 70), dtype=np.uint16)),
+            ('L', '.pgm', np.random.randint(0, 256, (60, 70), dtype=np.uint8)),
+            ('I', '.pgm', np.random.randint(0, 65536, (60, 70), dtype=np.uint16)),
+        ]
+        
+        for mode, suffix, img_array in covers:
+            cover_path = tempfile.mktemp(suffix=suffix)
+            output_path = tempfile.mktemp(suffix=suffix)
+            Image.fromarray(img_array).save(cover_path)
+            
+            try:
+                with self.subTest(mode=mode, suffix=suffix):
+                    capacity = self.engine.calculate_capacity(cover_path, 2)
+                    self.assertEqual(capacity['image_mode'], self.engine.NATIVE_MODES[mode])
+                    self.assertEqual(capacity['pixels'], img_array.size)
+                    
+                    success, message = self.engine.embed_data(
+                        cover_path, payload, output_path, bits_per_pixel=2,
+                        use_compression=False)
+                    self.assertTrue(success, message)
+                    
+                    with Image.open(output_path) as img:
+                        self.assertEqual(img.mode, mode)
+                        stego_array = np.asarray(img)
+                    # 16-bit PGM reopens as 32-bit 'I'
+                    self.assertEqual(stego_array.dtype,
+                                     np.int32 if mode == 'I' else img_array.dtype)
+                    self.assertFalse(((stego_array ^ img_array) >> 2).any())
+                    
+                    extracted_data, message = self.engine.extract_data(output_path)
+                    self.assertEqual(extracted_data, payload)
+            finally:
+                for path in [cover_path, output_path]:
+                    if os.path.exists(path):
+                        os.remove(path)
+        
+        # Palette covers are expanded to RGB without converting the whole image
+        cover_path = tempfile.mktemp(suffix='.png')
+        output_path = tempfile.mktemp(suffix='.png')
+        rgb_array = np.random.randint(0, 256, (60, 70, 3), dtype=np.uint8)
+        Image.fromarray(rgb_array).quantize(64).save(cover_path)
+        try:
+            with Image.open(cover_path) as img:
+                expected = np.asarray(img.convert('RGB'))
+            success, message = self.engine.embed_data(cover_path, payload, output_path,
+                                                      use_compression=False)
+            self.assertTrue(success, message)
+            with Image.open(output_path) as img:
+                self.assertEqual(img.mode, 'RGB')
+                self.assertFalse(((np.asarray(img) ^ expected) >> 1).any())
+            
+            # Formats that would change the mode are refused rather than lossy
+            Image.fromarray(rgb_array[..., 0]).save(cover_path)
+            success, message = self.engine.embed_data(cover_path, payload, output_path,
+                                                      output_profile='webp-lossless')
+            self.assertFalse(success)
+            self.assertIn("cannot store L images", message)
+            
+            # 32-bit covers are only embedded when their values fit 16 bits
+            tiff_path = tempfile.mktemp(suffix='.tif')
+            Image.fromarray(np.full((20, 20), 70000, dtype=np.int32)).save(tiff_path)
+            try:
+                success, message = self.engine.embed_data(tiff_path, payload, output_path)
+                self.assertFalse(success)
+                self.assertIn("outside 0-65535", message)
+            finally:
+                os.remove(tiff_path)
+        finally:
+            for path in [cover_path, output_path]:
+                if os.path.exists(path):
+                    os.remove(path)
+    
+    def test_excluded_alpha_channel(self):
+        """Test that excluded alpha values are never written and are detected on extraction"""
+        payload = os.urandom(500)
+        engine = SteganographyEngine()
+        engine.exclude_alpha = True
+        
+        for mode, channels in [('LA', 2), ('RGBA', 4)]:
+            img_array = np.random.randint(0, 256, (80, 100, channels), dtype=np.uint8)
+            cover_path = tempfile.mktemp(suffix='.png')
+            output_path = tempfile.mktemp(suffix='.png')
+            Image.fromarray(img_array).save(cover_path)
+            
+            try:
+                capacity = engine.calculate_capacity(cover_path, 3)
+                self.assertEqual(capacity['pixels'], 80 * 100 * (channels - 1))
+                
+                for bits, scatter_key, streaming in [(1, None, False), (3, None, False),
+                                                     (2, b'key', False), (3, None, True)]:
+                    with self.subTest(mode=mode, bits=bits, scatter=bool(scatter_key),
+                                      streaming=streaming):
+                        engine.scatter_key = scatter_key
+                        embed = engine.embed_data_streaming if streaming else engine.embed_data
+                        success, message = embed(cover_path, payload, output_path,
+                                                 bits_per_pixel=bits, use_compression=False)
+                        self.assertTrue(success, message)
+                        
+                        with Image.open(output_path) as img:
+                            stego_array = np.asarray(img)
+                        self.assertTrue(np.array_equal(stego_array[..., -1],
+                                                       img_array[..., -1]))
+                        self.assertFalse(((stego_array ^ img_array) >> bits).any())
+                        
+                        # The reader finds the header in the colour values by itself
+                        reader = SteganographyEngine()
+                        reader.scatter_key = scatter_key
+                        extracted_data, message = reader.extract_data(output_path)
+                        self.assertEqual(extracted_data, payload, message)
+                        if not scatter_key:
+                            extracted_data, message = reader.extract_data_streaming(
+                                output_path, memory_budget=1)
+                            self.assertEqual(extracted_data, payload, message)
+            finally:
+                engine.scatter_key = None
+                for path in [cover_path, output_path]:
+                    if os.path.exists(path):
+                        os.remove(path)
+    
     def test_empty_data(self):
         """Test embedding empty data"""
         output_path = tempfile.mktemp(suffix='.png')
@@ -3,7 +3,7 @@ Utility functions for the steganography tool
 """
 import hashlib
 import os
-from typing import Optional, Tuple
+from typing import Iterable, List, Optional, Tuple
 from PIL import Image
 
 def calculate_file_hash(file_path: str, algorithm: str = 'sha256') -> Optional[str]:
@@ -116,4 +116,30 @@ def generate_random_filename(prefix: str = 'file', extension: str = '.png') -> s
     """
     from datetime import datetime
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
-    return f"{prefix}_{timestamp}{extension}"
\ No newline at end of file
+    return f"{prefix}_{timestamp}{extension}"
+
+def list_image_files(paths: Iterable[str], recursive: bool = False) -> List[str]:
+    """
+    Expand a mix of image files and directories into image file paths
+    
+    Args:
+        paths: Image files, or directories whose images are listed
+        recursive: Also list images in subdirectories
+        
+    Returns:
+        Image paths, files in the order given and directory contents sorted by name
+    """
+    extensions = Image.registered_extensions()
+    image_paths = []
+    for path in paths:
+        if not os.path.isdir(path):
+            image_paths.append(path)
+            continue
+        
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            image_paths.extend(os.path.join(root, name) for name in sorted(names)
+                               if os.path.splitext(name)[1].lower() in extensions)
+            if not recursive:
+                break
+    return image_paths
\ No newline at end of file